@@ -0,0 +1,169 @@
+# data/api/busca.py
+"""
+Busca ranqueada de alimentos (FTS5).
+
+alimentos_fts é uma tabela FTS5 de conteúdo externo sobre alimentos
+(nome, categoria, contexto_culinario) com tokenizer unicode61
+remove_diacritics 2: "feijao" encontra "Feijão". Mantida por triggers
+(migração 2 em migracoes.py).
+
+Ranking: BM25 (nome pesa mais) multiplicado por um boost quando o nome
+começa com o texto buscado, como no ranking do useSmartFoodSearch.ts.
+"""
+
+import re
+import sqlite3
+import unicodedata
+from typing import List, Optional
+
+# Pesos BM25 por coluna: nome, categoria, contexto_culinario
+PESOS_BM25 = (10.0, 2.0, 1.0)
+
+BOOST_NOME_EXATO = 3.0
+BOOST_PREFIXO = 2.0
+
+# Candidatos buscados por BM25 antes do re-ranqueamento com boost de prefixo
+FATOR_CANDIDATOS = 5
+MIN_CANDIDATOS = 50
+
+COLUNAS = """
+    a.id, a.nome, a.categoria, a.porcao_g, a.kcal, a.prot_g, a.carb_g, a.gord_g,
+    a.contexto_culinario, a.incompativel_com, a.cluster_nutricional
+"""
+
+SQL_FTS = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS alimentos_fts USING fts5(
+        nome, categoria, contexto_culinario,
+        content='alimentos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_alimentos_fts_ins AFTER INSERT ON alimentos
+    BEGIN
+        INSERT INTO alimentos_fts (rowid, nome, categoria, contexto_culinario)
+        VALUES (NEW.id, NEW.nome, NEW.categoria, NEW.contexto_culinario);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_alimentos_fts_del AFTER DELETE ON alimentos
+    BEGIN
+        INSERT INTO alimentos_fts (alimentos_fts, rowid, nome, categoria, contexto_culinario)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.categoria, OLD.contexto_culinario);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_alimentos_fts_upd
+    AFTER UPDATE OF nome, categoria, contexto_culinario ON alimentos
+    BEGIN
+        INSERT INTO alimentos_fts (alimentos_fts, rowid, nome, categoria, contexto_culinario)
+        VALUES ('delete', OLD.id, OLD.nome, OLD.categoria, OLD.contexto_culinario);
+        INSERT INTO alimentos_fts (rowid, nome, categoria, contexto_culinario)
+        VALUES (NEW.id, NEW.nome, NEW.categoria, NEW.contexto_culinario);
+    END;
+
+    INSERT INTO alimentos_fts (alimentos_fts) VALUES ('rebuild');
+"""
+
+
+def fts5_disponivel(conn: sqlite3.Connection) -> bool:
+    opcoes = {row[0] for row in conn.execute("PRAGMA compile_options")}
+    return "ENABLE_FTS5" in opcoes
+
+
+def indice_existe(conn: sqlite3.Connection) -> bool:
+    cur = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alimentos_fts'"
+    )
+    return cur.fetchone() is not None
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos, pontuação vira espaço (mesma regra do frontend)"""
+    sem_acento = "".join(
+        c for c in unicodedata.normalize("NFD", texto.lower())
+        if unicodedata.category(c) != "Mn"
+    )
+    return " ".join(re.sub(r"[^\w\s]", " ", sem_acento).split())
+
+
+def montar_query_fts(texto: str) -> Optional[str]:
+    """
+    Converte texto livre em query FTS5: cada token vira prefixo ("tok"*)
+    e todos precisam casar (AND implícito). None se não sobrar token.
+    """
+    tokens = normalizar(texto).split()
+    if not tokens:
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _boost(nome: str, consulta: str) -> float:
+    nome_norm = normalizar(nome or "")
+    if nome_norm == consulta:
+        return BOOST_NOME_EXATO
+    if nome_norm.startswith(consulta):
+        return BOOST_PREFIXO
+    return 1.0
+
+
+def buscar(
+    conn: sqlite3.Connection,
+    texto: str,
+    k: int = 20,
+    categoria: Optional[str] = None,
+) -> List[dict]:
+    """Top-k alimentos por BM25 + boost de prefixo, com campo `score`"""
+    query_fts = montar_query_fts(texto)
+    if query_fts is None:
+        return []
+
+    candidatos = max(k * FATOR_CANDIDATOS, MIN_CANDIDATOS)
+    sql = f"""
+        SELECT {COLUNAS}, bm25(alimentos_fts, ?, ?, ?) AS rank
+        FROM alimentos_fts
+        JOIN alimentos a ON a.id = alimentos_fts.rowid
+        WHERE alimentos_fts MATCH ?
+    """
+    params: list = [*PESOS_BM25, query_fts]
+    if categoria:
+        sql += " AND a.categoria LIKE ?"
+        params.append(f"%{categoria}%")
+    sql += " ORDER BY rank LIMIT ?"
+    params.append(candidatos)
+
+    consulta = normalizar(texto)
+    resultados = []
+    for row in conn.execute(sql, params):
+        alimento = {k_: row[k_] for k_ in row.keys() if k_ != "rank"}
+        # bm25() é negativo: quanto menor, mais relevante
+        alimento["score"] = round(-row["rank"] * _boost(row["nome"], consulta), 4)
+        resultados.append(alimento)
+
+    resultados.sort(key=lambda a: (-a["score"], a["nome"]))
+    return resultados[:k]
+
+
+def buscar_sem_fts(
+    conn: sqlite3.Connection,
+    texto: str,
+    k: int = 20,
+    categoria: Optional[str] = None,
+) -> List[dict]:
+    """Fallback (SQLite sem FTS5): LIKE no nome + boost de prefixo"""
+    consulta = normalizar(texto)
+    if not consulta:
+        return []
+
+    sql = f"SELECT {COLUNAS} FROM alimentos a WHERE (a.nome LIKE ? OR a.categoria LIKE ?)"
+    params: list = [f"%{texto.strip()}%", f"%{texto.strip()}%"]
+    if categoria:
+        sql += " AND a.categoria LIKE ?"
+        params.append(f"%{categoria}%")
+
+    resultados = []
+    for row in conn.execute(sql, params):
+        alimento = {k_: row[k_] for k_ in row.keys()}
+        alimento["score"] = _boost(row["nome"], consulta)
+        resultados.append(alimento)
+
+    resultados.sort(key=lambda a: (-a["score"], a["nome"]))
+    return resultados[:k]
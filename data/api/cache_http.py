@@ -0,0 +1,365 @@
+# data/api/cache_http.py
+"""
+Cache HTTP e compressão das respostas.
+
+- ETagMiddleware: ETag forte nas rotas de catálogo/refeições, derivado dos
+  contadores de versão das tabelas (alimentos_versao, refeicoes_versao).
+  If-None-Match igual -> 304 direto no middleware, sem pegar conexão do
+  pool nem rodar a rota. As versões ficam em memória (VersoesTabelas) e
+  só são relidas quando o PRAGMA data_version muda.
+- CompressaoMiddleware: brotli (se o pacote `brotli` estiver instalado) ou
+  gzip, acima de COMPRESSAO_MIN_BYTES, inclusive em respostas streaming.
+  O ETag comprimido ganha sufixo (-br / -gz); o sufixo é removido do
+  If-None-Match antes de chegar nas rotas.
+- StaticFilesPrecomprimidos: serve arquivo.br / arquivo.gz gerados no
+  build (vite.config.js) quando o cliente aceita.
+"""
+
+import hashlib
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+COMPRESSAO_MIN_BYTES = int(os.getenv("COMPRESSAO_MIN_BYTES", "1024"))
+NIVEL_GZIP = 6
+# Qualidade 4: bem mais rápida que a 11 (padrão) e ainda menor que gzip -6
+QUALIDADE_BROTLI = 4
+
+# Muda a cada deploy/restart para não reaproveitar respostas de outra versão
+# da API (o formato da resposta pode mudar sem os dados mudarem)
+GERACAO_ETAG = os.getenv("ETAG_GERACAO") or str(int(time.time()))
+
+SUFIXO_ETAG = {"br": "-br", "gzip": "-gz"}
+EXTENSAO = {"br": ".br", "gzip": ".gz"}
+
+TIPOS_COMPRIMIVEIS = (
+    "text/",
+    "application/json",
+    "application/javascript",
+    "application/x-ndjson",
+    "application/xml",
+    "image/svg+xml",
+)
+
+
+def codificacoes_aceitas(accept_encoding: str) -> List[str]:
+    """'gzip, br;q=0.8' -> ['gzip', 'br'] (só br/gzip, por q e preferindo br)"""
+    aceitas = []
+    for parte in accept_encoding.split(","):
+        nome, _, params = parte.strip().partition(";")
+        nome = nome.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q <= 0:
+            continue
+        if nome == "*":
+            aceitas += [("br", q), ("gzip", q)]
+        elif nome in ("br", "gzip"):
+            aceitas.append((nome, q))
+
+    disponiveis = [(n, q) for n, q in aceitas if n != "br" or brotli is not None]
+    ordem = sorted(disponiveis, key=lambda nq: (-nq[1], nq[0] != "br"))
+    return list(dict.fromkeys(n for n, _ in ordem))
+
+
+def separar_etags(if_none_match: str) -> List[str]:
+    return [t.strip() for t in if_none_match.split(",") if t.strip()]
+
+
+def _sem_sufixo(etag: str) -> Tuple[str, Optional[str]]:
+    """'"abc-br"' -> ('"abc"', 'br')"""
+    for codificacao, sufixo in SUFIXO_ETAG.items():
+        if etag.endswith(f'{sufixo}"'):
+            return etag[: -len(sufixo) - 1] + '"', codificacao
+    return etag, None
+
+
+def _com_sufixo(etag: str, codificacao: str) -> str:
+    if etag.startswith("W/") or not etag.endswith('"'):
+        return etag
+    return etag[:-1] + SUFIXO_ETAG[codificacao] + '"'
+
+
+def _adicionar_vary(headers: MutableHeaders) -> None:
+    vary = headers.get("vary")
+    if not vary:
+        headers["Vary"] = "Accept-Encoding"
+    elif "accept-encoding" not in vary.lower():
+        headers["Vary"] = f"{vary}, Accept-Encoding"
+
+
+# ============================
+# VERSÕES DAS TABELAS
+# ============================
+
+class VersoesTabelas:
+    """
+    Contadores de versão lidos por uma conexão sentinela somente-leitura.
+    Escritas de qualquer conexão (API ou scripts) mudam o data_version dela.
+    """
+
+    def __init__(self, db_path: Path, contadores: Sequence[str]):
+        uri = f"{Path(db_path).resolve().as_uri()}?mode=ro"
+        self._conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        self._contadores = tuple(contadores)
+        self._sql = "SELECT " + ", ".join(
+            f"(SELECT versao FROM {c} WHERE id = 1)" for c in self._contadores
+        )
+        self._lock = threading.Lock()
+        self._data_version: Optional[int] = None
+        self._versoes: Dict[str, int] = {}
+
+    def atuais(self) -> Dict[str, int]:
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version != self._data_version:
+                self._versoes = dict(zip(self._contadores, self._conn.execute(self._sql).fetchone()))
+                self._data_version = data_version
+            return self._versoes
+
+    def fechar(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# ============================
+# ETAG / GET CONDICIONAL
+# ============================
+
+class ETagMiddleware:
+    """
+    `rotas`: path exato -> contadores de versão de que a resposta depende.
+    `versoes`: callable que devolve {contador: versao} ou None (banco ainda
+    não aberto: segue sem ETag).
+    """
+
+    def __init__(
+        self,
+        app,
+        rotas: Dict[str, Sequence[str]],
+        versoes: Callable[[], Optional[Dict[str, int]]],
+    ):
+        self.app = app
+        self.rotas = rotas
+        self.versoes = versoes
+
+    def _etag(self, scope, contadores: Sequence[str]) -> Optional[str]:
+        versoes = self.versoes()
+        if versoes is None:
+            return None
+        chave = "|".join([
+            GERACAO_ETAG,
+            scope["path"],
+            scope.get("query_string", b"").decode("latin-1"),
+            *(f"{c}={versoes[c]}" for c in contadores),
+        ])
+        return '"' + hashlib.sha1(chave.encode()).hexdigest()[:20] + '"'
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            return await self.app(scope, receive, send)
+        contadores = self.rotas.get(scope["path"])
+        if contadores is None:
+            return await self.app(scope, receive, send)
+        etag = self._etag(scope, contadores)
+        if etag is None:
+            return await self.app(scope, receive, send)
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        if if_none_match and (etag in separar_etags(if_none_match) or if_none_match.strip() == "*"):
+            await send({
+                "type": "http.response.start",
+                "status": 304,
+                "headers": [
+                    (b"etag", etag.encode()),
+                    (b"cache-control", b"no-cache"),
+                    (b"vary", b"Accept-Encoding"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        async def enviar(message):
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                message.setdefault("headers", [])
+                headers = MutableHeaders(scope=message)
+                headers["ETag"] = etag
+                # no-cache: o navegador guarda, mas revalida sempre (If-None-Match)
+                headers["Cache-Control"] = "no-cache"
+            await send(message)
+
+        await self.app(scope, receive, enviar)
+
+
+# ============================
+# COMPRESSÃO
+# ============================
+
+class _Compressor:
+    def __init__(self, codificacao: str):
+        self.codificacao = codificacao
+        if codificacao == "br":
+            self._obj = brotli.Compressor(quality=QUALIDADE_BROTLI)
+        else:
+            self._obj = zlib.compressobj(NIVEL_GZIP, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, dados: bytes, final: bool) -> bytes:
+        if self.codificacao == "br":
+            saida = self._obj.process(dados)
+            return saida + (self._obj.finish() if final else self._obj.flush())
+        saida = self._obj.compress(dados)
+        return saida + self._obj.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressaoMiddleware:
+    """Comprime respostas >= minimo_bytes com br ou gzip (Accept-Encoding)"""
+
+    def __init__(self, app, minimo_bytes: int = COMPRESSAO_MIN_BYTES):
+        self.app = app
+        self.minimo_bytes = minimo_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers_req = Headers(scope=scope)
+        aceitas = codificacoes_aceitas(headers_req.get("accept-encoding", ""))
+
+        # Sufixo -br/-gz sai do If-None-Match: as rotas só conhecem o ETag base
+        sufixos_cliente: Dict[str, str] = {}
+        if_none_match = headers_req.get("if-none-match")
+        if if_none_match:
+            bases = []
+            for etag in separar_etags(if_none_match):
+                base, codificacao = _sem_sufixo(etag)
+                if codificacao:
+                    sufixos_cliente[base] = codificacao
+                bases.append(base)
+            scope = dict(scope)
+            scope["headers"] = [
+                (k, v) for k, v in scope["headers"] if k != b"if-none-match"
+            ] + [(b"if-none-match", ", ".join(bases).encode("latin-1"))]
+
+        if scope["method"] == "HEAD":
+            aceitas = []
+        if not aceitas and not sufixos_cliente:
+            return await self.app(scope, receive, send)
+
+        inicio: Optional[dict] = None
+        compressor: Optional[_Compressor] = None
+        repassar = False
+
+        async def enviar(message):
+            nonlocal inicio, compressor, repassar
+            if message["type"] == "http.response.start":
+                inicio = message
+                message.setdefault("headers", [])
+                headers = MutableHeaders(scope=message)
+                etag = headers.get("etag")
+                if message["status"] == 304 and etag in sufixos_cliente:
+                    headers["ETag"] = _com_sufixo(etag, sufixos_cliente[etag])
+                tipo = headers.get("content-type", "")
+                repassar = (
+                    not aceitas
+                    or message["status"] < 200
+                    or message["status"] in (204, 304)
+                    or "content-encoding" in headers
+                    or not tipo.startswith(TIPOS_COMPRIMIVEIS)
+                )
+                if repassar:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or repassar:
+                await send(message)
+                return
+
+            corpo = message.get("body", b"")
+            mais = message.get("more_body", False)
+
+            if compressor is None:
+                headers = MutableHeaders(scope=inicio)
+                tamanho = int(headers.get("content-length", len(corpo) if not mais else -1))
+                if 0 <= tamanho < self.minimo_bytes:
+                    repassar = True
+                    await send(inicio)
+                    await send(message)
+                    return
+                compressor = _Compressor(aceitas[0])
+                headers["Content-Encoding"] = compressor.codificacao
+                _adicionar_vary(headers)
+                etag = headers.get("etag")
+                if etag:
+                    headers["ETag"] = _com_sufixo(etag, compressor.codificacao)
+                if "content-length" in headers:
+                    del headers["content-length"]
+                if not mais:
+                    comprimido = compressor.comprimir(corpo, final=True)
+                    headers["Content-Length"] = str(len(comprimido))
+                    await send(inicio)
+                    await send({"type": "http.response.body", "body": comprimido})
+                    return
+                await send(inicio)
+
+            await send({
+                "type": "http.response.body",
+                "body": compressor.comprimir(corpo, final=not mais),
+                "more_body": mais,
+            })
+
+        await self.app(scope, receive, enviar)
+
+
+# ============================
+# ARQUIVOS PRÉ-COMPRIMIDOS
+# ============================
+
+class StaticFilesPrecomprimidos(StaticFiles):
+    """
+    StaticFiles que prefere arquivo.br / arquivo.gz (gerados no build) quando
+    o cliente aceita. Os assets do Vite têm hash no nome: cache longo.
+    """
+
+    CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+    async def get_response(self, path: str, scope):
+        aceitas = codificacoes_aceitas(Headers(scope=scope).get("accept-encoding", ""))
+        for codificacao in aceitas:
+            full_path, stat_result = await anyio.to_thread.run_sync(
+                self.lookup_path, path + EXTENSAO[codificacao]
+            )
+            if stat_result is None or not os.path.isfile(full_path):
+                continue
+            resposta = self.file_response(full_path, stat_result, scope)
+            if resposta.status_code == 200:
+                tipo = mimetypes.guess_type(path)[0] or "text/plain"
+                if tipo.startswith("text/"):
+                    tipo += "; charset=utf-8"
+                resposta.headers["Content-Type"] = tipo
+                resposta.headers["Content-Encoding"] = codificacao
+            resposta.headers["Cache-Control"] = self.CACHE_CONTROL
+            _adicionar_vary(resposta.headers)
+            return resposta
+
+        resposta = await super().get_response(path, scope)
+        if resposta.status_code in (200, 304):
+            resposta.headers["Cache-Control"] = self.CACHE_CONTROL
+        return resposta
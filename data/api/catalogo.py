@@ -0,0 +1,192 @@
+# data/api/catalogo.py
+"""
+Catálogo de alimentos em memória (read-through, colunar).
+
+A tabela alimentos é quase só leitura (~5.4k linhas). O catálogo guarda
+cada coluna como uma tupla alinhada por posição, mais um índice id ->
+posição e a ordem por nome. Ele atende listagem, busca por id, categorias
+e a validação de itens sem ir ao SQLite.
+
+Invalidação:
+- escritas pela API (criar_alimento) chamam CacheCatalogo.invalidar()
+- edições fora da API (scripts em data/scripts, sqlite3 CLI): cada acesso
+  compara o PRAGMA data_version da conexão; se mudou, lê o contador
+  alimentos_versao (mantido por triggers, migração 3) e recarrega só se
+  a tabela alimentos mudou
+"""
+
+import bisect
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Colunas de GET /api/alimentos (GET /api/alimentos/{id} devolve todas)
+COLUNAS_LISTAGEM = (
+    "id", "nome", "categoria", "porcao_g", "kcal", "prot_g", "carb_g", "gord_g",
+    "contexto_culinario", "incompativel_com", "cluster_nutricional",
+)
+
+# LIKE do SQLite ignora caixa só em ASCII: "É" não casa com "é"
+_MINUSCULAS_ASCII = str.maketrans(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz"
+)
+
+
+def _minusculas_ascii(texto: Optional[str]) -> Optional[str]:
+    return None if texto is None else texto.translate(_MINUSCULAS_ASCII)
+
+
+def suporta_filtro(texto: Optional[str]) -> bool:
+    """Filtros com curingas do LIKE (% e _) ficam para o SQLite"""
+    return texto is None or ("%" not in texto and "_" not in texto)
+
+
+class Catalogo:
+    """Snapshot imutável da tabela alimentos, uma tupla por coluna"""
+
+    def __init__(self, versao: int, colunas: Dict[str, tuple]):
+        self.versao = versao
+        self.colunas = colunas
+        self.nomes_colunas = tuple(colunas)
+        ids = colunas["id"]
+        self.posicao = {alimento_id: pos for pos, alimento_id in enumerate(ids)}
+
+        nomes = colunas["nome"]
+        self.ordem_nome = tuple(sorted(range(len(ids)), key=lambda p: (nomes[p], ids[p])))
+        self._chaves_nome = [(nomes[p], ids[p]) for p in self.ordem_nome]
+        self._nome_like = tuple(_minusculas_ascii(n) for n in nomes)
+        self._categoria_like = tuple(_minusculas_ascii(c) for c in colunas["categoria"])
+        # Linhas de COLUNAS_LISTAGEM prontas (formato compacto e dicts da listagem)
+        self.linhas_listagem = tuple(zip(*(colunas[nome] for nome in COLUNAS_LISTAGEM)))
+
+        # ORDER BY categoria: NULL primeiro, depois ordem binária (code points)
+        distintas = set(colunas["categoria"])
+        self.categorias = ([None] if None in distintas else []) + sorted(distintas - {None})
+
+    @classmethod
+    def carregar(cls, conn: sqlite3.Connection, versao: int) -> "Catalogo":
+        cur = conn.execute("SELECT * FROM alimentos ORDER BY id")
+        nomes = [d[0] for d in cur.description]
+        linhas = cur.fetchall()
+        colunas = {nome: tuple(row[i] for row in linhas) for i, nome in enumerate(nomes)}
+        return cls(versao, colunas)
+
+    def __len__(self) -> int:
+        return len(self.posicao)
+
+    def existe(self, alimento_id: int) -> bool:
+        return alimento_id in self.posicao
+
+    def _linha(self, pos: int, nomes_colunas: Tuple[str, ...]) -> dict:
+        return {nome: self.colunas[nome][pos] for nome in nomes_colunas}
+
+    def obter(self, alimento_id: int) -> Optional[dict]:
+        """Equivale a SELECT * FROM alimentos WHERE id = ?"""
+        pos = self.posicao.get(alimento_id)
+        return None if pos is None else self._linha(pos, self.nomes_colunas)
+
+    def listar_linhas(
+        self,
+        categoria: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None,
+        apos: Optional[Tuple[str, int]] = None,
+    ) -> List[tuple]:
+        """
+        Mesmo resultado de listar_alimentos (LIKE '%...%', ORDER BY nome, id),
+        começando depois da chave (nome, id) `apos` (paginação por cursor),
+        como tuplas de COLUNAS_LISTAGEM.
+        Use suporta_filtro() antes: curingas do LIKE não são emulados.
+        """
+        categoria = _minusculas_ascii(categoria)
+        search = _minusculas_ascii(search)
+        inicio = bisect.bisect_right(self._chaves_nome, apos) if apos else 0
+        ordem = self.ordem_nome[inicio:]
+        linhas = self.linhas_listagem
+
+        if not categoria and not search:
+            return [linhas[pos] for pos in (ordem[:limit] if limit else ordem)]
+
+        resultado = []
+        for pos in ordem:
+            cat = self._categoria_like[pos]
+            if categoria and (cat is None or categoria not in cat):
+                continue
+            if search and not (
+                search in self._nome_like[pos] or (cat is not None and search in cat)
+            ):
+                continue
+            resultado.append(linhas[pos])
+            if limit and len(resultado) >= limit:
+                break
+        return resultado
+
+    def listar(
+        self,
+        categoria: Optional[str] = None,
+        search: Optional[str] = None,
+        limit: Optional[int] = None,
+        apos: Optional[Tuple[str, int]] = None,
+    ) -> List[dict]:
+        """listar_linhas() como dicts {coluna: valor}"""
+        return [
+            dict(zip(COLUNAS_LISTAGEM, linha))
+            for linha in self.listar_linhas(categoria, search, limit, apos)
+        ]
+
+
+class CacheCatalogo:
+    """
+    Catálogo do worker com contadores de acerto/falha.
+
+    - acertos: leituras atendidas pelo catálogo em memória
+    - falhas: leituras que foram ao SQLite (recarga ou filtro não suportado)
+    - recargas: quantas vezes o catálogo foi (re)construído
+    """
+
+    def __init__(self):
+        self._catalogo: Optional[Catalogo] = None
+        # PRAGMA data_version é por conexão: último valor visto por cada uma
+        self._data_version: Dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._stats = {"acertos": 0, "falhas": 0, "recargas": 0}
+
+    def _contar(self, chave: str) -> None:
+        with self._lock:
+            self._stats[chave] += 1
+
+    def obter(self, conn: sqlite3.Connection) -> Catalogo:
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        catalogo = self._catalogo
+        if catalogo is not None and self._data_version.get(id(conn)) == data_version:
+            self._contar("acertos")
+            return catalogo
+
+        versao = conn.execute("SELECT versao FROM alimentos_versao").fetchone()[0]
+        with self._lock:
+            self._data_version[id(conn)] = data_version
+            if self._catalogo is None or self._catalogo.versao != versao:
+                self._catalogo = Catalogo.carregar(conn, versao)
+                self._stats["recargas"] += 1
+                self._stats["falhas"] += 1
+            else:
+                self._stats["acertos"] += 1
+            return self._catalogo
+
+    def registrar_falha(self) -> None:
+        """Leitura atendida direto pelo SQLite"""
+        self._contar("falhas")
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._catalogo = None
+            self._data_version.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            catalogo = self._catalogo
+            return {
+                **self._stats,
+                "versao": catalogo.versao if catalogo else None,
+                "alimentos": len(catalogo) if catalogo else 0,
+            }
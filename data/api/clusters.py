@@ -0,0 +1,380 @@
+# data/api/clusters.py
+"""
+cluster_nutricional calculado no próprio banco (k-means sobre macros/g).
+
+Antes o cluster vinha congelado do base_alimentos.csv e alimentos criados
+pela API ficavam com NULL. Agora:
+- ajuste em lote: k-means (Lloyd, NumPy) sobre prot/carb/gord por grama
+  de todos os alimentos com porcao_g > 0. Centróides em
+  clusters_nutricionais (id = rótulo gravado em cluster_nutricional)
+- atribuição incremental: triggers de INSERT e de UPDATE dos macros em
+  `alimentos` gravam o centróide mais próximo, O(k) em SQL, para qualquer
+  escritor (API, importar_alimentos.py, sqlite3 CLI)
+- deriva: os mesmos triggers acumulam em clusters_estado quantos
+  alimentos foram atribuídos desde o ajuste e a soma das distâncias ao
+  centróide. O reajuste é pedido quando a distância média dos novos passa
+  de LIMIAR_DERIVA vezes a inércia média do ajuste ou quando os novos já
+  são FRACAO_NOVOS do catálogo (ver precisa_reajuste)
+
+O reajuste parte dos centróides atuais (os rótulos continuam estáveis) e
+só reescreve cluster_nutricional das linhas que mudaram de cluster.
+O primeiro ajuste (migração 9) parte das médias dos clusters do CSV.
+
+Uso (CLI):
+    python clusters.py                  # reajusta agora
+    python clusters.py --se-necessario  # só se a deriva passou do limiar
+    python clusters.py --k 8            # novo ajuste do zero com 8 clusters
+"""
+
+import argparse
+import sqlite3
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+DB_PATH = Path(__file__).parent.parent / "db" / "alimentos.db"
+
+K_PADRAO = 6
+MAX_ITERACOES = 100
+TOLERANCIA = 1e-9
+SEMENTE = 42
+
+# Reajuste: pelo menos MIN_NOVOS atribuições desde o último ajuste e
+# distância média >= LIMIAR_DERIVA x inércia média, ou novos >= FRACAO_NOVOS
+MIN_NOVOS = 20
+LIMIAR_DERIVA = 1.5
+FRACAO_NOVOS = 0.10
+
+MACROS = ("prot", "carb", "gord")
+COLUNAS = ("prot_g", "carb_g", "gord_g")
+
+
+def _por_grama(linha: str) -> Tuple[str, ...]:
+    """Macros por grama de NEW/OLD (só avaliado com porcao_g > 0)"""
+    return tuple(f"COALESCE({linha}.{c}, 0) / {linha}.porcao_g" for c in COLUNAS)
+
+
+def _distancia(linha: str) -> str:
+    """Distância quadrática de NEW/OLD ao centróide c"""
+    return " + ".join(
+        f"(c.{m} - {v}) * (c.{m} - {v})" for m, v in zip(MACROS, _por_grama(linha))
+    )
+
+
+def _sql_atribuicao(evento: str, sufixo: str) -> str:
+    """
+    Trigger de atribuição incremental. Sem centróides (antes do primeiro
+    ajuste) o valor informado fica; porcao_g <= 0 ou NULL vira NULL.
+    """
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS trg_alimentos_cluster_{sufixo}
+    AFTER {evento} ON alimentos
+    BEGIN
+        UPDATE alimentos SET cluster_nutricional = CASE
+            WHEN NEW.porcao_g > 0 THEN COALESCE((
+                SELECT c.id FROM clusters_nutricionais c
+                ORDER BY {_distancia('NEW')}, c.id LIMIT 1
+            ), NEW.cluster_nutricional)
+        END
+        WHERE id = NEW.id;
+
+        UPDATE clusters_estado SET
+            novos = novos + 1,
+            distancia_novos = distancia_novos + (
+                SELECT MIN({_distancia('NEW')}) FROM clusters_nutricionais c
+            )
+        WHERE id = 1 AND NEW.porcao_g > 0
+          AND EXISTS (SELECT 1 FROM clusters_nutricionais);
+    END;
+    """
+
+
+SQL_CLUSTERS = f"""
+    CREATE TABLE IF NOT EXISTS clusters_nutricionais (
+        id INTEGER PRIMARY KEY,
+        prot REAL NOT NULL,  -- por grama
+        carb REAL NOT NULL,
+        gord REAL NOT NULL,
+        membros INTEGER NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS clusters_estado (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        ajustado_em TEXT,
+        membros INTEGER NOT NULL DEFAULT 0,
+        inercia_media REAL NOT NULL DEFAULT 0,
+        novos INTEGER NOT NULL DEFAULT 0,
+        distancia_novos REAL NOT NULL DEFAULT 0
+    );
+    INSERT OR IGNORE INTO clusters_estado (id) VALUES (1);
+    {_sql_atribuicao("INSERT", "ins")}
+    {_sql_atribuicao("UPDATE OF porcao_g, prot_g, carb_g, gord_g", "upd")}
+"""
+
+
+# ============================
+# K-MEANS
+# ============================
+
+def carregar_macros(conn: sqlite3.Connection) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, macros por grama N x 3, cluster_nutricional atual; -1 = NULL)"""
+    linhas = conn.execute(f"""
+        SELECT id, {", ".join(f"COALESCE({c}, 0) / porcao_g" for c in COLUNAS)},
+               COALESCE(cluster_nutricional, -1)
+        FROM alimentos WHERE porcao_g > 0 ORDER BY id
+    """).fetchall()
+    if not linhas:
+        return np.zeros(0, np.int64), np.zeros((0, len(MACROS))), np.zeros(0, np.int64)
+    dados = np.array(linhas, dtype=float)
+    return dados[:, 0].astype(np.int64), dados[:, 1:4], dados[:, 4].astype(np.int64)
+
+
+def distancias(X: np.ndarray, centroides: np.ndarray) -> np.ndarray:
+    """Distância quadrática N x k (‖x‖² - 2x·c + ‖c‖², sem tensor N x k x 3)"""
+    d = (
+        (X * X).sum(axis=1)[:, None]
+        - 2.0 * X @ centroides.T
+        + (centroides * centroides).sum(axis=1)[None, :]
+    )
+    return np.maximum(d, 0.0)
+
+
+def kmeanspp(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """Sementes do k-means++ (cada nova proporcional a D² da mais próxima)"""
+    centroides = [X[rng.integers(len(X))]]
+    d2 = ((X - centroides[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = d2.sum()
+        i = rng.choice(len(X), p=d2 / total) if total > 0 else rng.integers(len(X))
+        centroides.append(X[i])
+        d2 = np.minimum(d2, ((X - X[i]) ** 2).sum(axis=1))
+    return np.array(centroides)
+
+
+def kmeans(
+    X: np.ndarray,
+    centroides: np.ndarray,
+    max_iteracoes: int = MAX_ITERACOES,
+    tolerancia: float = TOLERANCIA,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Lloyd a partir de `centroides`. Cluster que esvazia recebe o ponto mais
+    distante do próprio centróide (k fica fixo).
+
+    Retorna (centroides, rótulos, distância quadrática de cada ponto, iterações).
+    """
+    centroides = np.array(centroides, dtype=float)
+    k, dims = centroides.shape
+    iteracao = 0
+    for iteracao in range(1, max_iteracoes + 1):
+        d = distancias(X, centroides)
+        rotulos = d.argmin(axis=1)
+        minimas = d[np.arange(len(X)), rotulos]
+
+        contagem = np.bincount(rotulos, minlength=k)
+        somas = np.stack(
+            [np.bincount(rotulos, weights=X[:, j], minlength=k) for j in range(dims)], axis=1
+        )
+        medias = somas / np.maximum(contagem, 1)[:, None]
+        novos = np.where(contagem[:, None] > 0, medias, centroides)
+        for vazio, longe in zip(np.flatnonzero(contagem == 0), np.argsort(-minimas)):
+            novos[vazio] = X[longe]
+
+        deslocamento = ((novos - centroides) ** 2).sum()
+        centroides = novos
+        if deslocamento <= tolerancia:
+            break
+
+    d = distancias(X, centroides)
+    rotulos = d.argmin(axis=1)
+    return centroides, rotulos, d[np.arange(len(X)), rotulos], iteracao
+
+
+def centroides_iniciais(
+    conn: sqlite3.Connection,
+    X: np.ndarray,
+    rotulos: np.ndarray,
+    k: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (ids, centróides) de partida: os gravados; sem eles, as médias dos
+    rótulos atuais (cluster_nutricional do CSV); com `k` ou sem nada,
+    k-means++.
+    """
+    if k is None:
+        gravados = conn.execute(
+            f"SELECT id, {', '.join(MACROS)} FROM clusters_nutricionais ORDER BY id"
+        ).fetchall()
+        if gravados:
+            dados = np.array(gravados, dtype=float)
+            return dados[:, 0].astype(np.int64), dados[:, 1:]
+        existentes = np.unique(rotulos[rotulos >= 0])
+        if len(existentes):
+            medias = np.array([X[rotulos == r].mean(axis=0) for r in existentes])
+            return existentes, medias
+    k = min(k or K_PADRAO, len(X))
+    return np.arange(k, dtype=np.int64), kmeanspp(X, k, np.random.default_rng(SEMENTE))
+
+
+def casar_rotulos(
+    anteriores: np.ndarray,
+    centroides_anteriores: np.ndarray,
+    centroides: np.ndarray,
+) -> np.ndarray:
+    """
+    Rótulos dos novos centróides: cada um herda o id do centróide anterior
+    mais próximo (pares gulosos, do mais próximo ao mais distante); os que
+    sobram recebem ids novos.
+    """
+    rotulos = np.full(len(centroides), -1, dtype=np.int64)
+    if len(anteriores):
+        d = distancias(centroides, centroides_anteriores)
+        livres_novos, livres_anteriores = set(range(len(centroides))), set(range(len(anteriores)))
+        for i, j in zip(*np.unravel_index(np.argsort(d, axis=None), d.shape)):
+            if i in livres_novos and j in livres_anteriores:
+                rotulos[i] = anteriores[j]
+                livres_novos.discard(i)
+                livres_anteriores.discard(j)
+    proximo = int(anteriores.max()) + 1 if len(anteriores) else 0
+    for i in np.flatnonzero(rotulos < 0):
+        rotulos[i] = proximo
+        proximo += 1
+    return rotulos
+
+
+def ajustar(conn: sqlite3.Connection, k: Optional[int] = None) -> dict:
+    """
+    Ajusta os centróides e regrava cluster_nutricional do que mudou.
+    Roda na transação do chamador (migração ou reajustar()).
+    """
+    inicio = time.perf_counter()
+    ids, X, atuais = carregar_macros(conn)
+    if not len(ids):
+        return {"k": 0, "membros": 0, "alterados": 0, "iteracoes": 0, "tempo_ms": 0.0}
+
+    rotulos_centroides, partida = centroides_iniciais(conn, X, atuais, k)
+    centroides, posicoes, minimas, iteracoes = kmeans(X, partida)
+    if k is not None:
+        # Do zero: mantém os ids dos clusters que continuam parecidos
+        anteriores = np.array(conn.execute(
+            f"SELECT id, {', '.join(MACROS)} FROM clusters_nutricionais ORDER BY id"
+        ).fetchall(), dtype=float).reshape(-1, 1 + len(MACROS))
+        rotulos_centroides = casar_rotulos(
+            anteriores[:, 0].astype(np.int64), anteriores[:, 1:], centroides
+        )
+    novos = rotulos_centroides[posicoes]
+    membros = np.bincount(posicoes, minlength=len(centroides))
+
+    conn.execute("DELETE FROM clusters_nutricionais")
+    conn.executemany(
+        f"INSERT INTO clusters_nutricionais (id, {', '.join(MACROS)}, membros) "
+        "VALUES (?, ?, ?, ?, ?)",
+        [
+            (int(r), *map(float, c), int(m))
+            for r, c, m in zip(rotulos_centroides, centroides, membros)
+        ],
+    )
+    mudou = novos != atuais
+    conn.executemany(
+        "UPDATE alimentos SET cluster_nutricional = ? WHERE id = ?",
+        zip(novos[mudou].tolist(), ids[mudou].tolist()),
+    )
+    # porcao_g <= 0: sem perfil por grama, sem cluster
+    conn.execute(
+        "UPDATE alimentos SET cluster_nutricional = NULL "
+        "WHERE (porcao_g IS NULL OR porcao_g <= 0) AND cluster_nutricional IS NOT NULL"
+    )
+    conn.execute(
+        "UPDATE clusters_estado SET ajustado_em = ?, membros = ?, inercia_media = ?, "
+        "novos = 0, distancia_novos = 0 WHERE id = 1",
+        (datetime.now().isoformat(timespec="seconds"), len(ids), float(minimas.mean())),
+    )
+    return {
+        "k": len(centroides),
+        "membros": len(ids),
+        "alterados": int(mudou.sum()),
+        "iteracoes": iteracoes,
+        "inercia_media": float(minimas.mean()),
+        "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+    }
+
+
+# ============================
+# DERIVA E REAJUSTE
+# ============================
+
+def estado(conn: sqlite3.Connection) -> dict:
+    """Situação do último ajuste e deriva acumulada desde então"""
+    row = conn.execute("""
+        SELECT ajustado_em, membros, inercia_media, novos, distancia_novos,
+               (SELECT COUNT(*) FROM clusters_nutricionais)
+        FROM clusters_estado WHERE id = 1
+    """).fetchone()
+    ajustado_em, membros, inercia, novos, distancia, k = row
+    deriva = (distancia / novos) / inercia if novos and inercia > 0 else 0.0
+    return {
+        "ajustado_em": ajustado_em,
+        "k": k,
+        "membros": membros,
+        "inercia_media": inercia,
+        "novos": novos,
+        "deriva": round(deriva, 3),
+    }
+
+
+def precisa_reajuste(info: dict) -> bool:
+    if not info["k"]:
+        return True
+    if info["novos"] < MIN_NOVOS:
+        return False
+    return info["deriva"] >= LIMIAR_DERIVA or info["novos"] >= FRACAO_NOVOS * info["membros"]
+
+
+def reajustar(conn: sqlite3.Connection, k: Optional[int] = None) -> dict:
+    """ajustar() numa transação própria (BEGIN IMMEDIATE)"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        resultado = ajustar(conn, k)
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+    return resultado
+
+
+def reajustar_se_necessario(conn: sqlite3.Connection) -> Optional[dict]:
+    """Reajusta se a deriva passou do limiar; None se não foi preciso"""
+    if not precisa_reajuste(estado(conn)):
+        return None
+    return reajustar(conn)
+
+
+if __name__ == "__main__":
+    from migracoes import aplicar_migracoes
+
+    parser = argparse.ArgumentParser(description="Reajuste de cluster_nutricional (k-means)")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--k", type=int, help="novo ajuste do zero com k clusters (k-means++)")
+    parser.add_argument(
+        "--se-necessario", action="store_true", help="só reajusta se a deriva passou do limiar"
+    )
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    conn = sqlite3.connect(args.db)
+    aplicar_migracoes(conn)
+    antes = estado(conn)
+    if args.se_necessario and args.k is None and not precisa_reajuste(antes):
+        print(f"Sem reajuste: {antes['novos']} novos, deriva {antes['deriva']} "
+              f"(limiar {LIMIAR_DERIVA})")
+    else:
+        r = reajustar(conn, args.k)
+        print(
+            f"k={r['k']}: {r['membros']} alimentos, {r['alterados']} mudaram de cluster, "
+            f"{r['iteracoes']} iterações, ajuste em {r['tempo_ms']:.0f} ms "
+            f"(total {(time.perf_counter() - inicio) * 1000:.0f} ms)"
+        )
+    conn.close()
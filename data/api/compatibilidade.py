@@ -0,0 +1,240 @@
+# data/api/compatibilidade.py
+"""
+Índice de compatibilidade entre alimentos (bitsets).
+
+Mesmas regras de saoCompativeis / grupoEhCompativel (smartMealBuilder.ts),
+mas pré-computadas uma vez a partir da tabela alimentos:
+- contexto: máscara de bits dos contextos culinários do alimento
+  (contexto_culinario, lista '|'; "universal" também é um bit)
+- contexto_excluido: máscara dos contextos listados em incompativel_com
+- categoria: índice da categoria no vocabulário
+- exclui_categorias: bitset das categorias citadas em incompativel_com
+- exclui_alimentos: alimentos citados pelo nome em incompativel_com (raro)
+
+Checar um grupo vira alguns ANDs entre inteiros, sem split de strings.
+O índice é imutável; CacheIndice o reconstrói quando alimentos muda.
+"""
+
+import functools
+import itertools
+import re
+import sqlite3
+import threading
+from typing import Dict, FrozenSet, List, Optional, Sequence
+
+import numpy as np
+
+from busca import normalizar
+
+CONTEXTO_UNIVERSAL = "universal"
+
+
+@functools.lru_cache(maxsize=4096)
+def separar_lista(valor: Optional[str]) -> tuple:
+    """'Almoço|Jantar' ou 'Almoço, Jantar' -> ('almoco', 'jantar')"""
+    if not valor:
+        return ()
+    return tuple(normalizar(v) for v in re.split(r"[|,]", valor) if v.strip())
+
+
+@functools.lru_cache(maxsize=1024)
+def normalizar_categoria(categoria: Optional[str]) -> str:
+    return normalizar(categoria or "")
+
+
+def _mascara(valores, vocabulario: Dict[str, int]) -> int:
+    mascara = 0
+    for valor in valores:
+        if valor in vocabulario:
+            mascara |= 1 << vocabulario[valor]
+    return mascara
+
+
+class IndiceCompatibilidade:
+    """Índice colunar (uma posição por alimento) com máscaras de bits"""
+
+    def __init__(
+        self,
+        versao: int,
+        contextos: List[str],
+        categorias: List[str],
+        ids: List[int],
+        contexto: List[int],
+        contexto_excluido: List[int],
+        categoria: List[int],
+        exclui_categorias: List[int],
+        exclui_alimentos: Dict[int, FrozenSet[int]],
+    ):
+        self.versao = versao
+        self.contextos = contextos
+        self.categorias = categorias
+        self.ids = ids
+        self.contexto = contexto
+        self.contexto_excluido = contexto_excluido
+        self.categoria = categoria
+        self.exclui_categorias = exclui_categorias
+        self.exclui_alimentos = exclui_alimentos
+        self.posicao = {alimento_id: pos for pos, alimento_id in enumerate(ids)}
+        self._bit_universal = (
+            1 << contextos.index(CONTEXTO_UNIVERSAL) if CONTEXTO_UNIVERSAL in contextos else 0
+        )
+
+    @classmethod
+    def construir(cls, conn: sqlite3.Connection, versao: int = 0) -> "IndiceCompatibilidade":
+        linhas = conn.execute("""
+            SELECT id, nome, categoria, contexto_culinario, incompativel_com
+            FROM alimentos ORDER BY id
+        """).fetchall()
+
+        ids = [row[0] for row in linhas]
+        contextos_por_linha = [separar_lista(row[3]) for row in linhas]
+        incompativeis_por_linha = [separar_lista(row[4]) for row in linhas]
+        categorias_por_linha = [normalizar_categoria(row[2]) for row in linhas]
+
+        contextos = sorted(set(itertools.chain.from_iterable(contextos_por_linha)))
+        categorias = sorted(set(categorias_por_linha))
+        vocab_contexto = {c: i for i, c in enumerate(contextos)}
+        vocab_categoria = {c: i for i, c in enumerate(categorias)}
+
+        # Nomes só são normalizados se incompativel_com citar algo que não
+        # seja contexto nem categoria (na base atual, nunca)
+        pendentes = (
+            set(itertools.chain.from_iterable(incompativeis_por_linha))
+            - set(vocab_contexto) - set(vocab_categoria)
+        )
+        ids_por_nome: Dict[str, List[int]] = {}
+        if pendentes:
+            for pos, row in enumerate(linhas):
+                nome = normalizar(row[1] or "")
+                if nome in pendentes:
+                    ids_por_nome.setdefault(nome, []).append(pos)
+
+        exclui_alimentos = {}
+        for pos, incompativeis in enumerate(incompativeis_por_linha):
+            citados = frozenset(
+                outro for nome in incompativeis for outro in ids_por_nome.get(nome, ())
+            ) - {pos}
+            if citados:
+                exclui_alimentos[pos] = citados
+
+        return cls(
+            versao=versao,
+            contextos=contextos,
+            categorias=categorias,
+            ids=ids,
+            contexto=[_mascara(c, vocab_contexto) for c in contextos_por_linha],
+            contexto_excluido=[_mascara(i, vocab_contexto) for i in incompativeis_por_linha],
+            categoria=[vocab_categoria[c] for c in categorias_por_linha],
+            exclui_categorias=[_mascara(i, vocab_categoria) for i in incompativeis_por_linha],
+            exclui_alimentos=exclui_alimentos,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _par(self, a: int, b: int) -> bool:
+        """saoCompativeis por posição"""
+        if (self.contexto[a] | self.contexto[b]) & self._bit_universal:
+            return True
+        if not self.contexto[a] & self.contexto[b]:
+            return False
+        if self.categoria[a] == self.categoria[b]:
+            return False
+        if self.exclui_categorias[a] >> self.categoria[b] & 1:
+            return False
+        if self.exclui_categorias[b] >> self.categoria[a] & 1:
+            return False
+        return not (
+            b in self.exclui_alimentos.get(a, ()) or a in self.exclui_alimentos.get(b, ())
+        )
+
+    def compativeis(self, a_id: int, b_id: int) -> bool:
+        """KeyError se algum id não estiver no índice"""
+        return self._par(self.posicao[a_id], self.posicao[b_id])
+
+    def grupo_compativel(self, alimento_ids: Sequence[int]) -> bool:
+        """
+        grupoEhCompativel: todos os pares compatíveis. Alimentos universais
+        combinam com qualquer um e ficam de fora; para os demais, categorias
+        distintas e exclusões saem de um OR acumulado.
+        KeyError se algum id não estiver no índice.
+        """
+        grupo = [
+            p for p in (self.posicao[i] for i in alimento_ids)
+            if not self.contexto[p] & self._bit_universal
+        ]
+        categorias = 0
+        for p in grupo:
+            bit = 1 << self.categoria[p]
+            if categorias & bit:
+                return False
+            categorias |= bit
+        for p in grupo:
+            if self.exclui_categorias[p] & (categorias ^ (1 << self.categoria[p])):
+                return False
+        for a, b in itertools.combinations(grupo, 2):
+            if not self.contexto[a] & self.contexto[b]:
+                return False
+        if self.exclui_alimentos:
+            membros = set(grupo)
+            if any(self.exclui_alimentos.get(p, frozenset()) & membros for p in grupo):
+                return False
+        return True
+
+    def matriz(self, alimento_ids: Sequence[int]) -> np.ndarray:
+        """Matriz booleana NxN de compatibilidade par a par"""
+        posicoes = [self.posicao[i] for i in alimento_ids]
+        compat = np.ones((len(posicoes), len(posicoes)), dtype=bool)
+        for x, y in itertools.combinations(range(len(posicoes)), 2):
+            compat[x, y] = compat[y, x] = self._par(posicoes[x], posicoes[y])
+        return compat
+
+    def serializar(self) -> dict:
+        """
+        Formato colunar compacto para o frontend: listas alinhadas por
+        posição; exclusões só para quem tem alguma.
+        """
+        exclui_categorias = {}
+        for pos, mascara in enumerate(self.exclui_categorias):
+            if mascara:
+                exclui_categorias[self.ids[pos]] = [
+                    i for i in range(len(self.categorias)) if mascara >> i & 1
+                ]
+        return {
+            "versao": self.versao,
+            "contextos": self.contextos,
+            "categorias": self.categorias,
+            "ids": self.ids,
+            "contexto": self.contexto,
+            "contexto_excluido": self.contexto_excluido,
+            "categoria": self.categoria,
+            "exclui_categorias": exclui_categorias,
+            "exclui_alimentos": {
+                self.ids[pos]: sorted(self.ids[o] for o in outros)
+                for pos, outros in self.exclui_alimentos.items()
+            },
+        }
+
+
+class CacheIndice:
+    """
+    Índice do worker, reconstruído quando a versão da tabela alimentos
+    (alimentos_versao, a mesma do catálogo) muda ou após invalidar().
+    """
+
+    def __init__(self):
+        self._indice: Optional[IndiceCompatibilidade] = None
+        self._lock = threading.Lock()
+
+    def obter(self, conn: sqlite3.Connection, versao: int) -> IndiceCompatibilidade:
+        indice = self._indice
+        if indice is not None and indice.versao == versao:
+            return indice
+        with self._lock:
+            if self._indice is None or self._indice.versao != versao:
+                self._indice = IndiceCompatibilidade.construir(conn, versao)
+            return self._indice
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._indice = None
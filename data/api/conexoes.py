@@ -0,0 +1,228 @@
+# data/api/conexoes.py
+"""
+Pool de conexões SQLite thread-safe + execução fora do event loop.
+
+- N conexões somente-leitura (mode=ro) + 1 conexão de escrita (SQLite
+  aceita um único writer por vez; serializar aqui evita SQLITE_BUSY).
+- WAL: leitores não bloqueiam o writer e vice-versa.
+- PRAGMAs aplicados uma vez por conexão, na abertura.
+- ExecutorBanco roda o trabalho síncrono do sqlite3 num pool de threads
+  limitado, para que uma query lenta não trave o event loop do uvicorn.
+"""
+
+import asyncio
+import functools
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from metricas import marcar_fim_rota, marcar_inicio_rota
+
+# PRAGMAs por conexão (journal_mode=WAL é persistente e só é aplicado pelo writer)
+PRAGMAS = {
+    "synchronous": "NORMAL",        # seguro com WAL; fsync só no checkpoint
+    "foreign_keys": "ON",           # ON DELETE CASCADE de historico_itens/refeicoes_itens
+    "busy_timeout": "5000",         # ms esperando lock de outro processo (scripts/CLI)
+    "cache_size": "-16000",         # ~16 MB de page cache por conexão
+    "mmap_size": str(256 * 1024 * 1024),
+    "temp_store": "MEMORY",
+}
+
+TAMANHO_LEITURA = int(os.getenv("DB_POOL_LEITORES", "4"))
+TIMEOUT_AQUISICAO = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# Threads dedicadas ao banco (0 = executa direto no event loop, modo legado)
+MAX_CONCORRENCIA = int(os.getenv("DB_MAX_CONCORRENCIA", str(TAMANHO_LEITURA + 1)))
+TIMEOUT_QUERY = float(os.getenv("DB_TIMEOUT_QUERY", "30"))
+
+
+class PoolEsgotado(Exception):
+    """Nenhuma conexão livre dentro do timeout"""
+
+
+class PoolConexoes:
+    """Pool com conexões de leitura reaproveitáveis e um writer exclusivo"""
+
+    def __init__(
+        self,
+        db_path: Path,
+        tamanho_leitura: int = TAMANHO_LEITURA,
+        timeout: float = TIMEOUT_AQUISICAO,
+    ):
+        self.db_path = Path(db_path)
+        self.tamanho_leitura = tamanho_leitura
+        self.timeout = timeout
+
+        self._leitores: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._escritor: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=1)
+        self._todas = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "aquisicoes_leitura": 0,
+            "aquisicoes_escrita": 0,
+            "esperas": 0,
+            "timeouts": 0,
+            "espera_total_ms": 0.0,
+        }
+
+        # Writer primeiro: ativa WAL antes de abrir leitores
+        self._escritor.put(self._abrir(somente_leitura=False))
+        for _ in range(tamanho_leitura):
+            self._leitores.put(self._abrir(somente_leitura=True))
+
+    def _abrir(self, somente_leitura: bool) -> sqlite3.Connection:
+        if somente_leitura:
+            uri = f"{self.db_path.resolve().as_uri()}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+
+        for nome, valor in PRAGMAS.items():
+            conn.execute(f"PRAGMA {nome}={valor}")
+        conn.row_factory = sqlite3.Row
+        self._todas.append(conn)
+        return conn
+
+    def _adquirir(self, fila: queue.Queue, tipo: str) -> sqlite3.Connection:
+        try:
+            conn = fila.get_nowait()
+        except queue.Empty:
+            inicio = time.perf_counter()
+            with self._lock:
+                self._stats["esperas"] += 1
+            try:
+                conn = fila.get(timeout=self.timeout)
+            except queue.Empty:
+                with self._lock:
+                    self._stats["timeouts"] += 1
+                raise PoolEsgotado(f"Nenhuma conexão de {tipo} livre em {self.timeout}s")
+            with self._lock:
+                self._stats["espera_total_ms"] += (time.perf_counter() - inicio) * 1000
+
+        with self._lock:
+            self._stats[f"aquisicoes_{tipo}"] += 1
+        return conn
+
+    @contextmanager
+    def leitura(self) -> Iterator[sqlite3.Connection]:
+        """Conexão somente-leitura emprestada do pool"""
+        conn = self._adquirir(self._leitores, "leitura")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._leitores.put(conn)
+
+    @contextmanager
+    def escrita(self) -> Iterator[sqlite3.Connection]:
+        """
+        Conexão de escrita exclusiva.
+
+        Transação não commitada ao sair (ex.: HTTPException) sofre rollback.
+        """
+        conn = self._adquirir(self._escritor, "escrita")
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self._escritor.put(conn)
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["espera_total_ms"] = round(stats["espera_total_ms"], 1)
+        stats.update({
+            "leitores_total": self.tamanho_leitura,
+            "leitores_livres": self._leitores.qsize(),
+            "escritor_livre": self._escritor.qsize() == 1,
+        })
+        return stats
+
+    def fechar(self) -> None:
+        for conn in self._todas:
+            conn.close()
+        self._todas.clear()
+
+
+class TimeoutBanco(Exception):
+    """Trabalho no banco excedeu o timeout e foi interrompido"""
+
+
+class ExecutorBanco:
+    """
+    Executa funções síncronas de acesso ao banco num pool de threads limitado.
+
+    Cancelamento (ou timeout) da requisição chama conn.interrupt(): a query em
+    andamento aborta com OperationalError e a conexão volta limpa ao pool.
+    A corrotina só retorna depois que a thread terminou de usar a conexão.
+    """
+
+    def __init__(self, max_concorrencia: int = MAX_CONCORRENCIA, timeout: float = TIMEOUT_QUERY):
+        self.max_concorrencia = max_concorrencia
+        self.timeout = timeout
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if max_concorrencia > 0:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max_concorrencia, thread_name_prefix="sqlite"
+            )
+
+    @property
+    def inline(self) -> bool:
+        return self._executor is None
+
+    async def executar(self, conn: Optional[sqlite3.Connection], func: Callable[[], Any]) -> Any:
+        if self._executor is None:
+            return func()
+
+        trabalho = self._executor.submit(func)
+        futuro = asyncio.wrap_future(trabalho)
+        try:
+            return await asyncio.wait_for(asyncio.shield(futuro), self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            if not trabalho.cancel():
+                # Já em execução: aborta a query e espera a thread liberar a conexão
+                if conn is not None:
+                    conn.interrupt()
+                await asyncio.wait([futuro])
+                if not futuro.cancelled():
+                    futuro.exception()  # OperationalError('interrupted') esperado
+            if isinstance(e, asyncio.TimeoutError):
+                raise TimeoutBanco(f"Consulta excedeu {self.timeout}s e foi interrompida")
+            raise
+
+    def fechar(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def em_thread(executor: Callable[[], ExecutorBanco]):
+    """
+    Decorator para rotas: transforma uma função síncrona em rota async cujo
+    corpo roda no ExecutorBanco. A assinatura é preservada (FastAPI lê os
+    parâmetros via __wrapped__) e a conexão injetada em `conn`, se houver, é
+    a que recebe interrupt() no cancelamento.
+
+    Marca início/fim da rota na medição da requisição (metricas.py): o que
+    vem antes é validação/dependências e o que vem depois, serialização.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def rota(*args, **kwargs):
+            marcar_inicio_rota()
+            try:
+                return await executor().executar(
+                    kwargs.get("conn"), functools.partial(func, *args, **kwargs)
+                )
+            finally:
+                marcar_fim_rota()
+        return rota
+    return decorator
@@ -0,0 +1,172 @@
+# data/api/exportacao.py
+"""
+Exportação do histórico em streaming (NDJSON ou CSV).
+
+A consulta junta registro, totais, itens e alimento numa única varredura
+ordenada por registro (mais recentes primeiro) e depois pelos itens de
+cada registro. As linhas chegam em blocos (fetchmany) e cada exportador
+transforma um bloco em texto sem guardar o que já foi enviado:
+
+- NDJSON: um registro por linha, com itens e totais (formato de
+  GET /api/historico); só o registro em andamento fica em memória
+- CSV: uma linha por item (registro sem itens sai com as colunas do item
+  vazias), com kcal/macros da porção
+"""
+
+import csv
+import io
+import json
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from nutrientes import por_grama
+
+COLUNAS_REGISTRO = (
+    "id", "data", "refeicao_id", "nome", "tipo", "descricao", "tags", "criada_em",
+)
+MACROS = ("kcal", "prot", "carb", "gord")
+
+SQL_EXPORTACAO = """
+    SELECT
+        h.id, h.data, h.refeicao_id, h.nome, h.tipo, h.descricao, h.tags, h.criada_em,
+        t.kcal, t.prot, t.carb, t.gord,
+        hi.id, hi.alimento_id, hi.gramas, hi.ordem,
+        a.nome, a.porcao_g, a.kcal, a.prot_g, a.carb_g, a.gord_g
+    FROM historico_refeicoes h
+    LEFT JOIN historico_totais t ON t.historico_id = h.id
+    LEFT JOIN historico_itens hi ON hi.historico_id = h.id
+    LEFT JOIN alimentos a ON a.id = hi.alimento_id
+    WHERE 1=1{filtros}
+    ORDER BY h.criada_em DESC, h.id DESC, hi.ordem, hi.id
+"""
+
+# Posições das colunas de SQL_EXPORTACAO
+_TOTAIS = slice(8, 12)
+_ITEM = 12
+
+CABECALHO_CSV = (
+    "historico_id", "data", "refeicao_id", "nome", "tipo", "descricao", "tags", "criada_em",
+    "item_id", "alimento_id", "alimento_nome", "gramas", "ordem",
+    "kcal", "prot", "carb", "gord",
+)
+
+
+def _arredondar(valor: Optional[float], casas: int) -> float:
+    return round(float(valor or 0), casas)
+
+
+def _item(linha: Sequence) -> dict:
+    """Item no formato de carregar_itens_historico"""
+    return {
+        "id": linha[12],
+        "historico_id": linha[0],
+        "alimento_id": linha[13],
+        "gramas": linha[14],
+        "ordem": linha[15],
+        "alimento_nome": linha[16],
+        "alimento_porcao_g": linha[17],
+        "alimento_kcal": linha[18],
+        "alimento_prot_g": linha[19],
+        "alimento_carb_g": linha[20],
+        "alimento_gord_g": linha[21],
+    }
+
+
+def _macros_itens(linhas: Sequence[Sequence]) -> List[List[float]]:
+    """
+    kcal/prot/carb/gord de cada linha do bloco (vetorizado; linha sem item
+    ou porcao_g = 0 dá zeros)
+    """
+    if not linhas:
+        return []
+    # gramas, porcao_g, kcal..gord_g; None -> nan
+    colunas = np.array([(linha[14],) + tuple(linha[17:22]) for linha in linhas], dtype=float)
+    gramas = np.nan_to_num(colunas[:, 0:1])
+    return (gramas * por_grama(colunas[:, 1], colunas[:, 2:])).tolist()
+
+
+class ExportadorNDJSON:
+    media_type = "application/x-ndjson"
+    extensao = "ndjson"
+
+    def __init__(self):
+        self._registro: Optional[dict] = None
+
+    def cabecalho(self) -> str:
+        return ""
+
+    def _fechar(self) -> str:
+        registro, self._registro = self._registro, None
+        if registro is None:
+            return ""
+        macros = registro.pop("_macros")
+        if registro["totais"] is None:
+            registro["totais"] = {
+                m: _arredondar(sum(v[i] for v in macros), 1) for i, m in enumerate(MACROS)
+            }
+        return json.dumps(registro, ensure_ascii=False) + "\n"
+
+    def bloco(self, linhas: Sequence[Sequence]) -> str:
+        partes = []
+        for linha, macros in zip(linhas, _macros_itens(linhas)):
+            if self._registro is None or self._registro["id"] != linha[0]:
+                partes.append(self._fechar())
+                totais = linha[_TOTAIS]
+                self._registro = {
+                    **dict(zip(COLUNAS_REGISTRO, linha)),
+                    "itens": [],
+                    "totais": (
+                        None if totais[0] is None
+                        else {m: _arredondar(v, 1) for m, v in zip(MACROS, totais)}
+                    ),
+                    "_macros": [],
+                }
+            if linha[_ITEM] is not None:
+                self._registro["itens"].append(_item(linha))
+                self._registro["_macros"].append(macros)
+        return "".join(partes)
+
+    def fim(self) -> str:
+        return self._fechar()
+
+
+class ExportadorCSV:
+    media_type = "text/csv; charset=utf-8"
+    extensao = "csv"
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._writer = csv.writer(self._buffer, lineterminator="\n")
+
+    def _esvaziar(self) -> str:
+        texto = self._buffer.getvalue()
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        return texto
+
+    def cabecalho(self) -> str:
+        self._writer.writerow(CABECALHO_CSV)
+        return self._esvaziar()
+
+    def bloco(self, linhas: Sequence[Sequence]) -> str:
+        for linha, macros in zip(linhas, _macros_itens(linhas)):
+            registro = list(linha[:8])
+            if linha[_ITEM] is None:
+                self._writer.writerow(registro + [""] * (len(CABECALHO_CSV) - len(registro)))
+            else:
+                self._writer.writerow(
+                    registro
+                    + [linha[12], linha[13], linha[16], linha[14], linha[15]]
+                    + [_arredondar(v, 2) for v in macros]
+                )
+        return self._esvaziar()
+
+    def fim(self) -> str:
+        return ""
+
+
+EXPORTADORES = {
+    "ndjson": ExportadorNDJSON,
+    "csv": ExportadorCSV,
+}
@@ -1,16 +1,39 @@
 # data/api/gestor_alimentos_api.py
 
+import contextvars
 import logging
 import sqlite3
+from contextlib import aclosing
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Any, Optional, List, Dict
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, validator, Field
 
+import busca
+import clusters
+import exportacao
+import lote
+import montador
+import plano
+from cache_http import (
+    CompressaoMiddleware, ETagMiddleware, StaticFilesPrecomprimidos, VersoesTabelas,
+)
+from catalogo import COLUNAS_LISTAGEM, CacheCatalogo, suporta_filtro
+from compatibilidade import CacheIndice, IndiceCompatibilidade
+from conexoes import ExecutorBanco, PoolConexoes, PoolEsgotado, TimeoutBanco, em_thread
+from metricas import MetricasMiddleware, RegistroMetricas, medir_conexao
+from migracoes import COLUNA_ALIMENTO, CONTADORES_VERSAO, MACROS, aplicar_migracoes
+from nutrientes import (
+    CODIGOS_MACROS, CacheMatriz, MatrizNutrientes, NutrienteDesconhecido, listar_catalogo,
+    parse_codigos,
+)
+from paginacao import CursorInvalido, decodificar_cursor, fatiar_pagina
+from serializacao import RespostaJSON, compactar
+from substitutos import CATEGORIAS, CacheSubstitutos, SemEnergia
+
 # ============================
 # CONFIGURAÇÃO
 # ============================
@@ -18,7 +41,33 @@ from pydantic import BaseModel, validator, Field
 DB_PATH = Path(__file__).parent.parent / "db" / "alimentos.db"
 DIST_PATH = Path(__file__).parent.parent.parent / "dist"
 
-app = FastAPI(title="Gestor Alimentos API", version="2.0.0")
+# RespostaJSON: orjson quando instalado (rotas quentes devolvem a Response
+# pronta e pulam o jsonable_encoder; ver serializacao.py)
+app = FastAPI(title="Gestor Alimentos API", version="2.0.0", default_response_class=RespostaJSON)
+
+# Contadores de versão das tabelas (conexão sentinela aberta no startup)
+versoes_tabelas: Optional[VersoesTabelas] = None
+
+# Rotas com ETag -> contadores de versão dos quais a resposta depende
+ROTAS_ETAG = {
+    "/api/alimentos": ("alimentos_versao",),
+    "/api/categorias": ("alimentos_versao",),
+    "/api/refeicoes": ("refeicoes_versao", "alimentos_versao"),
+    "/api/refeicoes/tipos/disponiveis": ("refeicoes_versao",),
+}
+
+
+def _versoes_atuais() -> Optional[Dict[str, int]]:
+    return versoes_tabelas.atuais() if versoes_tabelas is not None else None
+
+
+# Histogramas por rota expostos em /metrics (API_METRICAS=0 desliga)
+registro_metricas = RegistroMetricas()
+
+# Ordem (de fora para dentro): CORS -> compressão -> ETag/304 -> métricas -> rotas
+app.add_middleware(MetricasMiddleware, registro=registro_metricas)
+app.add_middleware(ETagMiddleware, rotas=ROTAS_ETAG, versoes=_versoes_atuais)
+app.add_middleware(CompressaoMiddleware)
 
 # CORS - permite localhost (dev), Render e Railway (produção)
 app.add_middleware(
@@ -36,6 +85,83 @@ app.add_middleware(
 
 logger = logging.getLogger("gestor_alimentos_api")
 
+
+# Pool de conexões e executor de I/O do banco do worker (criados no startup)
+pool: Optional[PoolConexoes] = None
+executor_db: Optional[ExecutorBanco] = None
+
+# Catálogo de alimentos em memória e índice de compatibilidade (mesma versão)
+catalogo_alimentos = CacheCatalogo()
+indice_compat = CacheIndice()
+matriz_nutrientes = CacheMatriz()
+indice_substitutos = CacheSubstitutos()
+
+# Processos da busca do plano semanal (PLANO_PROCESSOS; criados no primeiro uso)
+pool_plano = plano.PoolBusca()
+
+
+def _executor() -> ExecutorBanco:
+    """Executor das rotas; DB_MAX_CONCORRENCIA limita as threads (0 = no event loop)"""
+    global executor_db
+    if executor_db is None:
+        executor_db = ExecutorBanco()
+    return executor_db
+
+
+@app.on_event("startup")
+def iniciar_banco():
+    """Aplica migrações pendentes e abre o pool de conexões"""
+    global pool, versoes_tabelas
+    if not DB_PATH.exists():
+        logger.error(f"Database not found: {DB_PATH}")
+        return
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        aplicadas = aplicar_migracoes(conn)
+        if aplicadas:
+            logger.info(f"Migrações aplicadas: {aplicadas}")
+    finally:
+        conn.close()
+
+    pool = PoolConexoes(DB_PATH)
+    versoes_tabelas = VersoesTabelas(DB_PATH, CONTADORES_VERSAO)
+    with pool.leitura() as conn:
+        obter_indice_compat(conn)
+    pool_plano.aquecer()
+
+
+@app.on_event("shutdown")
+def fechar_banco():
+    global pool, executor_db, versoes_tabelas
+    if executor_db is not None:
+        executor_db.fechar()
+        executor_db = None
+    if pool is not None:
+        pool.fechar()
+        pool = None
+    catalogo_alimentos.invalidar()
+    matriz_nutrientes.invalidar()
+    indice_substitutos.invalidar()
+    pool_plano.fechar()
+    if versoes_tabelas is not None:
+        versoes_tabelas.fechar()
+        versoes_tabelas = None
+
+
+@app.exception_handler(TimeoutBanco)
+async def timeout_banco_handler(request, exc: TimeoutBanco):
+    return JSONResponse(status_code=504, content={"detail": str(exc)})
+
+
+@app.exception_handler(CursorInvalido)
+async def cursor_invalido_handler(request, exc: CursorInvalido):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+@app.exception_handler(NutrienteDesconhecido)
+async def nutriente_desconhecido_handler(request, exc: NutrienteDesconhecido):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 # ============================
 # MODELOS PYDANTIC
 # ============================
@@ -84,6 +210,121 @@ class RefeicaoCreate(BaseModel):
         return v.strip()
 
 
+class RefeicaoClonar(BaseModel):
+    nome: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    tipo: Optional[str] = Field(default=None, min_length=1, max_length=50)
+    # Escala das gramas: fator direto ou kcal alvo da cópia (um ou outro)
+    fator: Optional[float] = Field(default=None, gt=0, le=10)
+    kcal: Optional[float] = Field(default=None, gt=0, le=10000)
+
+    @validator('nome')
+    def nome_nao_vazio(cls, v):
+        if v is not None and not v.strip():
+            raise ValueError('Nome não pode ser vazio')
+        return v.strip() if v is not None else v
+
+    @validator('kcal')
+    def fator_ou_kcal(cls, v, values):
+        if v is not None and values.get('fator') is not None:
+            raise ValueError('Informe fator ou kcal, não ambos')
+        return v
+
+
+OPERACOES_ITENS = ("adicionar", "alterar", "remover", "reordenar")
+
+
+class OperacaoItem(BaseModel):
+    op: str
+    # alterar/remover
+    item_id: Optional[int] = Field(default=None, gt=0)
+    # adicionar (obrigatórios); alterar (opcionais: troca alimento e/ou gramas)
+    alimento_id: Optional[int] = Field(default=None, gt=0)
+    gramas: Optional[float] = Field(default=None, gt=0, le=10000)
+    # adicionar: posição na lista (padrão: fim)
+    posicao: Optional[int] = Field(default=None, ge=0)
+    # reordenar: item_ids na nova ordem; os não listados vêm depois, na ordem atual
+    itens: Optional[List[int]] = None
+
+    @validator('op')
+    def op_valida(cls, v):
+        if v not in OPERACOES_ITENS:
+            raise ValueError(f"op deve ser uma de: {', '.join(OPERACOES_ITENS)}")
+        return v
+
+    @validator('itens', always=True)
+    def campos_da_op(cls, v, values):
+        op = values.get('op')
+        if op == 'adicionar' and (values.get('alimento_id') is None or values.get('gramas') is None):
+            raise ValueError('adicionar exige alimento_id e gramas')
+        if op in ('alterar', 'remover') and values.get('item_id') is None:
+            raise ValueError(f'{op} exige item_id')
+        if op == 'alterar' and values.get('alimento_id') is None and values.get('gramas') is None:
+            raise ValueError('alterar exige alimento_id e/ou gramas')
+        if op == 'reordenar' and not v:
+            raise ValueError('reordenar exige itens')
+        return v
+
+
+class ItensRefeicaoPatch(BaseModel):
+    operacoes: List[OperacaoItem] = Field(..., min_items=1, max_items=500)
+
+
+class SugestaoRefeicaoRequest(BaseModel):
+    prot: float = Field(..., ge=0, le=1000)
+    carb: float = Field(..., ge=0, le=1000)
+    gord: float = Field(..., ge=0, le=1000)
+    contexto_culinario: Optional[str] = None
+    quantidade: int = Field(default=5, ge=1, le=20)
+    min_gramas: float = Field(default=10, gt=0, le=1000)
+    max_gramas: float = Field(default=500, gt=0, le=2000)
+    tempo_max_ms: int = Field(default=250, ge=10, le=5000)
+    excluir_ids: List[int] = []
+
+    @validator('max_gramas')
+    def max_maior_que_min(cls, v, values):
+        if 'min_gramas' in values and v <= values['min_gramas']:
+            raise ValueError('max_gramas deve ser maior que min_gramas')
+        return v
+
+
+class SlotPlano(BaseModel):
+    tipo: str = Field(..., min_length=1, max_length=50)
+    # Fração da meta diária; None divide igualmente o que sobra no dia
+    fracao: Optional[float] = Field(default=None, gt=0, le=1)
+
+
+SLOTS_PADRAO = ("cafe", "almoco", "lanche", "jantar")
+
+
+class PlanoSemanalRequest(BaseModel):
+    kcal: float = Field(..., gt=0, le=10000)
+    prot: float = Field(..., ge=0, le=1000)
+    carb: float = Field(..., ge=0, le=1000)
+    gord: float = Field(..., ge=0, le=1000)
+    dias: int = Field(default=7, ge=1, le=14)
+    slots: List[SlotPlano] = Field(
+        default_factory=lambda: [SlotPlano(tipo=t) for t in SLOTS_PADRAO], min_items=1, max_items=8
+    )
+    # Slots diferentes por dia (ex.: jejum sem café); substitui `slots`
+    slots_por_dia: Optional[List[List[SlotPlano]]] = None
+    sem_repetir_refeicao_dias: int = Field(default=7, ge=0, le=14)
+    sem_repetir_alimento_dias: int = Field(default=1, ge=0, le=14)
+    preco_max: Optional[int] = Field(default=None, ge=1, le=4)
+    incluir_refeicoes_salvas: bool = True
+    tempo_max_ms: int = Field(default=2000, ge=100, le=10000)
+    semente: Optional[int] = None
+
+    @validator('slots_por_dia')
+    def slots_por_dia_validos(cls, v, values):
+        if v is None:
+            return v
+        if 'dias' in values and len(v) != values['dias']:
+            raise ValueError('slots_por_dia deve ter um item por dia')
+        if any(len(slots) > 8 for slots in v):
+            raise ValueError('No máximo 8 slots por dia')
+        return v
+
+
 class HistoricoCreate(BaseModel):
     data: date
     refeicao_id: Optional[int] = None
@@ -104,24 +345,314 @@ class HistoricoCreate(BaseModel):
 # HELPERS
 # ============================
 
-def get_db():
-    """Connection factory com row_factory"""
-    if not DB_PATH.exists():
+def _pool() -> PoolConexoes:
+    if pool is None:
         raise HTTPException(500, f"Database not found: {DB_PATH}")
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return pool
+
+
+def get_db():
+    """
+    Dependency: conexão somente-leitura do pool (row_factory = Row),
+    medida (queries/tempo) quando as métricas estão ativas
+    """
+    try:
+        with _pool().leitura() as conn:
+            yield medir_conexao(conn)
+    except PoolEsgotado as e:
+        raise HTTPException(503, str(e))
+
+
+def get_db_escrita():
+    """Dependency: conexão de escrita exclusiva (rollback automático se não commitar)"""
+    try:
+        with _pool().escrita() as conn:
+            yield medir_conexao(conn)
+    except PoolEsgotado as e:
+        raise HTTPException(503, str(e))
+
+
+async def corpo_lote(request: Request) -> List[Any]:
+    """
+    Dependency: entradas de um POST em lote (array JSON ou NDJSON).
+
+    Declarada antes de `conn` na rota para o corpo ser lido antes de a
+    conexão de escrita ser reservada.
+    """
+    try:
+        if lote.eh_ndjson(request.headers.get("content-type", "")):
+            return await lote.ler_ndjson(request.stream(), LOTE_MAX_ENTRADAS)
+        return lote.ler_json(await request.body(), LOTE_MAX_ENTRADAS)
+    except lote.LoteMuitoGrande as e:
+        raise HTTPException(413, str(e))
+    except lote.LoteInvalido as e:
+        raise HTTPException(400, str(e))
 
 
 def dict_from_row(row: sqlite3.Row) -> dict:
-    """Converte Row para dict"""
-    return {k: row[k] for k in row.keys()}
+    """Converte Row para dict (zip das colunas, sem lookup por nome)"""
+    return dict(zip(row.keys(), row))
 
 
 def alimento_exists(conn: sqlite3.Connection, alimento_id: int) -> bool:
-    """Verifica se alimento existe"""
-    cur = conn.execute("SELECT 1 FROM alimentos WHERE id = ?", (alimento_id,))
-    return cur.fetchone() is not None
+    """Verifica se alimento existe (catálogo em memória)"""
+    return catalogo_alimentos.obter(conn).existe(alimento_id)
+
+
+def obter_indice_compat(conn: sqlite3.Connection) -> IndiceCompatibilidade:
+    """Índice de compatibilidade na versão atual do catálogo"""
+    return indice_compat.obter(conn, catalogo_alimentos.obter(conn).versao)
+
+
+def obter_matriz_nutrientes(conn: sqlite3.Connection) -> MatrizNutrientes:
+    """Matriz alimentos x nutrientes na versão atual do catálogo"""
+    return matriz_nutrientes.obter(conn, catalogo_alimentos.obter(conn).versao)
+
+
+def _reservar_ids(conn: sqlite3.Connection, tabela: str, n: int) -> List[int]:
+    """
+    `n` ids consecutivos para INSERT com executemany (que não devolve
+    lastrowid por linha): após o maior id e a sequência do AUTOINCREMENT.
+
+    Só é seguro dentro de BEGIN IMMEDIATE: sem o lock de escrita, outra
+    conexão pode inserir com os mesmos ids antes do commit.
+    """
+    primeiro = conn.execute(f"""
+        SELECT MAX(
+            COALESCE((SELECT MAX(id) FROM {tabela}), 0),
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0)
+        ) + 1
+    """, (tabela,)).fetchone()[0]
+    return list(range(primeiro, primeiro + n))
+
+
+# ============================
+# PAGINAÇÃO POR CURSOR
+# ============================
+
+# Tamanho de página quando `limit` não é informado (legado=false)
+PAGINA_ALIMENTOS = 100
+PAGINA_REFEICOES = 50
+PAGINA_HISTORICO = 50
+
+
+def parametros_pagina(
+    escopo: str,
+    cursor: Optional[str],
+    legado: bool,
+    limit: Optional[int],
+    padrao: int,
+    tipos_chave: tuple,
+) -> tuple:
+    """
+    (tamanho da página, chave do cursor). Com legado=true não há cursor e
+    o tamanho é o `limit` informado (None = sem limite), como antes.
+    """
+    if legado:
+        if cursor:
+            raise HTTPException(400, "cursor não pode ser usado com legado=true")
+        return limit, None
+    apos = decodificar_cursor(escopo, cursor, tipos_chave) if cursor else None
+    return limit or padrao, apos
+
+
+# ============================
+# CARREGAMENTO EM LOTE DE ITENS
+# ============================
+# Evita N+1: os itens de todas as refeições/registros de uma página são
+# buscados com um único IN (...) e agrupados em Python.
+
+# Limite seguro de parâmetros por query (SQLITE_MAX_VARIABLE_NUMBER antigo = 999)
+IN_CHUNK_SIZE = 900
+
+# Máximo de entradas por POST em lote
+LOTE_MAX_ENTRADAS = 10000
+
+# Linhas por fetchmany na exportação em streaming
+EXPORTACAO_BLOCO = 1000
+
+ITENS_REFEICAO_SQL = """
+    SELECT
+        ri.id, ri.refeicao_id, ri.alimento_id, ri.gramas, ri.ordem,
+        a.nome as alimento_nome,
+        a.categoria,
+        a.porcao_g as alimento_porcao_g,
+        a.kcal as alimento_kcal,
+        a.prot_g as alimento_prot_g,
+        a.carb_g as alimento_carb_g,
+        a.gord_g as alimento_gord_g{extras}
+    FROM refeicoes_itens ri
+    JOIN alimentos a ON a.id = ri.alimento_id
+    WHERE ri.refeicao_id IN ({placeholders})
+    ORDER BY ri.refeicao_id, ri.ordem, ri.id
+"""
+
+# Colunas extras que a listagem de refeições sempre retornou
+ITENS_REFEICAO_EXTRAS = """,
+        a.cluster_nutricional,
+        a.contexto_culinario"""
+
+ITENS_HISTORICO_SQL = """
+    SELECT
+        hi.id, hi.historico_id, hi.alimento_id, hi.gramas, hi.ordem,
+        a.nome as alimento_nome,
+        a.porcao_g as alimento_porcao_g,
+        a.kcal as alimento_kcal,
+        a.prot_g as alimento_prot_g,
+        a.carb_g as alimento_carb_g,
+        a.gord_g as alimento_gord_g
+    FROM historico_itens hi
+    JOIN alimentos a ON a.id = hi.alimento_id
+    WHERE hi.historico_id IN ({placeholders})
+    ORDER BY hi.historico_id, hi.ordem, hi.id
+"""
+
+
+def _carregar_itens_em_lote(
+    conn: sqlite3.Connection,
+    sql: str,
+    chave: str,
+    ids: List[int],
+) -> Dict[int, List[dict]]:
+    """
+    Executa `sql` para todos os ids (em blocos de IN_CHUNK_SIZE) e agrupa
+    as linhas pelo id pai. Ids sem itens recebem lista vazia.
+    """
+    agrupados: Dict[int, List[dict]] = {i: [] for i in ids}
+    unicos = list(agrupados)
+
+    for inicio in range(0, len(unicos), IN_CHUNK_SIZE):
+        bloco = unicos[inicio:inicio + IN_CHUNK_SIZE]
+        placeholders = ",".join(["?"] * len(bloco))
+        cur = conn.execute(sql.format(placeholders=placeholders), bloco)
+        for row in cur:
+            item = dict_from_row(row)
+            agrupados[item[chave]].append(item)
+
+    return agrupados
+
+
+def carregar_itens_refeicoes(
+    conn: sqlite3.Connection,
+    refeicao_ids: List[int],
+    completo: bool = True,
+) -> Dict[int, List[dict]]:
+    """
+    Itens (com dados do alimento) de várias refeições, agrupados por refeicao_id.
+
+    completo=True inclui cluster_nutricional e contexto_culinario (formato da listagem).
+    """
+    sql = ITENS_REFEICAO_SQL.replace(
+        "{extras}", ITENS_REFEICAO_EXTRAS if completo else ""
+    )
+    return _carregar_itens_em_lote(conn, sql, "refeicao_id", refeicao_ids)
+
+
+def carregar_itens_historico(
+    conn: sqlite3.Connection,
+    historico_ids: List[int],
+) -> Dict[int, List[dict]]:
+    """Itens (com dados do alimento) de vários registros, agrupados por historico_id."""
+    return _carregar_itens_em_lote(conn, ITENS_HISTORICO_SQL, "historico_id", historico_ids)
+
+
+def arredondar_totais(kcal, prot, carb, gord) -> dict:
+    """Formato de resposta dos totais (1 casa decimal)"""
+    return {
+        "kcal": round(float(kcal or 0), 1),
+        "prot": round(float(prot or 0), 1),
+        "carb": round(float(carb or 0), 1),
+        "gord": round(float(gord or 0), 1),
+    }
+
+
+# ============================
+# TOTAIS MATERIALIZADOS
+# ============================
+# refeicoes_totais / historico_totais são mantidos por triggers (ver migracoes.py).
+# Leitura = lookup por chave primária; reparo de drift:
+#   python migracoes.py --reconstruir-totais
+
+TOTAIS_SQL = """
+    SELECT {fk}, kcal, prot, carb, gord
+    FROM {tabela}
+    WHERE {fk} IN ({placeholders})
+"""
+
+
+def _carregar_totais_em_lote(
+    conn: sqlite3.Connection,
+    tabela: str,
+    fk: str,
+    ids: List[int],
+) -> Dict[int, dict]:
+    totais: Dict[int, dict] = {}
+    unicos = list(dict.fromkeys(ids))
+
+    for inicio in range(0, len(unicos), IN_CHUNK_SIZE):
+        bloco = unicos[inicio:inicio + IN_CHUNK_SIZE]
+        sql = TOTAIS_SQL.format(fk=fk, tabela=tabela, placeholders=",".join(["?"] * len(bloco)))
+        for row in conn.execute(sql, bloco):
+            totais[row[0]] = arredondar_totais(row[1], row[2], row[3], row[4])
+
+    return totais
+
+
+def carregar_totais_refeicoes(conn: sqlite3.Connection, refeicao_ids: List[int]) -> Dict[int, dict]:
+    """Totais materializados de várias refeições, por refeicao_id"""
+    return _carregar_totais_em_lote(conn, "refeicoes_totais", "refeicao_id", refeicao_ids)
+
+
+def carregar_totais_historico(conn: sqlite3.Connection, historico_ids: List[int]) -> Dict[int, dict]:
+    """Totais materializados de vários registros, por historico_id"""
+    return _carregar_totais_em_lote(conn, "historico_totais", "historico_id", historico_ids)
+
+
+def montar_com_itens(
+    registros: List[dict],
+    itens_por_id: Dict[int, List[dict]],
+    matriz: MatrizNutrientes,
+    codigos: Optional[List[str]] = None,
+) -> List[dict]:
+    """
+    Anexa itens e totais a cada registro pai (refeição ou histórico).
+
+    Os totais (e "nutrientes", se `codigos` vier) saem do motor de totais
+    (nutrientes.py): um único gather + bincount para todos os itens da
+    página, em vez de somas por registro.
+    """
+    colunas = list(CODIGOS_MACROS) + [c for c in codigos or [] if c not in CODIGOS_MACROS]
+    pais, alimento_ids, gramas = [], [], []
+    for reg in registros:
+        for it in itens_por_id.get(reg["id"], []):
+            pais.append(reg["id"])
+            alimento_ids.append(it["alimento_id"])
+            gramas.append(it["gramas"])
+    por_pai = matriz.totais_por_pai(pais, alimento_ids, gramas, colunas)
+    sem_itens = [0.0] * len(CODIGOS_MACROS) + [None] * (len(colunas) - len(CODIGOS_MACROS))
+    posicoes = [colunas.index(c) for c in codigos or []]
+
+    resultado = []
+    for reg in registros:
+        valores = por_pai.get(reg["id"], sem_itens)
+        montado = {
+            **reg,
+            "itens": itens_por_id.get(reg["id"], []),
+            "totais": arredondar_totais(*valores[:len(CODIGOS_MACROS)]),
+        }
+        if codigos:
+            montado["nutrientes"] = {
+                c: (None if valores[p] is None else round(valores[p], 2))
+                for c, p in zip(codigos, posicoes)
+            }
+        resultado.append(montado)
+    return resultado
+
+
+NUTRIENTES_QUERY = Query(
+    None,
+    description="Totais extras: códigos separados por vírgula (ver /api/nutrientes) ou 'todos'",
+)
 
 
 # ============================
@@ -129,7 +660,8 @@ def alimento_exists(conn: sqlite3.Connection, alimento_id: int) -> bool:
 # ============================
 
 @app.post("/api/alimentos", status_code=201)
-async def criar_alimento(alimento: AlimentoCreate):
+@em_thread(_executor)
+def criar_alimento(alimento: AlimentoCreate, conn: sqlite3.Connection = Depends(get_db_escrita)):
     """
     Cria novo alimento na base de dados.
 
@@ -142,7 +674,6 @@ async def criar_alimento(alimento: AlimentoCreate):
     - id: ID do alimento criado
     - alimento: Objeto completo do alimento
     """
-    conn = get_db()
     cur = conn.cursor()
 
     # Verificar duplicata
@@ -151,7 +682,6 @@ async def criar_alimento(alimento: AlimentoCreate):
         (alimento.nome,)
     )
     if cur.fetchone():
-        conn.close()
         raise HTTPException(409, f"Alimento '{alimento.nome}' já existe")
 
     # Inserir
@@ -174,11 +704,21 @@ async def criar_alimento(alimento: AlimentoCreate):
 
     alimento_id = cur.lastrowid
     conn.commit()
+    catalogo_alimentos.invalidar()
+
+    # cluster_nutricional já veio do trigger (centróide mais próximo); com
+    # deriva acima do limiar, os centróides são reajustados aqui (~20 ms)
+    try:
+        reajuste = clusters.reajustar_se_necessario(conn)
+    except sqlite3.Error:
+        logger.exception("Falha ao reajustar clusters nutricionais")
+    else:
+        if reajuste is not None:
+            logger.info("Clusters nutricionais reajustados: %s", reajuste)
 
     # Buscar alimento criado
     cur.execute("SELECT * FROM alimentos WHERE id = ?", (alimento_id,))
     row = cur.fetchone()
-    conn.close()
 
     return {
         "id": alimento_id,
@@ -188,19 +728,62 @@ async def criar_alimento(alimento: AlimentoCreate):
 
 
 @app.get("/api/alimentos")
-async def listar_alimentos(
+@em_thread(_executor)
+def listar_alimentos(
     categoria: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
-    limit: Optional[int] = Query(None, ge=1, le=1000)
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    legado: bool = Query(False, description="Lista completa, sem cursor (formato antigo)"),
+    formato: str = Query("objetos", regex=r'^(objetos|compacto)$'),
+    conn: sqlite3.Connection = Depends(get_db),
 ):
-    """Lista alimentos com filtros opcionais"""
-    conn = get_db()
+    """
+    Lista alimentos com filtros opcionais, ordenados por nome.
+
+    Paginação por cursor: até `limit` alimentos (padrão 100) e `next_cursor`
+    para pedir a próxima página (null na última). Com legado=true, devolve
+    todos (ou até `limit`) sem next_cursor, como antes.
 
-    query = """
-        SELECT id, nome, categoria, porcao_g, kcal, prot_g, carb_g, gord_g,
-               contexto_culinario, incompativel_com, cluster_nutricional
-        FROM alimentos
+    formato=compacto troca `alimentos` por colunas + linhas:
+    {"colunas": ["id", "nome", ...], "linhas": [[1, "Arroz", ...], ...]}
+    (nomes das colunas uma vez só; ~40% menor sem compressão).
     """
+    tamanho, apos = parametros_pagina(
+        "alimentos", cursor, legado, limit, PAGINA_ALIMENTOS, (str, int)
+    )
+    # Uma linha a mais indica se existe próxima página
+    buscar = tamanho if legado or tamanho is None else tamanho + 1
+
+    if suporta_filtro(categoria) and suporta_filtro(search):
+        catalogo = catalogo_alimentos.obter(conn)
+        linhas = catalogo.listar_linhas(categoria, search, buscar, apos)
+    else:
+        linhas = _listar_alimentos_sql(conn, categoria, search, buscar, apos)
+
+    if not legado:
+        linhas, next_cursor = fatiar_pagina(linhas, tamanho, "alimentos", lambda a: (a[1], a[0]))
+
+    if formato == "compacto":
+        corpo = compactar(COLUNAS_LISTAGEM, linhas)
+    else:
+        corpo = {"alimentos": [dict(zip(COLUNAS_LISTAGEM, linha)) for linha in linhas]}
+    if not legado:
+        corpo["next_cursor"] = next_cursor
+    return RespostaJSON(corpo)
+
+
+def _listar_alimentos_sql(
+    conn: sqlite3.Connection,
+    categoria: Optional[str],
+    search: Optional[str],
+    limit: Optional[int],
+    apos: Optional[tuple],
+) -> List[tuple]:
+    """Curingas do LIKE (% e _) no filtro: consulta direto no SQLite (tuplas de COLUNAS_LISTAGEM)"""
+
+    catalogo_alimentos.registrar_falha()
+    query = f"SELECT {', '.join(COLUNAS_LISTAGEM)} FROM alimentos"
     conditions = []
     params = []
 
@@ -212,55 +795,180 @@ async def listar_alimentos(
         conditions.append("(nome LIKE ? OR categoria LIKE ?)")
         params.extend([f"%{search}%", f"%{search}%"])
 
+    if apos:
+        conditions.append("(nome, id) > (?, ?)")
+        params.extend(apos)
+
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
 
-    query += " ORDER BY nome"
+    query += " ORDER BY nome, id"
 
     if limit:
         query += f" LIMIT {limit}"
 
     cur = conn.execute(query, params)
-    rows = [dict_from_row(row) for row in cur.fetchall()]
-    conn.close()
+    return [tuple(row) for row in cur.fetchall()]
+
+
+@app.get("/api/alimentos/busca")
+@em_thread(_executor)
+def buscar_alimentos(
+    q: str = Query(..., min_length=1, max_length=200),
+    k: int = Query(20, ge=1, le=100),
+    categoria: Optional[str] = Query(None),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Busca ranqueada (top-k) de alimentos.
+
+    - Sem acentos: "feijao" encontra "Feijão"
+    - Cada palavra casa por prefixo ("fran" -> "Frango")
+    - Ordena por BM25 (nome > categoria > contexto) com boost para nomes
+      que começam com o texto buscado
+
+    Cada alimento retorna com `score` (maior = mais relevante).
+    """
+    if busca.indice_existe(conn):
+        alimentos = busca.buscar(conn, q, k, categoria)
+    else:
+        alimentos = busca.buscar_sem_fts(conn, q, k, categoria)
+
+    return {"alimentos": alimentos, "count": len(alimentos)}
+
+
+@app.get("/api/alimentos/compatibilidade")
+@em_thread(_executor)
+def obter_indice_compatibilidade(conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Índice de compatibilidade pré-computado (formato colunar).
+
+    Listas alinhadas por posição (ids[i] <-> contexto[i] ...):
+    - contexto / contexto_excluido: máscaras de bits sobre `contextos`
+    - categoria: índice em `categorias`
+    - exclui_categorias / exclui_alimentos: só alimentos com exclusões
+
+    Dois alimentos combinam se algum tem o bit "universal", ou se têm um
+    bit de contexto em comum, categorias diferentes e nenhum exclui o outro.
+    `versao` muda sempre que o índice é reconstruído.
+    """
+    return RespostaJSON(obter_indice_compat(conn).serializar())
+
+
+@app.get("/api/alimentos/compatibilidade/grupo")
+@em_thread(_executor)
+def verificar_grupo_compativel(
+    ids: List[int] = Query(..., description="IDs dos alimentos do grupo"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """Verifica se todos os alimentos do grupo combinam entre si (par a par)"""
+    indice = obter_indice_compat(conn)
+    faltando = [i for i in ids if i not in indice.posicao]
+    if faltando:
+        raise HTTPException(404, f"Alimentos não encontrados: {faltando}")
 
-    return {"alimentos": rows}
+    return {"ids": ids, "compativel": indice.grupo_compativel(ids), "versao": indice.versao}
 
 
 @app.get("/api/alimentos/{id}")
-async def obter_alimento(id: int):
+@em_thread(_executor)
+def obter_alimento(id: int, conn: sqlite3.Connection = Depends(get_db)):
     """Busca alimento por ID"""
-    conn = get_db()
-    cur = conn.execute(
-        "SELECT * FROM alimentos WHERE id = ?",
-        (id,)
-    )
-    row = cur.fetchone()
-    conn.close()
+    alimento = catalogo_alimentos.obter(conn).obter(id)
 
-    if not row:
+    if not alimento:
         raise HTTPException(404, f"Alimento {id} não encontrado")
 
-    return dict_from_row(row)
+    return alimento
+
+
+@app.get("/api/alimentos/{id}/substitutos")
+@em_thread(_executor)
+def listar_substitutos(
+    id: int,
+    k: int = Query(10, ge=1, le=50, description="Quantos substitutos"),
+    gramas: Optional[float] = Query(None, gt=0, le=5000, description="Gramas do original (padrão: porcao_g)"),
+    categoria: str = Query("mesma", regex=r'^(' + '|'.join(CATEGORIAS) + r')$'),
+    contexto: Optional[str] = Query(None, description="Contexto culinário (padrão: os do original)"),
+    nutrientes: Optional[str] = Query(None, description="Nutrientes extras no perfil, ex: fibra,sodio"),
+    excluir: List[int] = Query([], description="IDs a ignorar (ex.: itens já na refeição)"),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Os k alimentos de perfil nutricional mais próximo, para trocar um item.
+
+    - Perfil: prot/carb/gord por kcal (mais os `nutrientes` pedidos),
+      padronizados sobre o catálogo; `distancia` é euclidiana nesse espaço
+    - Candidatos: usáveis num contexto do original (ou em `contexto`),
+      da mesma categoria, de outra ou de qualquer uma
+    - `gramas` de cada substituto igualam as kcal do original
+    """
+    catalogo = catalogo_alimentos.obter(conn)
+    original = catalogo.obter(id)
+    if not original:
+        raise HTTPException(404, f"Alimento {id} não encontrado")
+
+    indice = indice_substitutos.obter(obter_matriz_nutrientes(conn), obter_indice_compat(conn))
+    try:
+        resultado = indice.buscar(
+            id,
+            k=k,
+            gramas=gramas,
+            porcao_g=original["porcao_g"],
+            categoria=categoria,
+            contexto=contexto,
+            nutrientes=parse_codigos(nutrientes),
+            excluir_ids=excluir,
+        )
+    except SemEnergia as e:
+        raise HTTPException(400, str(e))
+
+    colunas = catalogo.colunas
+    for item in resultado["substitutos"]:
+        pos = catalogo.posicao[item["alimento_id"]]
+        item["alimento_nome"] = colunas["nome"][pos]
+        item["categoria"] = colunas["categoria"][pos]
+        item["contexto_culinario"] = colunas["contexto_culinario"][pos]
+
+    substitutos = resultado.pop("substitutos")
+    perfil, candidatos = resultado.pop("perfil"), resultado.pop("candidatos")
+    resultado["alimento_nome"] = original["nome"]
+    resultado["categoria"] = original["categoria"]
+    return RespostaJSON({
+        "alimento": resultado,
+        "substitutos": substitutos,
+        "perfil": perfil,
+        "candidatos": candidatos,
+        "versao": indice.versao,
+    })
 
 
 @app.get('/api/categorias')
-async def get_categorias():
+@em_thread(_executor)
+def get_categorias(conn: sqlite3.Connection = Depends(get_db)):
     """Get all unique categories from database"""
-    conn = get_db()
-    cur = conn.execute('SELECT DISTINCT categoria FROM alimentos ORDER BY categoria')
-    categorias = [row[0] for row in cur.fetchall()]
-    conn.close()
+    categorias = catalogo_alimentos.obter(conn).categorias
 
     return {'categorias': categorias}
 
 
+@app.get("/api/nutrientes")
+@em_thread(_executor)
+def listar_nutrientes(conn: sqlite3.Connection = Depends(get_db)):
+    """
+    Nutrientes aceitos em `nutrientes=` (refeições e histórico), com
+    unidade e quantos alimentos têm o dado
+    """
+    return {"nutrientes": listar_catalogo(obter_matriz_nutrientes(conn))}
+
+
 # ============================
 # ENDPOINTS: REFEIÇÕES
 # ============================
 
 @app.post("/api/refeicoes", status_code=201)
-async def criar_refeicao(refeicao: RefeicaoCreate):
+@em_thread(_executor)
+def criar_refeicao(refeicao: RefeicaoCreate, conn: sqlite3.Connection = Depends(get_db_escrita)):
     """
     Cria nova refeição com itens.
 
@@ -274,14 +982,12 @@ async def criar_refeicao(refeicao: RefeicaoCreate):
     - id: ID da refeição criada
     - totais: Totais nutricionais calculados
     """
-    conn = get_db()
     cur = conn.cursor()
 
     try:
         # Validar que todos os alimentos existem
         for item in refeicao.itens:
             if not alimento_exists(conn, item.alimento_id):
-                conn.close()
                 raise HTTPException(404, f"Alimento {item.alimento_id} não encontrado")
 
         # Inserir refeição
@@ -300,63 +1006,295 @@ async def criar_refeicao(refeicao: RefeicaoCreate):
         refeicao_id = cur.lastrowid
 
         # Inserir itens
-        for ordem, item in enumerate(refeicao.itens):
-            cur.execute("""
-                INSERT INTO refeicoes_itens (
-                    refeicao_id, alimento_id, gramas, ordem
-                ) VALUES (?, ?, ?, ?)
-            """, (refeicao_id, item.alimento_id, item.gramas, ordem))
+        cur.executemany("""
+            INSERT INTO refeicoes_itens (
+                refeicao_id, alimento_id, gramas, ordem
+            ) VALUES (?, ?, ?, ?)
+        """, [
+            (refeicao_id, item.alimento_id, item.gramas, ordem)
+            for ordem, item in enumerate(refeicao.itens)
+        ])
 
         conn.commit()
 
-        # Calcular totais
-        cur.execute("""
-            SELECT
-                SUM(ri.gramas / a.porcao_g * a.kcal) as kcal_total,
-                SUM(ri.gramas / a.porcao_g * a.prot_g) as prot_total,
-                SUM(ri.gramas / a.porcao_g * a.carb_g) as carb_total,
-                SUM(ri.gramas / a.porcao_g * a.gord_g) as gord_total
-            FROM refeicoes_itens ri
-            JOIN alimentos a ON a.id = ri.alimento_id
-            WHERE ri.refeicao_id = ?
-        """, (refeicao_id,))
-
-        totais_row = cur.fetchone()
-        conn.close()
+        # Totais mantidos pelos triggers de refeicoes_totais
+        totais = carregar_totais_refeicoes(conn, [refeicao_id])
 
         return {
             "id": refeicao_id,
             "nome": refeicao.nome,
             "mensagem": f"Refeição '{refeicao.nome}' criada com sucesso",
-            "totais": {
-                "kcal": round(totais_row["kcal_total"] or 0, 1),
-                "prot": round(totais_row["prot_total"] or 0, 1),
-                "carb": round(totais_row["carb_total"] or 0, 1),
-                "gord": round(totais_row["gord_total"] or 0, 1),
-            }
+            "totais": totais.get(refeicao_id, arredondar_totais(0, 0, 0, 0)),
         }
 
     except sqlite3.IntegrityError as e:
         conn.rollback()
-        conn.close()
         raise HTTPException(400, f"Erro de integridade: {str(e)}")
 
 
+def _inserir_refeicoes_lote(conn: sqlite3.Connection, refeicoes: List[RefeicaoCreate]) -> List[int]:
+    """
+    Insere as refeições (e itens) numa única transação com executemany.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    ids = _reservar_ids(conn, "refeicoes", len(refeicoes))
+
+    conn.executemany("""
+        INSERT INTO refeicoes (
+            id, nome, tipo, contexto_culinario, descricao, tags
+        ) VALUES (?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            refeicao_id, r.nome, r.tipo, r.contexto_culinario or r.tipo,
+            r.descricao or "", r.tags or "",
+        )
+        for refeicao_id, r in zip(ids, refeicoes)
+    ])
+    conn.executemany("""
+        INSERT INTO refeicoes_itens (refeicao_id, alimento_id, gramas, ordem)
+        VALUES (?, ?, ?, ?)
+    """, [
+        (refeicao_id, item.alimento_id, item.gramas, ordem)
+        for refeicao_id, r in zip(ids, refeicoes)
+        for ordem, item in enumerate(r.itens)
+    ])
+
+    conn.commit()
+    return ids
+
+
+@app.post("/api/refeicoes/lote", status_code=201)
+@em_thread(_executor)
+def criar_refeicoes_lote(
+    atomico: bool = Query(False, description="Se alguma entrada falhar, nada é gravado"),
+    entradas: List[Any] = Depends(corpo_lote),
+    conn: sqlite3.Connection = Depends(get_db_escrita),
+):
+    """
+    Cria várias refeições de uma vez (ex.: biblioteca de modelos).
+
+    Corpo: array JSON de refeições (mesmo formato de POST /api/refeicoes) ou
+    NDJSON (Content-Type application/x-ndjson), até LOTE_MAX_ENTRADAS.
+
+    Os alimento_id de todas as entradas são validados contra o catálogo em
+    memória e as entradas válidas gravadas numa única transação. Com
+    atomico=true, qualquer erro cancela o lote inteiro (422).
+
+    Retorna, na ordem das entradas:
+    - {"indice", "id", "totais"} para refeições criadas
+    - {"indice", "erro"} para entradas rejeitadas
+    """
+    validas, erros = lote.validar_entradas(entradas, RefeicaoCreate)
+
+    catalogo = catalogo_alimentos.obter(conn)
+    refeicoes = []
+    for indice, refeicao in validas:
+        ausente = next(
+            (i.alimento_id for i in refeicao.itens if not catalogo.existe(i.alimento_id)), None
+        )
+        if ausente is not None:
+            erros[indice] = f"Alimento {ausente} não encontrado"
+            continue
+        refeicoes.append((indice, refeicao))
+
+    resultados = {
+        indice: {"indice": indice, "erro": mensagem} for indice, mensagem in erros.items()
+    }
+    if atomico and erros:
+        return JSONResponse(status_code=422, content={
+            "detail": f"{len(erros)} entrada(s) com erro; nada foi gravado",
+            "inseridos": 0,
+            "erros": len(erros),
+            "resultados": [resultados[i] for i in sorted(resultados)],
+        })
+
+    try:
+        ids = _inserir_refeicoes_lote(conn, [r for _, r in refeicoes]) if refeicoes else []
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HTTPException(400, f"Erro de integridade: {str(e)}")
+
+    totais = carregar_totais_refeicoes(conn, ids)
+    for (indice, _), refeicao_id in zip(refeicoes, ids):
+        resultados[indice] = {
+            "indice": indice,
+            "id": refeicao_id,
+            "totais": totais.get(refeicao_id, arredondar_totais(0, 0, 0, 0)),
+        }
+
+    return {
+        "inseridos": len(ids),
+        "erros": len(erros),
+        "resultados": [resultados[i] for i in sorted(resultados)],
+    }
+
+
+@app.post("/api/refeicoes/{id}/clonar", status_code=201)
+@em_thread(_executor)
+def clonar_refeicao(
+    id: int,
+    pedido: Optional[RefeicaoClonar] = None,
+    conn: sqlite3.Connection = Depends(get_db_escrita),
+):
+    """
+    Copia uma refeição (cabeçalho e itens) com as gramas escaladas.
+
+    - nome: padrão "<nome original> (cópia)"; tipo: padrão o original
+    - fator: multiplica as gramas; kcal: fator = kcal / kcal da original
+    - Gramas arredondadas a 0,1 g
+
+    Cópia feita no SQLite (INSERT ... SELECT), numa transação.
+    """
+    pedido = pedido or RefeicaoClonar()
+    origem = conn.execute("""
+        SELECT r.nome, t.kcal
+        FROM refeicoes r LEFT JOIN refeicoes_totais t ON t.refeicao_id = r.id
+        WHERE r.id = ?
+    """, (id,)).fetchone()
+    if origem is None:
+        raise HTTPException(404, "Refeição não encontrada")
+
+    fator = pedido.fator or 1.0
+    if pedido.kcal is not None:
+        if not origem[1] or origem[1] <= 0:
+            raise HTTPException(400, "Refeição sem kcal: use fator em vez de kcal")
+        fator = pedido.kcal / origem[1]
+    nome = pedido.nome or f"{origem[0]} (cópia)"
+
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        cur.execute("""
+            INSERT INTO refeicoes (nome, tipo, contexto_culinario, descricao, tags)
+            SELECT ?, COALESCE(?, tipo), contexto_culinario, descricao, tags
+            FROM refeicoes WHERE id = ?
+        """, (nome[:200], pedido.tipo, id))
+        refeicao_id = cur.lastrowid
+        cur.execute("""
+            INSERT INTO refeicoes_itens (refeicao_id, alimento_id, gramas, ordem)
+            SELECT ?, alimento_id, MAX(ROUND(gramas * ?, 1), 0.1), ordem
+            FROM refeicoes_itens
+            WHERE refeicao_id = ?
+            ORDER BY ordem, id
+        """, (refeicao_id, fator, id))
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HTTPException(400, f"Erro de integridade: {str(e)}")
+
+    return {
+        "id": refeicao_id,
+        "nome": nome[:200],
+        "origem_id": id,
+        "fator": round(fator, 4),
+        "totais": carregar_totais_refeicoes(conn, [refeicao_id]).get(
+            refeicao_id, arredondar_totais(0, 0, 0, 0)
+        ),
+    }
+
+
+@app.post("/api/refeicoes/sugerir")
+@em_thread(_executor)
+def sugerir_refeicoes(
+    pedido: SugestaoRefeicaoRequest,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Sugere refeições (2-3 alimentos) que atingem a meta P/C/G.
+
+    - Candidatos: alimentos do contexto_culinario pedido (respeitando
+      incompativel_com), agrupados por cluster_nutricional e podados aos
+      montador.CANDIDATOS_POR_PAPEL mais puros por papel (P/C/G)
+    - Porções resolvidas por mínimos quadrados com limites (NumPy)
+    - tempo_max_ms: orçamento de tempo; `completo=false` indica que a busca
+      parou no limite e retornou o melhor encontrado até ali
+
+    Retorna refeições ordenadas por erro, cada uma com itens (gramas e
+    macros), totais e erro_percentual.
+    """
+    return montador.sugerir(
+        conn,
+        meta={"prot": pedido.prot, "carb": pedido.carb, "gord": pedido.gord},
+        contexto=pedido.contexto_culinario,
+        quantidade=pedido.quantidade,
+        min_gramas=pedido.min_gramas,
+        max_gramas=pedido.max_gramas,
+        tempo_max_ms=pedido.tempo_max_ms,
+        excluir_ids=pedido.excluir_ids,
+        indice=obter_indice_compat(conn),
+    )
+
+
+@app.post("/api/plano/semanal")
+@em_thread(_executor)
+def gerar_plano_semanal(
+    pedido: PlanoSemanalRequest,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Plano de `dias` dias: uma refeição por slot, perto da meta diária.
+
+    - Candidatos por slot: refeições montadas (montador) para a fração da
+      meta e refeições salvas do mesmo tipo com porções escaladas
+    - Variedade: sem repetir alimento em `sem_repetir_alimento_dias` nem
+      refeição salva em `sem_repetir_refeicao_dias` (violações são
+      penalizadas e contadas em resumo.violacoes_variedade)
+    - preco_max: 1-4 ($ a $$$$); alimentos mais caros ficam de fora
+    - tempo_max_ms: prazo total; a busca roda em PLANO_PROCESSOS processos
+      e devolve o melhor plano até o prazo (`busca.completo=false` indica
+      que parou antes de convergir)
+    """
+    if pedido.slots_por_dia is not None:
+        slots = pedido.slots_por_dia
+    else:
+        slots = [pedido.slots] * pedido.dias
+    slots = [[(busca.normalizar(s.tipo), s.fracao) for s in dia] for dia in slots]
+    for dia in slots:
+        if sum(f for _, f in dia if f is not None) > 1.0001:
+            raise HTTPException(400, "Soma das frações dos slots de um dia maior que 1")
+
+    return plano.planejar(
+        conn,
+        meta={"kcal": pedido.kcal, "prot": pedido.prot, "carb": pedido.carb, "gord": pedido.gord},
+        slots_por_dia=slots,
+        sem_repetir_alimento_dias=pedido.sem_repetir_alimento_dias,
+        sem_repetir_refeicao_dias=pedido.sem_repetir_refeicao_dias,
+        preco_max=pedido.preco_max,
+        incluir_refeicoes_salvas=pedido.incluir_refeicoes_salvas,
+        tempo_max_ms=pedido.tempo_max_ms,
+        semente=pedido.semente,
+        indice=obter_indice_compat(conn),
+        pool=pool_plano,
+    )
+
+
 @app.get("/api/refeicoes")
-async def listar_refeicoes(
+@em_thread(_executor)
+def listar_refeicoes(
     tipo: Optional[str] = Query(None),
-    limit: Optional[int] = Query(50, ge=1, le=100),
-    ativa: bool = Query(True)
+    limit: Optional[int] = Query(PAGINA_REFEICOES, ge=1, le=100),
+    ativa: bool = Query(True),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    legado: bool = Query(False, description="Sem cursor nem next_cursor (formato antigo)"),
+    nutrientes: Optional[str] = NUTRIENTES_QUERY,
+    conn: sqlite3.Connection = Depends(get_db),
 ):
     """
-    Lista refeições com itens e totais calculados.
+    Lista refeições com itens e totais calculados (mais recentes primeiro).
 
     Retorna cada refeição com:
     - Dados da refeição
     - Lista de itens (com dados do alimento)
     - Totais nutricionais pré-calculados
+    - nutrientes=fibra,sodio: totais desses nutrientes em "nutrientes"
+
+    Paginação por cursor em (criada_em, id): `next_cursor` pede a próxima
+    página (null na última). legado=true mantém a resposta antiga.
     """
-    conn = get_db()
+    tamanho, apos = parametros_pagina(
+        "refeicoes", cursor, legado, limit, PAGINA_REFEICOES, (str, int)
+    )
+    codigos = parse_codigos(nutrientes)
 
     # Buscar refeições
     query = "SELECT * FROM refeicoes WHERE ativa = ?"
@@ -366,144 +1304,78 @@ async def listar_refeicoes(
         query += " AND tipo = ?"
         params.append(tipo)
 
-    query += " ORDER BY criada_em DESC LIMIT ?"
-    params.append(limit)
+    if apos:
+        query += " AND (criada_em, id) < (?, ?)"
+        params.extend(apos)
+
+    query += " ORDER BY criada_em DESC, id DESC LIMIT ?"
+    params.append(tamanho if legado else tamanho + 1)
 
     cur = conn.execute(query, params)
     refeicoes = [dict_from_row(row) for row in cur.fetchall()]
+    refeicoes, next_cursor = fatiar_pagina(
+        refeicoes, tamanho, "refeicoes", lambda r: (r["criada_em"], r["id"])
+    )
 
-    # Para cada refeição, buscar itens e calcular totais
-    resultado = []
-    for ref in refeicoes:
-        # Buscar itens com JOIN
-        cur.execute("""
-            SELECT
-                ri.id, ri.refeicao_id, ri.alimento_id, ri.gramas, ri.ordem,
-                a.nome as alimento_nome,
-                a.categoria,
-                a.porcao_g as alimento_porcao_g,
-                a.kcal as alimento_kcal,
-                a.prot_g as alimento_prot_g,
-                a.carb_g as alimento_carb_g,
-                a.gord_g as alimento_gord_g,
-                a.cluster_nutricional,
-                a.contexto_culinario
-            FROM refeicoes_itens ri
-            JOIN alimentos a ON a.id = ri.alimento_id
-            WHERE ri.refeicao_id = ?
-            ORDER BY ri.ordem
-        """, (ref["id"],))
-
-        itens = [dict_from_row(row) for row in cur.fetchall()]
-
-        # Calcular totais
-        kcal_total = sum(
-            (it["gramas"] / it["alimento_porcao_g"]) * it["alimento_kcal"]
-            for it in itens
-        )
-        prot_total = sum(
-            (it["gramas"] / it["alimento_porcao_g"]) * it["alimento_prot_g"]
-            for it in itens
-        )
-        carb_total = sum(
-            (it["gramas"] / it["alimento_porcao_g"]) * it["alimento_carb_g"]
-            for it in itens
-        )
-        gord_total = sum(
-            (it["gramas"] / it["alimento_porcao_g"]) * it["alimento_gord_g"]
-            for it in itens
-        )
-
-        resultado.append({
-            **ref,
-            "itens": itens,
-            "totais": {
-                "kcal": round(kcal_total, 1),
-                "prot": round(prot_total, 1),
-                "carb": round(carb_total, 1),
-                "gord": round(gord_total, 1),
-            }
-        })
-
-    conn.close()
+    # Buscar itens de todas as refeições da página em lote
+    ids = [ref["id"] for ref in refeicoes]
+    resultado = montar_com_itens(
+        refeicoes,
+        carregar_itens_refeicoes(conn, ids),
+        obter_matriz_nutrientes(conn),
+        codigos,
+    )
 
     # Manter compatibilidade com frontend antigo
-    return {"refeicoes": resultado, "count": len(resultado)}
+    if legado:
+        return RespostaJSON({"refeicoes": resultado, "count": len(resultado)})
+    return RespostaJSON({"refeicoes": resultado, "count": len(resultado), "next_cursor": next_cursor})
 
 
 @app.get("/api/refeicoes/{id}")
-async def obter_refeicao(id: int):
+@em_thread(_executor)
+def obter_refeicao(
+    id: int,
+    nutrientes: Optional[str] = NUTRIENTES_QUERY,
+    conn: sqlite3.Connection = Depends(get_db),
+):
     """Busca refeição por ID com itens e totais"""
-    conn = get_db()
+    codigos = parse_codigos(nutrientes)
 
     # Buscar refeição
     cur = conn.execute("SELECT * FROM refeicoes WHERE id = ?", (id,))
     ref_row = cur.fetchone()
 
     if not ref_row:
-        conn.close()
         raise HTTPException(404, f"Refeição {id} não encontrada")
 
     refeicao = dict_from_row(ref_row)
 
     # Buscar itens
-    cur.execute("""
-        SELECT
-            ri.id, ri.refeicao_id, ri.alimento_id, ri.gramas, ri.ordem,
-            a.nome as alimento_nome,
-            a.categoria,
-            a.porcao_g as alimento_porcao_g,
-            a.kcal as alimento_kcal,
-            a.prot_g as alimento_prot_g,
-            a.carb_g as alimento_carb_g,
-            a.gord_g as alimento_gord_g
-        FROM refeicoes_itens ri
-        JOIN alimentos a ON a.id = ri.alimento_id
-        WHERE ri.refeicao_id = ?
-        ORDER BY ri.ordem
-    """, (id,))
-
-    itens = [dict_from_row(row) for row in cur.fetchall()]
-    conn.close()
-
-    # Calcular totais
-    kcal_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_kcal"] for it in itens)
-    prot_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_prot_g"] for it in itens)
-    carb_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_carb_g"] for it in itens)
-    gord_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_gord_g"] for it in itens)
+    itens = carregar_itens_refeicoes(conn, [id], completo=False)
 
-    return {
-        **refeicao,
-        "itens": itens,
-        "totais": {
-            "kcal": round(kcal_total, 1),
-            "prot": round(prot_total, 1),
-            "carb": round(carb_total, 1),
-            "gord": round(gord_total, 1),
-        }
-    }
+    return montar_com_itens([refeicao], itens, obter_matriz_nutrientes(conn), codigos)[0]
 
 
 @app.get('/api/refeicoes/tipos/disponiveis')
-async def get_tipos_disponiveis():
+@em_thread(_executor)
+def get_tipos_disponiveis(conn: sqlite3.Connection = Depends(get_db)):
     """Get list of available meal types"""
-    conn = get_db()
     cursor = conn.cursor()
 
     cursor.execute("SELECT DISTINCT tipo FROM refeicoes WHERE ativa = 1 ORDER BY tipo")
     tipos = [row[0] for row in cursor.fetchall()]
 
-    conn.close()
-
     return {"tipos": tipos}
 
 
 @app.put("/api/refeicoes/{id}")
-async def atualizar_refeicao(id: int, updates: dict):
+@em_thread(_executor)
+def atualizar_refeicao(id: int, updates: dict):
     """
     Atualiza campos básicos da refeição (nome, tipo, descricao, tags).
 
-    NOTA: Para alterar itens (alimentos), use POST /api/refeicoes/{id}/itens
+    NOTA: Para alterar itens (alimentos), use PATCH /api/refeicoes/{id}/itens
 
     Campos permitidos: nome, tipo, descricao, tags, contexto_culinario, ativa
     """
@@ -525,8 +1397,164 @@ async def atualizar_refeicao(id: int, updates: dict):
     return result
 
 
+def _contribuicao(catalogo, alimento_id: int, gramas: float) -> List[float]:
+    """Macros de `gramas` do alimento (mesma regra dos triggers: porcao_g 0 conta 0)"""
+    linha = catalogo.obter(alimento_id)
+    porcao = linha["porcao_g"] if linha else None
+    if not porcao:
+        return [0.0] * len(MACROS)
+    return [gramas * (linha[COLUNA_ALIMENTO[m]] or 0) / porcao for m in MACROS]
+
+
+@app.patch("/api/refeicoes/{id}/itens")
+@em_thread(_executor)
+def alterar_itens_refeicao(
+    id: int,
+    patch: ItensRefeicaoPatch,
+    conn: sqlite3.Connection = Depends(get_db_escrita),
+):
+    """
+    Altera itens da refeição sem recriá-la.
+
+    operacoes (aplicadas em sequência sobre a lista atual de itens):
+    - {"op": "adicionar", "alimento_id", "gramas", "posicao"?}
+    - {"op": "alterar", "item_id", "alimento_id"?, "gramas"?}
+    - {"op": "remover", "item_id"}
+    - {"op": "reordenar", "itens": [item_id, ...]}
+
+    Só a diferença entre a lista inicial e a final é gravada (DELETE,
+    UPDATE e INSERT com executemany; ordem = posição final), numa
+    transação. Os totais da resposta são os anteriores + delta dos itens
+    tocados, sem reagregar a refeição.
+
+    Retorna itens finais (com ids dos novos), contagem de alterações,
+    delta e totais.
+    """
+    catalogo = catalogo_alimentos.obter(conn)
+    ausente = next((
+        o.alimento_id for o in patch.operacoes
+        if o.alimento_id is not None and not catalogo.existe(o.alimento_id)
+    ), None)
+    if ausente is not None:
+        raise HTTPException(404, f"Alimento {ausente} não encontrado")
+
+    # HTTPException no meio: a conexão de escrita faz rollback ao ser devolvida
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        totais = conn.execute("""
+            SELECT t.kcal, t.prot, t.carb, t.gord
+            FROM refeicoes r LEFT JOIN refeicoes_totais t ON t.refeicao_id = r.id
+            WHERE r.id = ?
+        """, (id,)).fetchone()
+        if totais is None:
+            raise HTTPException(404, "Refeição não encontrada")
+
+        originais = {
+            row[0]: (row[1], row[2], row[3])
+            for row in conn.execute("""
+                SELECT id, alimento_id, gramas, ordem
+                FROM refeicoes_itens
+                WHERE refeicao_id = ?
+                ORDER BY ordem, id
+            """, (id,))
+        }
+        # Lista de trabalho: [item_id (None = novo), alimento_id, gramas]
+        itens = [[item_id, a, g] for item_id, (a, g, _) in originais.items()]
+
+        def localizar(item_id: int) -> list:
+            item = next((i for i in itens if i[0] == item_id), None)
+            if item is None:
+                raise HTTPException(404, f"Item {item_id} não encontrado na refeição {id}")
+            return item
+
+        for operacao in patch.operacoes:
+            if operacao.op == "adicionar":
+                novo = [None, operacao.alimento_id, operacao.gramas]
+                if operacao.posicao is None:
+                    itens.append(novo)
+                else:
+                    itens.insert(operacao.posicao, novo)
+            elif operacao.op == "alterar":
+                item = localizar(operacao.item_id)
+                if operacao.alimento_id is not None:
+                    item[1] = operacao.alimento_id
+                if operacao.gramas is not None:
+                    item[2] = operacao.gramas
+            elif operacao.op == "remover":
+                itens.remove(localizar(operacao.item_id))
+            else:
+                listados = [localizar(item_id) for item_id in dict.fromkeys(operacao.itens)]
+                itens = listados + [i for i in itens if i not in listados]
+
+        if not itens:
+            raise HTTPException(400, "A refeição precisa de pelo menos 1 item")
+
+        # Diferença: removidos, alterados (alimento/gramas), reordenados, novos
+        finais = {i[0] for i in itens if i[0] is not None}
+        removidos = [item_id for item_id in originais if item_id not in finais]
+        alterados, reordenados, novos = [], [], []
+        for ordem, (item_id, alimento_id, gramas) in enumerate(itens):
+            if item_id is None:
+                novos.append((ordem, alimento_id, gramas))
+                continue
+            a, g, o = originais[item_id]
+            if (alimento_id, gramas) != (a, g):
+                alterados.append((alimento_id, gramas, ordem, item_id))
+            elif ordem != o:
+                reordenados.append((ordem, item_id))
+
+        delta = [0.0] * len(MACROS)
+        for item_id in removidos + [item_id for *_, item_id in alterados]:
+            a, g, _ = originais[item_id]
+            delta = [d - c for d, c in zip(delta, _contribuicao(catalogo, a, g))]
+        for alimento_id, gramas in [(a, g) for a, g, *_ in alterados] + [(a, g) for _, a, g in novos]:
+            delta = [d + c for d, c in zip(delta, _contribuicao(catalogo, alimento_id, gramas))]
+
+        if removidos:
+            conn.executemany("DELETE FROM refeicoes_itens WHERE id = ?", [(i,) for i in removidos])
+        if alterados:
+            conn.executemany(
+                "UPDATE refeicoes_itens SET alimento_id = ?, gramas = ?, ordem = ? WHERE id = ?",
+                alterados,
+            )
+        if reordenados:
+            conn.executemany("UPDATE refeicoes_itens SET ordem = ? WHERE id = ?", reordenados)
+        if novos:
+            ids_novos = _reservar_ids(conn, "refeicoes_itens", len(novos))
+            conn.executemany("""
+                INSERT INTO refeicoes_itens (id, refeicao_id, alimento_id, gramas, ordem)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (item_id, id, alimento_id, gramas, ordem)
+                for item_id, (ordem, alimento_id, gramas) in zip(ids_novos, novos)
+            ])
+            for item_id, (ordem, _, _) in zip(ids_novos, novos):
+                itens[ordem][0] = item_id
+        conn.commit()
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HTTPException(400, f"Erro de integridade: {str(e)}")
+
+    return {
+        "id": id,
+        "itens": [
+            {"id": item_id, "alimento_id": alimento_id, "gramas": gramas, "ordem": ordem}
+            for ordem, (item_id, alimento_id, gramas) in enumerate(itens)
+        ],
+        "alteracoes": {
+            "adicionados": len(novos),
+            "alterados": len(alterados),
+            "removidos": len(removidos),
+            "reordenados": len(reordenados),
+        },
+        "delta": arredondar_totais(*delta),
+        "totais": arredondar_totais(*((t or 0) + d for t, d in zip(totais, delta))),
+    }
+
+
 @app.delete("/api/refeicoes/{id}")
-async def excluir_refeicao(id: int):
+@em_thread(_executor)
+def excluir_refeicao(id: int):
     """
     Exclui refeição permanentemente.
     DELETE cascata remove automaticamente os itens (refeicoes_itens).
@@ -547,7 +1575,8 @@ async def excluir_refeicao(id: int):
 # ============================
 
 @app.post("/api/historico", status_code=201)
-async def registrar_historico(registro: HistoricoCreate):
+@em_thread(_executor)
+def registrar_historico(registro: HistoricoCreate, conn: sqlite3.Connection = Depends(get_db_escrita)):
     """
     Registra refeição no histórico de consumo.
 
@@ -559,7 +1588,6 @@ async def registrar_historico(registro: HistoricoCreate):
     - id: ID do registro criado
     - totais: Totais nutricionais
     """
-    conn = get_db()
     cur = conn.cursor()
 
     try:
@@ -567,14 +1595,12 @@ async def registrar_historico(registro: HistoricoCreate):
         if registro.refeicao_id:
             cur.execute("SELECT 1 FROM refeicoes WHERE id = ?", (registro.refeicao_id,))
             if not cur.fetchone():
-                conn.close()
                 raise HTTPException(404, f"Refeição {registro.refeicao_id} não encontrada")
 
         # Validar alimentos se itens fornecidos
         if registro.itens:
             for item in registro.itens:
                 if not alimento_exists(conn, item.alimento_id):
-                    conn.close()
                     raise HTTPException(404, f"Alimento {item.alimento_id} não encontrado")
 
         # Inserir histórico
@@ -613,199 +1639,455 @@ async def registrar_historico(registro: HistoricoCreate):
 
         conn.commit()
 
-        # Calcular totais
-        cur.execute("""
-            SELECT
-                SUM(hi.gramas / a.porcao_g * a.kcal) as kcal_total,
-                SUM(hi.gramas / a.porcao_g * a.prot_g) as prot_total,
-                SUM(hi.gramas / a.porcao_g * a.carb_g) as carb_total,
-                SUM(hi.gramas / a.porcao_g * a.gord_g) as gord_total
-            FROM historico_itens hi
-            JOIN alimentos a ON a.id = hi.alimento_id
-            WHERE hi.historico_id = ?
-        """, (historico_id,))
-
-        totais_row = cur.fetchone()
-        conn.close()
+        # Totais mantidos pelos triggers de historico_totais
+        totais = carregar_totais_historico(conn, [historico_id])
 
         return {
             "id": historico_id,
             "mensagem": "Registro criado com sucesso",
-            "totais": {
-                "kcal": round(totais_row["kcal_total"] or 0, 1),
-                "prot": round(totais_row["prot_total"] or 0, 1),
-                "carb": round(totais_row["carb_total"] or 0, 1),
-                "gord": round(totais_row["gord_total"] or 0, 1),
-            }
+            "totais": totais.get(historico_id, arredondar_totais(0, 0, 0, 0)),
         }
 
     except sqlite3.IntegrityError as e:
         conn.rollback()
-        conn.close()
         raise HTTPException(400, f"Erro de integridade: {str(e)}")
 
 
-@app.get("/api/historico")
-async def listar_historico(
-    data: Optional[str] = Query(None, regex=r'^\d{4}-\d{2}-\d{2}$'),
-    tipo: Optional[str] = Query(None),
-    tags: Optional[str] = Query(None),
-    texto: Optional[str] = Query(None)
+def ids_existentes(conn: sqlite3.Connection, tabela: str, ids: List[int]) -> set:
+    """Subconjunto de `ids` presente em `tabela` (em blocos de IN_CHUNK_SIZE)"""
+    unicos = list(set(ids))
+    existentes = set()
+    for inicio in range(0, len(unicos), IN_CHUNK_SIZE):
+        bloco = unicos[inicio:inicio + IN_CHUNK_SIZE]
+        placeholders = ",".join(["?"] * len(bloco))
+        existentes.update(
+            row[0] for row in conn.execute(f"SELECT id FROM {tabela} WHERE id IN ({placeholders})", bloco)
+        )
+    return existentes
+
+
+def _inserir_historico_lote(conn: sqlite3.Connection, registros: List[HistoricoCreate]) -> List[int]:
+    """
+    Insere os registros (e itens) numa única transação com executemany.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    ids = _reservar_ids(conn, "historico_refeicoes", len(registros))
+
+    conn.executemany("""
+        INSERT INTO historico_refeicoes (
+            id, data, refeicao_id, nome, tipo, descricao, tags
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (
+            historico_id, r.data.isoformat(), r.refeicao_id, r.nome, r.tipo,
+            r.descricao or "", r.tags or "",
+        )
+        for historico_id, r in zip(ids, registros)
+    ])
+
+    # Mesma regra de registrar_historico: refeicao_id tem precedência sobre itens
+    conn.executemany("""
+        INSERT INTO historico_itens (historico_id, alimento_id, gramas, ordem)
+        SELECT ?, alimento_id, gramas, ordem
+        FROM refeicoes_itens
+        WHERE refeicao_id = ?
+    """, [(historico_id, r.refeicao_id) for historico_id, r in zip(ids, registros) if r.refeicao_id])
+    conn.executemany("""
+        INSERT INTO historico_itens (historico_id, alimento_id, gramas, ordem)
+        VALUES (?, ?, ?, ?)
+    """, [
+        (historico_id, item.alimento_id, item.gramas, ordem)
+        for historico_id, r in zip(ids, registros) if not r.refeicao_id
+        for ordem, item in enumerate(r.itens or [])
+    ])
+
+    conn.commit()
+    return ids
+
+
+@app.post("/api/historico/lote", status_code=201)
+@em_thread(_executor)
+def registrar_historico_lote(
+    atomico: bool = Query(False, description="Se alguma entrada falhar, nada é gravado"),
+    entradas: List[Any] = Depends(corpo_lote),
+    conn: sqlite3.Connection = Depends(get_db_escrita),
 ):
     """
-    Lista histórico com filtros.
+    Registra várias refeições no histórico de uma vez.
 
-    Filtros:
-    - data: YYYY-MM-DD (exato)
-    - tipo: cafe,almoco,jantar (separados por vírgula)
-    - tags: treino,lowcarb (busca parcial)
-    - texto: busca em nome ou descrição
+    Corpo: array JSON de registros (mesmo formato de POST /api/historico) ou
+    NDJSON (Content-Type application/x-ndjson), até LOTE_MAX_ENTRADAS.
 
-    Retorna lista com itens e totais pré-calculados
+    Referências (alimento_id/refeicao_id) são validadas em conjunto e as
+    entradas válidas gravadas numa única transação. Com atomico=true,
+    qualquer erro cancela o lote inteiro (422).
+
+    Retorna, na ordem das entradas:
+    - {"indice", "id", "totais"} para registros criados
+    - {"indice", "erro"} para entradas rejeitadas
     """
-    conn = get_db()
+    validas, erros = lote.validar_entradas(entradas, HistoricoCreate)
+
+    catalogo = catalogo_alimentos.obter(conn)
+    refeicoes = ids_existentes(
+        conn, "refeicoes", [r.refeicao_id for _, r in validas if r.refeicao_id]
+    )
+    registros = []
+    for indice, registro in validas:
+        if registro.refeicao_id:
+            if registro.refeicao_id not in refeicoes:
+                erros[indice] = f"Refeição {registro.refeicao_id} não encontrada"
+                continue
+        else:
+            ausente = next(
+                (i.alimento_id for i in registro.itens if not catalogo.existe(i.alimento_id)), None
+            )
+            if ausente is not None:
+                erros[indice] = f"Alimento {ausente} não encontrado"
+                continue
+        registros.append((indice, registro))
+
+    resultados = {
+        indice: {"indice": indice, "erro": mensagem} for indice, mensagem in erros.items()
+    }
+    if atomico and erros:
+        return JSONResponse(status_code=422, content={
+            "detail": f"{len(erros)} entrada(s) com erro; nada foi gravado",
+            "inseridos": 0,
+            "erros": len(erros),
+            "resultados": [resultados[i] for i in sorted(resultados)],
+        })
 
-    query = "SELECT * FROM historico_refeicoes WHERE 1=1"
+    try:
+        ids = _inserir_historico_lote(conn, [r for _, r in registros]) if registros else []
+    except sqlite3.IntegrityError as e:
+        conn.rollback()
+        raise HTTPException(400, f"Erro de integridade: {str(e)}")
+
+    totais = carregar_totais_historico(conn, ids)
+    for (indice, _), historico_id in zip(registros, ids):
+        resultados[indice] = {
+            "indice": indice,
+            "id": historico_id,
+            "totais": totais.get(historico_id, arredondar_totais(0, 0, 0, 0)),
+        }
+
+    return {
+        "inseridos": len(ids),
+        "erros": len(erros),
+        "resultados": [resultados[i] for i in sorted(resultados)],
+    }
+
+
+def filtros_historico(
+    data: Optional[str],
+    tipo: Optional[str],
+    tags: Optional[str],
+    texto: Optional[str],
+    alias: str = "",
+) -> tuple:
+    """
+    Filtros de listagem/exportação do histórico: (" AND ...", params).
+    `alias` prefixa as colunas (ex.: "h." em consultas com JOIN).
+    """
+    sql = ""
     params = []
 
     if data:
-        query += " AND data = ?"
+        sql += f" AND {alias}data = ?"
         params.append(data)
 
     if tipo:
         tipos = [t.strip() for t in tipo.split(",")]
         placeholders = ",".join(["?"] * len(tipos))
-        query += f" AND tipo IN ({placeholders})"
+        sql += f" AND {alias}tipo IN ({placeholders})"
         params.extend(tipos)
 
     if tags:
         tags_list = [t.strip() for t in tags.split(",")]
         for tag in tags_list:
-            query += " AND tags LIKE ?"
+            sql += f" AND {alias}tags LIKE ?"
             params.append(f"%{tag}%")
 
     if texto:
-        query += " AND (nome LIKE ? OR descricao LIKE ?)"
+        sql += f" AND ({alias}nome LIKE ? OR {alias}descricao LIKE ?)"
         params.extend([f"%{texto}%", f"%{texto}%"])
 
-    query += " ORDER BY criada_em DESC"
+    return sql, params
+
+
+@app.get("/api/historico")
+@em_thread(_executor)
+def listar_historico(
+    data: Optional[str] = Query(None, regex=r'^\d{4}-\d{2}-\d{2}$'),
+    tipo: Optional[str] = Query(None),
+    tags: Optional[str] = Query(None),
+    texto: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    legado: bool = Query(False, description="Histórico completo, sem cursor (formato antigo)"),
+    nutrientes: Optional[str] = NUTRIENTES_QUERY,
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Lista histórico com filtros (mais recentes primeiro).
+
+    Filtros:
+    - data: YYYY-MM-DD (exato)
+    - tipo: cafe,almoco,jantar (separados por vírgula)
+    - tags: treino,lowcarb (busca parcial)
+    - texto: busca em nome ou descrição
+
+    nutrientes=fibra,sodio acrescenta os totais desses nutrientes.
+
+    Paginação por cursor em (criada_em, id): até `limit` registros (padrão
+    50) e `next_cursor` (null na última página). legado=true devolve tudo,
+    sem next_cursor.
+
+    Retorna lista com itens e totais pré-calculados
+    """
+    tamanho, apos = parametros_pagina(
+        "historico", cursor, legado, limit, PAGINA_HISTORICO, (str, int)
+    )
+    codigos = parse_codigos(nutrientes)
+
+    filtros, params = filtros_historico(data, tipo, tags, texto)
+    query = "SELECT * FROM historico_refeicoes WHERE 1=1" + filtros
+
+    if apos:
+        query += " AND (criada_em, id) < (?, ?)"
+        params.extend(apos)
+
+    query += " ORDER BY criada_em DESC, id DESC"
+
+    if tamanho:
+        query += " LIMIT ?"
+        params.append(tamanho if legado else tamanho + 1)
 
     cur = conn.execute(query, params)
     registros = [dict_from_row(row) for row in cur.fetchall()]
+    next_cursor = None
+    if not legado:
+        registros, next_cursor = fatiar_pagina(
+            registros, tamanho, "historico", lambda r: (r["criada_em"], r["id"])
+        )
 
-    # Para cada registro, buscar itens e calcular totais
-    resultado = []
-    for reg in registros:
-        cur.execute("""
-            SELECT
-                hi.id, hi.historico_id, hi.alimento_id, hi.gramas, hi.ordem,
-                a.nome as alimento_nome,
-                a.porcao_g as alimento_porcao_g,
-                a.kcal as alimento_kcal,
-                a.prot_g as alimento_prot_g,
-                a.carb_g as alimento_carb_g,
-                a.gord_g as alimento_gord_g
-            FROM historico_itens hi
-            JOIN alimentos a ON a.id = hi.alimento_id
-            WHERE hi.historico_id = ?
-            ORDER BY hi.ordem
-        """, (reg["id"],))
-
-        itens = [dict_from_row(row) for row in cur.fetchall()]
-
-        # Calcular totais
-        kcal_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_kcal"] for it in itens)
-        prot_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_prot_g"] for it in itens)
-        carb_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_carb_g"] for it in itens)
-        gord_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_gord_g"] for it in itens)
+    # Buscar itens de todos os registros em lote
+    ids = [reg["id"] for reg in registros]
+    resultado = montar_com_itens(
+        registros,
+        carregar_itens_historico(conn, ids),
+        obter_matriz_nutrientes(conn),
+        codigos,
+    )
+
+    if legado:
+        return RespostaJSON({"historico": resultado})
+    return RespostaJSON({"historico": resultado, "next_cursor": next_cursor})
+
+
+# granularidade -> expressão do início do período a partir de data (YYYY-MM-DD)
+PERIODOS_RESUMO = {
+    "dia": "data",
+    "semana": "date(data, 'weekday 0', '-6 days')",  # segunda-feira
+    "mes": "strftime('%Y-%m-01', data)",
+}
+
+
+@app.get("/api/historico/resumo")
+@em_thread(_executor)
+def resumo_historico(
+    inicio: date = Query(..., description="YYYY-MM-DD (inclusive)"),
+    fim: date = Query(..., description="YYYY-MM-DD (inclusive)"),
+    granularidade: str = Query("dia", regex=r'^(dia|semana|mes)$'),
+    conn: sqlite3.Connection = Depends(get_db),
+):
+    """
+    Totais de kcal/macros do histórico por período, com quebra por tipo.
+
+    Lê a tabela historico_diario (uma linha por data/tipo, mantida por
+    triggers na mesma transação das escritas no histórico): o intervalo
+    inteiro é uma varredura da chave primária (data, tipo).
+
+    Períodos sem registros não aparecem. Semanas começam na segunda-feira e
+    meses no dia 1 (`periodo`), mas só contam dias dentro de [inicio, fim].
+    """
+    if fim < inicio:
+        raise HTTPException(400, "fim deve ser igual ou posterior a inicio")
+
+    linhas = conn.execute(f"""
+        SELECT {PERIODOS_RESUMO[granularidade]} AS periodo, tipo,
+               SUM(registros), SUM(kcal), SUM(prot), SUM(carb), SUM(gord)
+        FROM historico_diario
+        WHERE data BETWEEN ? AND ?
+        GROUP BY periodo, tipo
+        ORDER BY periodo, tipo
+    """, (inicio.isoformat(), fim.isoformat())).fetchall()
+
+    periodos: Dict[str, dict] = {}
+    geral = [0, 0.0, 0.0, 0.0, 0.0]
+    for periodo, tipo, *valores in linhas:
+        atual = periodos.setdefault(
+            periodo, {"periodo": periodo, "acumulado": [0, 0.0, 0.0, 0.0, 0.0], "por_tipo": {}}
+        )
+        for i, valor in enumerate(valores):
+            atual["acumulado"][i] += valor
+            geral[i] += valor
+        atual["por_tipo"][tipo] = {
+            "registros": valores[0],
+            "totais": arredondar_totais(*valores[1:]),
+        }
 
+    resultado = []
+    for atual in periodos.values():
+        registros, *macros = atual.pop("acumulado")
         resultado.append({
-            **reg,
-            "itens": itens,
-            "totais": {
-                "kcal": round(kcal_total, 1),
-                "prot": round(prot_total, 1),
-                "carb": round(carb_total, 1),
-                "gord": round(gord_total, 1),
-            }
+            **atual,
+            "registros": registros,
+            "totais": arredondar_totais(*macros),
         })
 
-    conn.close()
+    return {
+        "inicio": inicio.isoformat(),
+        "fim": fim.isoformat(),
+        "granularidade": granularidade,
+        "periodos": resultado,
+        "registros": geral[0],
+        "totais": arredondar_totais(*geral[1:]),
+    }
 
-    return {"historico": resultado}
+
+class StreamingFechavel(StreamingResponse):
+    """
+    StreamingResponse que sempre fecha o gerador do corpo. Se o cliente
+    desconecta, o Starlette só para de iterar: sem aclose(), o finally do
+    gerador (que devolve a conexão ao pool) esperaria o coletor de lixo.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+
+async def blocos_consulta(sql: str, params: list, tamanho: int):
+    """
+    Resultado de `sql` em blocos de `tamanho` linhas, para respostas em
+    streaming: a conexão é emprestada do pool pelo próprio gerador (o
+    Depends(get_db) já teria devolvido a conexão antes do corpo ser
+    enviado) e cada fetchmany roda no ExecutorBanco. Use com aclosing() e
+    StreamingFechavel para a conexão voltar ao pool mesmo se o cliente
+    desconectar no meio.
+
+    O cursor é medido como nas rotas com get_db: a Medicao da requisição
+    está num ContextVar, que a thread do executor não herda, então a
+    conexão é envolvida numa cópia do contexto do gerador.
+    """
+    executor = _executor()
+    contexto = contextvars.copy_context()
+    estado = {}
+
+    def abrir():
+        estado["leitura"] = _pool().leitura()
+        estado["conn"] = estado["leitura"].__enter__()
+        estado["cursor"] = contexto.run(medir_conexao, estado["conn"]).execute(sql, params)
+
+    try:
+        await executor.executar(None, abrir)
+        cursor = estado["cursor"]
+        while True:
+            bloco = await executor.executar(estado["conn"], lambda: cursor.fetchmany(tamanho))
+            if not bloco:
+                break
+            yield bloco
+    finally:
+        if "conn" in estado:
+            estado["leitura"].__exit__(None, None, None)
+
+
+@app.get("/api/historico/export")
+async def exportar_historico(
+    formato: str = Query("ndjson", regex=r'^(ndjson|csv)$'),
+    data: Optional[str] = Query(None, regex=r'^\d{4}-\d{2}-\d{2}$'),
+    tipo: Optional[str] = Query(None),
+    tags: Optional[str] = Query(None),
+    texto: Optional[str] = Query(None),
+):
+    """
+    Exporta o histórico (mais recentes primeiro) em streaming.
+
+    - ndjson: um registro por linha, com itens e totais (formato de
+      GET /api/historico)
+    - csv: uma linha por item, com kcal/macros da porção
+
+    Mesmos filtros de GET /api/historico. As linhas saem do cursor em
+    blocos de EXPORTACAO_BLOCO, então a memória não cresce com o tamanho
+    do histórico.
+    """
+    _pool()  # 500 antes do streaming começar, se não houver banco
+    exportador = exportacao.EXPORTADORES[formato]()
+    filtros, params = filtros_historico(data, tipo, tags, texto, alias="h.")
+    sql = exportacao.SQL_EXPORTACAO.format(filtros=filtros)
+
+    async def corpo():
+        yield exportador.cabecalho()
+        async with aclosing(blocos_consulta(sql, params, EXPORTACAO_BLOCO)) as blocos:
+            async for bloco in blocos:
+                yield exportador.bloco(bloco)
+        yield exportador.fim()
+
+    return StreamingFechavel(
+        corpo(),
+        media_type=exportador.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="historico.{exportador.extensao}"'
+        },
+    )
 
 
 @app.get("/api/historico/{id}")
-async def obter_historico(id: int):
+@em_thread(_executor)
+def obter_historico(
+    id: int,
+    nutrientes: Optional[str] = NUTRIENTES_QUERY,
+    conn: sqlite3.Connection = Depends(get_db),
+):
     """Busca registro histórico por ID com itens e totais"""
-    conn = get_db()
+    codigos = parse_codigos(nutrientes)
 
     cur = conn.execute("SELECT * FROM historico_refeicoes WHERE id = ?", (id,))
     reg_row = cur.fetchone()
 
     if not reg_row:
-        conn.close()
         raise HTTPException(404, f"Registro {id} não encontrado")
 
     registro = dict_from_row(reg_row)
 
     # Buscar itens
-    cur.execute("""
-        SELECT
-            hi.id, hi.historico_id, hi.alimento_id, hi.gramas, hi.ordem,
-            a.nome as alimento_nome,
-            a.porcao_g as alimento_porcao_g,
-            a.kcal as alimento_kcal,
-            a.prot_g as alimento_prot_g,
-            a.carb_g as alimento_carb_g,
-            a.gord_g as alimento_gord_g
-        FROM historico_itens hi
-        JOIN alimentos a ON a.id = hi.alimento_id
-        WHERE hi.historico_id = ?
-        ORDER BY hi.ordem
-    """, (id,))
-
-    itens = [dict_from_row(row) for row in cur.fetchall()]
-    conn.close()
-
-    # Calcular totais
-    kcal_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_kcal"] for it in itens)
-    prot_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_prot_g"] for it in itens)
-    carb_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_carb_g"] for it in itens)
-    gord_total = sum((it["gramas"] / it["alimento_porcao_g"]) * it["alimento_gord_g"] for it in itens)
+    itens = carregar_itens_historico(conn, [id])
 
-    return {
-        **registro,
-        "itens": itens,
-        "totais": {
-            "kcal": round(kcal_total, 1),
-            "prot": round(prot_total, 1),
-            "carb": round(carb_total, 1),
-            "gord": round(gord_total, 1),
-        }
-    }
+    return montar_com_itens([registro], itens, obter_matriz_nutrientes(conn), codigos)[0]
 
 
 @app.delete("/api/historico/{id}", status_code=204)
-async def excluir_historico(id: int):
+@em_thread(_executor)
+def excluir_historico(id: int, conn: sqlite3.Connection = Depends(get_db_escrita)):
     """
     Deleta registro histórico.
 
     Delete em cascata (historico_itens são removidos automaticamente)
     """
-    conn = get_db()
     cur = conn.cursor()
 
     # Verificar se existe
     cur.execute("SELECT 1 FROM historico_refeicoes WHERE id = ?", (id,))
     if not cur.fetchone():
-        conn.close()
         raise HTTPException(404, f"Registro {id} não encontrado")
 
     # Deletar (cascata remove itens automaticamente)
     cur.execute("DELETE FROM historico_refeicoes WHERE id = ?", (id,))
     conn.commit()
-    conn.close()
 
     return None  # 204 No Content
 
@@ -815,23 +2097,39 @@ async def excluir_historico(id: int):
 # ============================
 
 @app.get("/health")
-async def health_check():
-    """Verifica se API e banco estão funcionando"""
+@em_thread(_executor)
+def health_check():
+    """Verifica se API e banco estão funcionando (inclui estatísticas do pool)"""
     try:
-        conn = get_db()
-        cur = conn.execute("SELECT COUNT(*) FROM alimentos")
-        count = cur.fetchone()[0]
-        conn.close()
+        with _pool().leitura() as conn:
+            cur = conn.execute("SELECT COUNT(*) FROM alimentos")
+            count = cur.fetchone()[0]
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
 
         return {
             "status": "healthy",
             "database": "connected",
             "alimentos_count": count,
+            "journal_mode": journal_mode,
+            "pool": pool.stats(),
+            "catalogo": catalogo_alimentos.stats(),
         }
     except Exception as e:
         raise HTTPException(500, f"Database error: {str(e)}")
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metricas_prometheus():
+    """
+    Histogramas por (método, rota, status) no formato texto do Prometheus:
+    duração, tempo no SQLite, serialização e queries por requisição, mais o
+    total de consultas acima de DB_SLOW_QUERY_MS.
+    """
+    return PlainTextResponse(
+        registro_metricas.exportar(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 # ============================
 # SERVIR FRONTEND ESTÁTICO (PRODUÇÃO)
 # ============================
@@ -840,7 +2138,8 @@ async def health_check():
 
 if DIST_PATH.exists():
     # Montar pasta assets/ ANTES das rotas para melhor performance
-    app.mount("/assets", StaticFiles(directory=DIST_PATH / "assets"), name="assets")
+    # (.br/.gz gerados pelo build são servidos quando o cliente aceita)
+    app.mount("/assets", StaticFilesPrecomprimidos(directory=DIST_PATH / "assets"), name="assets")
 
     @app.get("/favicon.ico")
     async def favicon():
@@ -0,0 +1,109 @@
+# data/api/lote.py
+"""
+Leitura e validação de corpos de requisições em lote.
+
+Dois formatos:
+- array JSON: [{...}, {...}]
+- NDJSON (Content-Type application/x-ndjson): um objeto por linha, lido
+  em streaming; uma linha malformada vira erro daquela entrada, não do lote
+
+Cada entrada é validada individualmente contra o modelo Pydantic, para que
+o endpoint possa responder com erros por índice.
+"""
+
+import json
+from typing import Any, AsyncIterator, Dict, List, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+TIPOS_NDJSON = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+class LoteInvalido(ValueError):
+    """Corpo que não é um array JSON nem NDJSON"""
+
+
+class LoteMuitoGrande(LoteInvalido):
+    """Mais entradas que o máximo aceito"""
+
+
+class EntradaInvalida:
+    """Linha NDJSON que não é JSON válido (erro reportado no índice dela)"""
+
+    def __init__(self, mensagem: str):
+        self.mensagem = mensagem
+
+
+def eh_ndjson(content_type: str) -> bool:
+    return content_type.split(";")[0].strip().lower() in TIPOS_NDJSON
+
+
+def _checar_tamanho(entradas: list, maximo: int) -> None:
+    if len(entradas) > maximo:
+        raise LoteMuitoGrande(f"Lote com mais de {maximo} entradas")
+
+
+async def ler_ndjson(partes: AsyncIterator[bytes], maximo: int) -> List[Any]:
+    """Entradas de um stream NDJSON; linhas em branco são ignoradas"""
+    entradas: List[Any] = []
+    resto = b""
+
+    def adicionar(linha: bytes) -> None:
+        if not linha.strip():
+            return
+        try:
+            entradas.append(json.loads(linha))
+        except ValueError as e:
+            entradas.append(EntradaInvalida(f"JSON inválido: {e}"))
+        _checar_tamanho(entradas, maximo)
+
+    async for parte in partes:
+        linhas = (resto + parte).split(b"\n")
+        resto = linhas.pop()
+        for linha in linhas:
+            adicionar(linha)
+    adicionar(resto)
+    return entradas
+
+
+def ler_json(corpo: bytes, maximo: int) -> List[Any]:
+    """Entradas de um array JSON"""
+    try:
+        entradas = json.loads(corpo)
+    except ValueError as e:
+        raise LoteInvalido(f"JSON inválido: {e}")
+    if not isinstance(entradas, list):
+        raise LoteInvalido("O corpo deve ser um array JSON ou NDJSON")
+    _checar_tamanho(entradas, maximo)
+    return entradas
+
+
+def formatar_erro(erro: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(p) for p in e['loc']) or 'entrada'}: {e['msg']}" for e in erro.errors()
+    )
+
+
+def validar_entradas(
+    entradas: List[Any],
+    modelo: Type[BaseModel],
+) -> Tuple[List[Tuple[int, BaseModel]], Dict[int, str]]:
+    """
+    Valida cada entrada contra `modelo`.
+
+    Retorna ([(índice, modelo válido)], {índice: mensagem de erro}).
+    """
+    validas: List[Tuple[int, BaseModel]] = []
+    erros: Dict[int, str] = {}
+    for indice, entrada in enumerate(entradas):
+        if isinstance(entrada, EntradaInvalida):
+            erros[indice] = entrada.mensagem
+            continue
+        if not isinstance(entrada, dict):
+            erros[indice] = "Entrada deve ser um objeto JSON"
+            continue
+        try:
+            validas.append((indice, modelo(**entrada)))
+        except ValidationError as e:
+            erros[indice] = formatar_erro(e)
+    return validas, erros
@@ -0,0 +1,417 @@
+# data/api/metricas.py
+"""
+Instrumentação por requisição: tempo de banco, queries, serialização.
+
+- Medicao: estado de uma requisição (queries, tempo total no SQLite,
+  comando mais lento, marcas de início/fim da rota). Fica num ContextVar
+  para o em_thread marcar a rota; a conexão medida guarda a referência,
+  então funciona também dentro das threads do ExecutorBanco.
+- ConexaoMedida / CursorMedido: proxies de sqlite3.Connection/Cursor que
+  cronometram execute* e os fetch* (no SQLite o trabalho de uma consulta
+  acontece em grande parte ao percorrer as linhas).
+- MetricasMiddleware: cria a Medicao, emite Server-Timing e um log
+  estruturado por requisição e alimenta os histogramas por rota.
+- RegistroMetricas: histogramas no formato texto do Prometheus (/metrics).
+
+Server-Timing (ms):
+    validacao   entrada até o início da rota (middlewares internos, corpo,
+                Pydantic, dependências, espera por conexão do pool)
+    db          tempo no SQLite (desc = nº de queries)
+    db-lenta    comando mais lento, só se >= DB_SLOW_QUERY_MS (sem o SQL,
+                que vai para o log "consulta lenta")
+    rota        corpo da rota fora do SQLite
+    serializacao  fim da rota até o início da resposta (JSON)
+    total
+
+Configuração (variáveis de ambiente):
+    API_METRICAS=0          desliga proxies, headers e histogramas
+    DB_SLOW_QUERY_MS=200    loga (WARNING) comandos acima do limiar e emite
+                            db-lenta; 0 = off
+    API_SERVER_TIMING_SQL=1 inclui o SQL (truncado) no desc de db-lenta;
+                            só para depuração: expõe o schema ao cliente
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+METRICAS_ATIVAS = os.getenv("API_METRICAS", "1") != "0"
+SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0"))
+SQL_NO_HEADER = os.getenv("API_SERVER_TIMING_SQL", "0") == "1"
+
+# Limites (em segundos / contagem) dos buckets dos histogramas
+BUCKETS_SEGUNDOS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500, 1000)
+
+# SQL no log (e no header Server-Timing, com API_SERVER_TIMING_SQL=1)
+SQL_MAX_CHARS = 120
+
+logger = logging.getLogger("gestor_alimentos_api")
+
+_medicao_atual: contextvars.ContextVar[Optional["Medicao"]] = contextvars.ContextVar(
+    "medicao_atual", default=None
+)
+
+
+def _sql_curto(sql: str, limite: int = SQL_MAX_CHARS) -> str:
+    sql = " ".join(sql.split())
+    return sql if len(sql) <= limite else sql[: limite - 3] + "..."
+
+
+# ============================
+# MEDIÇÃO DA REQUISIÇÃO
+# ============================
+
+class Medicao:
+    """Contadores de uma requisição (escritos pela thread da rota, lidos no fim)"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.inicio_rota: Optional[float] = None
+        self.fim_rota: Optional[float] = None
+        self.queries = 0
+        self.db_s = 0.0
+        # [sql, segundos] por comando executado (tempo acumula nos fetch*)
+        self.comandos: List[list] = []
+
+    def novo_comando(self, sql: str) -> list:
+        self.queries += 1
+        comando = [sql, 0.0]
+        self.comandos.append(comando)
+        return comando
+
+    def mais_lento(self) -> Optional[Tuple[str, float]]:
+        if not self.comandos:
+            return None
+        sql, segundos = max(self.comandos, key=lambda c: c[1])
+        return sql, segundos
+
+    def lentos(self, limiar_ms: float) -> List[Tuple[str, float]]:
+        return [(sql, s) for sql, s in self.comandos if s * 1000 >= limiar_ms]
+
+
+def marcar_inicio_rota() -> None:
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.inicio_rota = time.perf_counter()
+
+
+def marcar_fim_rota() -> None:
+    medicao = _medicao_atual.get()
+    if medicao is not None:
+        medicao.fim_rota = time.perf_counter()
+
+
+# ============================
+# CONEXÃO / CURSOR MEDIDOS
+# ============================
+
+class CursorMedido:
+    """Cursor que soma na Medicao o tempo de execute* e de leitura das linhas"""
+
+    def __init__(self, cursor, medicao: Medicao):
+        self._cursor = cursor
+        self._medicao = medicao
+        self._comando: Optional[list] = None
+
+    def _cronometrar(self, funcao, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            decorrido = time.perf_counter() - inicio
+            self._medicao.db_s += decorrido
+            if self._comando is not None:
+                self._comando[1] += decorrido
+
+    def execute(self, sql: str, parametros: Sequence = ()):
+        self._comando = self._medicao.novo_comando(sql)
+        self._cronometrar(self._cursor.execute, sql, parametros)
+        return self
+
+    def executemany(self, sql: str, parametros):
+        self._comando = self._medicao.novo_comando(sql)
+        self._cronometrar(self._cursor.executemany, sql, parametros)
+        return self
+
+    def fetchone(self):
+        return self._cronometrar(self._cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._cronometrar(self._cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._cronometrar(self._cursor.fetchall)
+
+    def __iter__(self) -> Iterator:
+        while True:
+            linha = self._cronometrar(self._cursor.fetchone)
+            if linha is None:
+                return
+            yield linha
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+
+class ConexaoMedida:
+    """
+    Proxy de sqlite3.Connection entregue às rotas por get_db/get_db_escrita.
+
+    execute/executemany/cursor passam por CursorMedido; o resto (commit,
+    rollback, row_factory, interrupt...) vai direto para a conexão.
+    """
+
+    def __init__(self, conn, medicao: Medicao):
+        self._conn = conn
+        # trocada a cada empréstimo (a conexão serve uma requisição por vez)
+        self._medicao = medicao
+
+    def cursor(self) -> CursorMedido:
+        return CursorMedido(self._conn.cursor(), self._medicao)
+
+    def execute(self, sql: str, parametros: Sequence = ()) -> CursorMedido:
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql: str, parametros) -> CursorMedido:
+        return self.cursor().executemany(sql, parametros)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+
+# Um proxy por conexão do pool, reaproveitado a cada empréstimo: os caches
+# que guardam estado por id(conn) (PRAGMA data_version em catalogo.py)
+# continuam vendo sempre o mesmo objeto
+_proxies: Dict[int, ConexaoMedida] = {}
+
+
+def medir_conexao(conn):
+    """Envolve conn na Medicao da requisição atual (sem medição: conn original)"""
+    medicao = _medicao_atual.get()
+    if medicao is None:
+        return conn
+    proxy = _proxies.get(id(conn))
+    if proxy is None or proxy._conn is not conn:
+        proxy = _proxies[id(conn)] = ConexaoMedida(conn, medicao)
+    proxy._medicao = medicao
+    return proxy
+
+
+# ============================
+# HISTOGRAMAS (PROMETHEUS)
+# ============================
+
+class Histograma:
+    """Histograma cumulativo por conjunto de labels"""
+
+    def __init__(self, nome: str, ajuda: str, buckets: Sequence[float]):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.buckets = tuple(buckets)
+        # labels -> [contagem por bucket..., +Inf], soma
+        self._series: Dict[Tuple[Tuple[str, str], ...], list] = {}
+
+    def observar(self, labels: Tuple[Tuple[str, str], ...], valor: float) -> None:
+        serie = self._series.get(labels)
+        if serie is None:
+            serie = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        contagens = serie[0]
+        for i, limite in enumerate(self.buckets):
+            if valor <= limite:
+                contagens[i] += 1
+                break
+        else:
+            contagens[-1] += 1
+        serie[1] += valor
+
+    def exportar(self) -> List[str]:
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        for labels, (contagens, soma) in sorted(self._series.items()):
+            base = ",".join(f'{k}="{_escapar_label(v)}"' for k, v in labels)
+            acumulado = 0
+            for limite, n in zip(self.buckets, contagens):
+                acumulado += n
+                linhas.append(f'{self.nome}_bucket{{{base},le="{limite:g}"}} {acumulado}')
+            acumulado += contagens[-1]
+            linhas.append(f'{self.nome}_bucket{{{base},le="+Inf"}} {acumulado}')
+            linhas.append(f"{self.nome}_sum{{{base}}} {soma:.6f}")
+            linhas.append(f"{self.nome}_count{{{base}}} {acumulado}")
+        return linhas
+
+
+def _escapar_label(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class RegistroMetricas:
+    """Histogramas por (método, rota, status) das requisições instrumentadas"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.duracao = Histograma(
+            "api_requisicao_duracao_segundos", "Duração da requisição", BUCKETS_SEGUNDOS
+        )
+        self.db = Histograma(
+            "api_requisicao_db_segundos", "Tempo no SQLite por requisição", BUCKETS_SEGUNDOS
+        )
+        self.serializacao = Histograma(
+            "api_requisicao_serializacao_segundos",
+            "Fim da rota até o início da resposta", BUCKETS_SEGUNDOS,
+        )
+        self.queries = Histograma(
+            "api_requisicao_queries", "Comandos SQL por requisição", BUCKETS_QUERIES
+        )
+        self.lentas = 0
+
+    def observar(self, metodo: str, rota: str, status: int, resumo: dict) -> None:
+        labels = (("metodo", metodo), ("rota", rota), ("status", str(status)))
+        with self._lock:
+            self.duracao.observar(labels, resumo["total_ms"] / 1000)
+            self.db.observar(labels, resumo["db_ms"] / 1000)
+            self.queries.observar(labels, resumo["queries"])
+            if resumo.get("serializacao_ms") is not None:
+                self.serializacao.observar(labels, resumo["serializacao_ms"] / 1000)
+            self.lentas += len(resumo.get("lentas", ()))
+
+    def exportar(self) -> str:
+        with self._lock:
+            linhas = []
+            for histograma in (self.duracao, self.db, self.serializacao, self.queries):
+                linhas += histograma.exportar()
+            linhas += [
+                "# HELP api_consultas_lentas_total Comandos SQL acima de DB_SLOW_QUERY_MS",
+                "# TYPE api_consultas_lentas_total counter",
+                f"api_consultas_lentas_total {self.lentas}",
+            ]
+        return "\n".join(linhas) + "\n"
+
+
+# ============================
+# MIDDLEWARE
+# ============================
+
+def resumir(medicao: Medicao, fim: float, limiar_lenta_ms: float) -> dict:
+    """Tempos da Medicao em ms (validacao/rota/serializacao só se a rota marcou)"""
+    ms = lambda s: round(s * 1000, 2)  # noqa: E731
+    resumo = {
+        "total_ms": ms(fim - medicao.inicio),
+        "db_ms": ms(medicao.db_s),
+        "queries": medicao.queries,
+    }
+    if medicao.inicio_rota is not None and medicao.fim_rota is not None:
+        resumo["validacao_ms"] = ms(medicao.inicio_rota - medicao.inicio)
+        resumo["rota_ms"] = ms(max(0.0, medicao.fim_rota - medicao.inicio_rota - medicao.db_s))
+        resumo["serializacao_ms"] = ms(fim - medicao.fim_rota)
+    lento = medicao.mais_lento()
+    if lento is not None:
+        resumo["sql_mais_lento"] = _sql_curto(lento[0])
+        resumo["sql_mais_lento_ms"] = ms(lento[1])
+    if limiar_lenta_ms > 0:
+        resumo["lentas"] = [
+            {"sql": _sql_curto(sql, 500), "ms": ms(s)} for sql, s in medicao.lentos(limiar_lenta_ms)
+        ]
+    return resumo
+
+
+def server_timing(resumo: dict, limiar_lenta_ms: float, com_sql: bool = False) -> str:
+    partes = [f'db;dur={resumo["db_ms"]};desc="{resumo["queries"]} queries"']
+    if limiar_lenta_ms > 0 and resumo.get("sql_mais_lento_ms", 0) >= limiar_lenta_ms:
+        lenta = f'db-lenta;dur={resumo["sql_mais_lento_ms"]}'
+        if com_sql:
+            # header é latin-1: acentos/símbolos do SQL viram "?"
+            desc = resumo["sql_mais_lento"].replace('"', "'").replace("\\", "/")
+            desc = desc.encode("ascii", "replace").decode()
+            lenta += f';desc="{desc}"'
+        partes.append(lenta)
+    for nome in ("validacao", "rota", "serializacao"):
+        if f"{nome}_ms" in resumo:
+            partes.append(f"{nome};dur={resumo[f'{nome}_ms']}")
+    partes.append(f"total;dur={resumo['total_ms']}")
+    return ", ".join(partes)
+
+
+class MetricasMiddleware:
+    """
+    Deve ser o middleware mais interno: o tempo de "serializacao" vai do
+    fim da rota ao http.response.start que a própria resposta envia (antes
+    de compressão/ETag, que seguram o start até comprimir o corpo).
+    """
+
+    def __init__(
+        self,
+        app,
+        registro: RegistroMetricas,
+        limiar_lenta_ms: float = SLOW_QUERY_MS,
+        ativo: bool = METRICAS_ATIVAS,
+        sql_no_header: bool = SQL_NO_HEADER,
+    ):
+        self.app = app
+        self.registro = registro
+        self.limiar_lenta_ms = limiar_lenta_ms
+        self.ativo = ativo
+        self.sql_no_header = sql_no_header
+
+    async def __call__(self, scope, receive, send):
+        if not self.ativo or scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        status = 500
+        resumo: Optional[dict] = None
+
+        async def enviar(message):
+            nonlocal status, resumo
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                resumo = resumir(medicao, time.perf_counter(), self.limiar_lenta_ms)
+                message.setdefault("headers", [])
+                MutableHeaders(scope=message).append("Server-Timing", server_timing(
+                    resumo, self.limiar_lenta_ms, self.sql_no_header
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicao_atual.reset(token)
+            final = resumir(medicao, time.perf_counter(), self.limiar_lenta_ms)
+            if resumo is not None:
+                # Fases até o início da resposta ficam como no header; banco e
+                # total são refeitos no fim (respostas em streaming, como
+                # /api/historico/export, consultam enquanto enviam o corpo)
+                for fase in ("validacao_ms", "rota_ms", "serializacao_ms"):
+                    if fase in resumo:
+                        final[fase] = resumo[fase]
+            resumo = final
+            rota = getattr(scope.get("route"), "path", None) or "<sem rota>"
+            self.registro.observar(scope["method"], rota, status, resumo)
+            self._logar(scope, rota, status, resumo)
+
+    def _logar(self, scope, rota: str, status: int, resumo: dict) -> None:
+        for lenta in resumo.get("lentas", ()):
+            logger.warning(
+                "consulta lenta (%.1f ms >= %.0f ms) em %s %s: %s",
+                lenta["ms"], self.limiar_lenta_ms, scope["method"], rota, lenta["sql"],
+                extra={"metricas": {"rota": rota, **lenta}},
+            )
+        if logger.isEnabledFor(logging.INFO):
+            registro = {
+                "metodo": scope["method"], "path": scope["path"], "rota": rota,
+                "status": status, **{k: v for k, v in resumo.items() if k != "lentas"},
+            }
+            logger.info(json.dumps(registro, ensure_ascii=False), extra={"metricas": registro})
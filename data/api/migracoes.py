@@ -0,0 +1,511 @@
+# data/api/migracoes.py
+"""
+Migrações versionadas do schema SQLite.
+
+A versão aplicada fica em PRAGMA user_version. Cada migração roda uma única
+vez, dentro de uma transação, na ordem da lista MIGRACOES.
+
+Uso (CLI):
+    python migracoes.py                      # aplica migrações pendentes
+    python migracoes.py --reconstruir-totais # recalcula totais materializados
+"""
+
+import argparse
+import sqlite3
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+import busca
+import clusters
+import nutrientes
+
+DB_PATH = Path(__file__).parent.parent / "db" / "alimentos.db"
+
+MACROS = ("kcal", "prot", "carb", "gord")
+
+# macro da tabela de totais -> coluna em alimentos
+COLUNA_ALIMENTO = {
+    "kcal": "kcal",
+    "prot": "prot_g",
+    "carb": "carb_g",
+    "gord": "gord_g",
+}
+
+# (tabela de totais, tabela pai, tabela de itens, coluna FK nos itens)
+TABELAS_TOTAIS = (
+    ("refeicoes_totais", "refeicoes", "refeicoes_itens", "refeicao_id"),
+    ("historico_totais", "historico_refeicoes", "historico_itens", "historico_id"),
+)
+
+
+# contador de versão -> tabelas cujas escritas o incrementam
+CONTADORES_VERSAO = {
+    "alimentos_versao": ("alimentos",),
+    "refeicoes_versao": ("refeicoes", "refeicoes_itens"),
+}
+
+
+# ============================
+# TOTAIS MATERIALIZADOS
+# ============================
+
+def _fator(macro: str, item: str) -> str:
+    """Contribuição de um item (NEW/OLD) para um macro; porcao_g = 0 conta como 0"""
+    coluna = COLUNA_ALIMENTO[macro]
+    return (
+        f"COALESCE({item}.gramas * (SELECT a.{coluna} / NULLIF(a.porcao_g, 0) "
+        f"FROM alimentos a WHERE a.id = {item}.alimento_id), 0)"
+    )
+
+
+def _sql_totais(totais: str, pai: str, itens: str, fk: str) -> str:
+    """DDL da tabela de totais + triggers de manutenção incremental"""
+    somar = ",\n            ".join(f"{m} = {m} + {_fator(m, 'NEW')}" for m in MACROS)
+    subtrair = ",\n            ".join(f"{m} = {m} - {_fator(m, 'OLD')}" for m in MACROS)
+    delta_alimento = ",\n            ".join(
+        f"{m} = {m} + (SELECT SUM(i.gramas) FROM {itens} i "
+        f"WHERE i.{fk} = {totais}.{fk} AND i.alimento_id = NEW.id) * ("
+        f"COALESCE(NEW.{COLUNA_ALIMENTO[m]} / NULLIF(NEW.porcao_g, 0), 0) - "
+        f"COALESCE(OLD.{COLUNA_ALIMENTO[m]} / NULLIF(OLD.porcao_g, 0), 0))"
+        for m in MACROS
+    )
+    colunas = ",\n        ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in MACROS)
+
+    return f"""
+    CREATE TABLE IF NOT EXISTS {totais} (
+        {fk} INTEGER PRIMARY KEY REFERENCES {pai}(id) ON DELETE CASCADE,
+        {colunas}
+    );
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_pai_ins AFTER INSERT ON {pai}
+    BEGIN
+        INSERT OR IGNORE INTO {totais} ({fk}) VALUES (NEW.id);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_pai_del AFTER DELETE ON {pai}
+    BEGIN
+        DELETE FROM {totais} WHERE {fk} = OLD.id;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_item_ins AFTER INSERT ON {itens}
+    BEGIN
+        UPDATE {totais} SET
+            {somar}
+        WHERE {fk} = NEW.{fk};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_item_del AFTER DELETE ON {itens}
+    BEGIN
+        UPDATE {totais} SET
+            {subtrair}
+        WHERE {fk} = OLD.{fk};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_item_upd
+    AFTER UPDATE OF {fk}, alimento_id, gramas ON {itens}
+    BEGIN
+        UPDATE {totais} SET
+            {subtrair}
+        WHERE {fk} = OLD.{fk};
+        UPDATE {totais} SET
+            {somar}
+        WHERE {fk} = NEW.{fk};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_{totais}_alimento_upd
+    AFTER UPDATE OF porcao_g, kcal, prot_g, carb_g, gord_g ON alimentos
+    BEGIN
+        UPDATE {totais} SET
+            {delta_alimento}
+        WHERE {fk} IN (SELECT {fk} FROM {itens} WHERE alimento_id = NEW.id);
+    END;
+    """
+
+
+def _sql_recalculo(pai: str, itens: str, fk: str) -> str:
+    """SELECT que recalcula do zero os totais de todos os pais"""
+    somas = ",\n            ".join(
+        f"COALESCE(SUM(i.gramas * a.{COLUNA_ALIMENTO[m]} / NULLIF(a.porcao_g, 0)), 0) AS {m}"
+        for m in MACROS
+    )
+    return f"""
+        SELECT p.id AS {fk},
+            {somas}
+        FROM {pai} p
+        LEFT JOIN {itens} i ON i.{fk} = p.id
+        LEFT JOIN alimentos a ON a.id = i.alimento_id
+        GROUP BY p.id
+    """
+
+
+def reconstruir_totais(conn: sqlite3.Connection, tolerancia: float = 1e-6) -> dict:
+    """
+    Recalcula todos os totais materializados e corrige divergências (drift).
+
+    Retorna, por tabela, quantas linhas foram verificadas e quantas corrigidas.
+    """
+    relatorio = {}
+    for totais, pai, itens, fk in TABELAS_TOTAIS:
+        divergentes = conn.execute(f"""
+            SELECT COUNT(*) FROM ({_sql_recalculo(pai, itens, fk)}) r
+            LEFT JOIN {totais} t ON t.{fk} = r.{fk}
+            WHERE t.{fk} IS NULL
+               OR {" OR ".join(f"ABS(t.{m} - r.{m}) > ?" for m in MACROS)}
+        """, [tolerancia] * len(MACROS)).fetchone()[0]
+
+        conn.execute(f"DELETE FROM {totais}")
+        conn.execute(f"""
+            INSERT INTO {totais} ({fk}, {", ".join(MACROS)})
+            {_sql_recalculo(pai, itens, fk)}
+        """)
+        verificadas = conn.execute(f"SELECT COUNT(*) FROM {totais}").fetchone()[0]
+        relatorio[totais] = {"verificadas": verificadas, "corrigidas": divergentes}
+
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'historico_diario'"
+    ).fetchone():
+        relatorio["historico_diario"] = _reconstruir_resumo_diario(conn, tolerancia)
+
+    conn.commit()
+    return relatorio
+
+
+# ============================
+# RESUMO DIÁRIO DO HISTÓRICO
+# ============================
+
+# Uma linha por (data, tipo) com nº de registros e soma dos historico_totais.
+# Registro novo conta 1 (totais zerados); os itens chegam depois e cada
+# mudança em historico_totais (item inserido/removido, alimento editado)
+# soma o delta no dia do registro. Exclusão subtrai os totais no BEFORE
+# DELETE: quando o CASCADE remove os itens, o registro pai já não existe e
+# o delta não encontra o dia.
+
+
+def _totais_do_registro(registro: str, macro: str) -> str:
+    """historico_totais de um registro (NEW/OLD), 0 se não houver linha"""
+    return (
+        f"COALESCE((SELECT t.{macro} FROM historico_totais t "
+        f"WHERE t.historico_id = {registro}.id), 0)"
+    )
+
+
+def _sql_resumo_diario() -> str:
+    """DDL de historico_diario + triggers de manutenção incremental"""
+    colunas = ",\n        ".join(f"{m} REAL NOT NULL DEFAULT 0" for m in MACROS)
+    subtrair_old = ",\n            ".join(
+        f"{m} = {m} - {_totais_do_registro('OLD', m)}" for m in MACROS
+    )
+    subtrair_new = ",\n            ".join(
+        f"{m} = {m} - {_totais_do_registro('NEW', m)}" for m in MACROS
+    )
+    valores_new = ",\n            ".join(_totais_do_registro("NEW", m) for m in MACROS)
+    somar_excluded = ",\n            ".join(f"{m} = {m} + excluded.{m}" for m in MACROS)
+    delta = ",\n            ".join(f"{m} = {m} + NEW.{m} - OLD.{m}" for m in MACROS)
+
+    return f"""
+    CREATE TABLE IF NOT EXISTS historico_diario (
+        data TEXT NOT NULL,
+        tipo TEXT NOT NULL DEFAULT '',
+        registros INTEGER NOT NULL DEFAULT 0,
+        {colunas},
+        PRIMARY KEY (data, tipo)
+    ) WITHOUT ROWID;
+
+    CREATE TRIGGER IF NOT EXISTS trg_historico_diario_pai_ins
+    AFTER INSERT ON historico_refeicoes
+    BEGIN
+        INSERT INTO historico_diario (data, tipo, registros)
+        VALUES (NEW.data, COALESCE(NEW.tipo, ''), 1)
+        ON CONFLICT (data, tipo) DO UPDATE SET registros = registros + 1;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_historico_diario_pai_del
+    BEFORE DELETE ON historico_refeicoes
+    BEGIN
+        UPDATE historico_diario SET
+            registros = registros - 1,
+            {subtrair_old}
+        WHERE data = OLD.data AND tipo = COALESCE(OLD.tipo, '');
+        DELETE FROM historico_diario
+        WHERE data = OLD.data AND tipo = COALESCE(OLD.tipo, '') AND registros <= 0;
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_historico_diario_pai_upd
+    AFTER UPDATE OF data, tipo ON historico_refeicoes
+    WHEN NEW.data IS NOT OLD.data OR NEW.tipo IS NOT OLD.tipo
+    BEGIN
+        UPDATE historico_diario SET
+            registros = registros - 1,
+            {subtrair_new}
+        WHERE data = OLD.data AND tipo = COALESCE(OLD.tipo, '');
+        DELETE FROM historico_diario
+        WHERE data = OLD.data AND tipo = COALESCE(OLD.tipo, '') AND registros <= 0;
+        INSERT INTO historico_diario (data, tipo, registros, {", ".join(MACROS)})
+        VALUES (
+            NEW.data, COALESCE(NEW.tipo, ''), 1,
+            {valores_new}
+        )
+        ON CONFLICT (data, tipo) DO UPDATE SET
+            registros = registros + 1,
+            {somar_excluded};
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_historico_diario_totais_upd
+    AFTER UPDATE ON historico_totais
+    BEGIN
+        UPDATE historico_diario SET
+            {delta}
+        WHERE (data, tipo) = (
+            SELECT h.data, COALESCE(h.tipo, '') FROM historico_refeicoes h
+            WHERE h.id = NEW.historico_id
+        );
+    END;
+    """
+
+
+SQL_RECALCULO_RESUMO = f"""
+    SELECT h.data, COALESCE(h.tipo, '') AS tipo, COUNT(*) AS registros,
+        {", ".join(f"COALESCE(SUM(t.{m}), 0) AS {m}" for m in MACROS)}
+    FROM historico_refeicoes h
+    LEFT JOIN historico_totais t ON t.historico_id = h.id
+    GROUP BY h.data, COALESCE(h.tipo, '')
+"""
+
+
+def _reconstruir_resumo_diario(conn: sqlite3.Connection, tolerancia: float) -> dict:
+    """Recalcula historico_diario a partir de historico_totais (já corrigido)"""
+    divergentes = conn.execute(f"""
+        SELECT COUNT(*) FROM ({SQL_RECALCULO_RESUMO}) r
+        LEFT JOIN historico_diario d ON d.data = r.data AND d.tipo = r.tipo
+        WHERE d.data IS NULL
+           OR d.registros != r.registros
+           OR {" OR ".join(f"ABS(d.{m} - r.{m}) > ?" for m in MACROS)}
+    """, [tolerancia] * len(MACROS)).fetchone()[0]
+    orfaos = conn.execute(f"""
+        SELECT COUNT(*) FROM historico_diario d
+        WHERE NOT EXISTS (
+            SELECT 1 FROM ({SQL_RECALCULO_RESUMO}) r
+            WHERE r.data = d.data AND r.tipo = d.tipo
+        )
+    """).fetchone()[0]
+
+    conn.execute("DELETE FROM historico_diario")
+    conn.execute(f"""
+        INSERT INTO historico_diario (data, tipo, registros, {", ".join(MACROS)})
+        {SQL_RECALCULO_RESUMO}
+    """)
+    verificadas = conn.execute("SELECT COUNT(*) FROM historico_diario").fetchone()[0]
+    return {"verificadas": verificadas, "corrigidas": divergentes + orfaos}
+
+
+def executar_script(conn: sqlite3.Connection, script: str) -> None:
+    """
+    Executa um script SQL comando a comando.
+
+    Diferente de executescript(), não faz COMMIT implícito, então o script
+    participa da transação da migração.
+    """
+    comando = ""
+    for linha in script.splitlines(keepends=True):
+        comando += linha
+        if sqlite3.complete_statement(comando):
+            conn.execute(comando)
+            comando = ""
+    if comando.strip():
+        conn.execute(comando)
+
+
+def _migracao_totais(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historico_itens_alimento ON historico_itens(alimento_id)"
+    )
+    for totais, pai, itens, fk in TABELAS_TOTAIS:
+        executar_script(conn, _sql_totais(totais, pai, itens, fk))
+        conn.execute(f"""
+            INSERT OR REPLACE INTO {totais} ({fk}, {", ".join(MACROS)})
+            {_sql_recalculo(pai, itens, fk)}
+        """)
+
+
+def _migracao_busca(conn: sqlite3.Connection) -> None:
+    # Sem FTS5 compilado, /api/alimentos/busca usa o fallback com LIKE
+    if busca.fts5_disponivel(conn):
+        executar_script(conn, busca.SQL_FTS)
+
+
+def _sql_contador_versao(contador: str) -> str:
+    """
+    Tabela de uma linha com um inteiro que sobe a cada INSERT/UPDATE/DELETE
+    nas tabelas observadas (inclusive por scripts fora da API)
+    """
+    sql = f"""
+        CREATE TABLE IF NOT EXISTS {contador} (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            versao INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO {contador} (id, versao) VALUES (1, 1);
+    """
+    for tabela in CONTADORES_VERSAO[contador]:
+        sql += _sql_triggers_versao(contador, tabela)
+    return sql
+
+
+def _sql_triggers_versao(contador: str, tabela: str) -> str:
+    sql = ""
+    for evento, sufixo in (("INSERT", "ins"), ("UPDATE", "upd"), ("DELETE", "del")):
+        sql += f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{tabela}_versao_{sufixo} AFTER {evento} ON {tabela}
+        BEGIN
+            UPDATE {contador} SET versao = versao + 1 WHERE id = 1;
+        END;
+        """
+    return sql
+
+
+def _migracao_versao_alimentos(conn: sqlite3.Connection) -> None:
+    executar_script(conn, _sql_contador_versao("alimentos_versao"))
+
+
+def _migracao_versao_refeicoes(conn: sqlite3.Connection) -> None:
+    executar_script(conn, _sql_contador_versao("refeicoes_versao"))
+
+
+def _migracao_indices_paginacao(conn: sqlite3.Connection) -> None:
+    # Keyset (nome, id) e (criada_em, id): id é o rowid, já presente no índice.
+    # idx_historico_criada_em era (criada_em DESC) com rowid crescente: não
+    # atende ORDER BY criada_em DESC, id DESC sem ordenação extra.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_alimentos_nome ON alimentos(nome)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_refeicoes_ativa_criada ON refeicoes(ativa, criada_em)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_historico_criada_em")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historico_criada ON historico_refeicoes(criada_em)"
+    )
+
+
+def _migracao_resumo_diario(conn: sqlite3.Connection) -> None:
+    executar_script(conn, _sql_resumo_diario())
+    conn.execute(f"""
+        INSERT OR REPLACE INTO historico_diario (data, tipo, registros, {", ".join(MACROS)})
+        {SQL_RECALCULO_RESUMO}
+    """)
+
+
+def _migracao_nutrientes(conn: sqlite3.Connection) -> None:
+    # alimento_nutrientes entra na versão de alimentos: a matriz de
+    # nutrientes em memória é invalidada junto com o catálogo
+    executar_script(conn, nutrientes.SQL_NUTRIENTES)
+    executar_script(conn, _sql_triggers_versao("alimentos_versao", "alimento_nutrientes"))
+    conn.executemany(
+        "INSERT OR IGNORE INTO nutrientes (codigo, nome, unidade) VALUES (?, ?, ?)",
+        [n[:3] for n in nutrientes.NUTRIENTES],
+    )
+
+
+def _migracao_indices_consultas(conn: sqlite3.Connection) -> None:
+    # Planos conferidos por data/scripts/verificar_planos.py.
+    # Itens saem em ORDER BY pai, ordem, id: com (pai, ordem) o rowid fecha a
+    # ordenação no próprio índice; os índices só de pai ficam redundantes.
+    conn.execute("DROP INDEX IF EXISTS idx_refeicao")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_refeicoes_itens_ordem "
+        "ON refeicoes_itens(refeicao_id, ordem)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_historico_itens_historico")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historico_itens_ordem "
+        "ON historico_itens(historico_id, ordem)"
+    )
+    # Filtros por dia/tipo com a ordem da paginação (criada_em DESC, id DESC)
+    conn.execute("DROP INDEX IF EXISTS idx_historico_data")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historico_data_criada "
+        "ON historico_refeicoes(data, criada_em)"
+    )
+    conn.execute("DROP INDEX IF EXISTS idx_historico_tipo")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_historico_tipo_criada "
+        "ON historico_refeicoes(tipo, criada_em)"
+    )
+    # Listagem por tipo e DISTINCT tipo das refeições ativas (idx_ativa é
+    # prefixo deste e de idx_refeicoes_ativa_criada)
+    conn.execute("DROP INDEX IF EXISTS idx_tipo")
+    conn.execute("DROP INDEX IF EXISTS idx_ativa")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_refeicoes_ativa_tipo_criada "
+        "ON refeicoes(ativa, tipo, criada_em)"
+    )
+    # Duplicata em criar_alimento: WHERE LOWER(nome) = LOWER(?)
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_alimentos_nome_lower ON alimentos(LOWER(nome))"
+    )
+
+
+def _migracao_clusters(conn: sqlite3.Connection) -> None:
+    # Primeiro ajuste parte das médias dos clusters do CSV (rótulos mantidos)
+    executar_script(conn, clusters.SQL_CLUSTERS)
+    clusters.ajustar(conn)
+
+
+# ============================
+# REGISTRO DE MIGRAÇÕES
+# ============================
+
+MIGRACOES: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "totais nutricionais materializados por refeição/histórico", _migracao_totais),
+    (2, "índice FTS5 de alimentos (nome, categoria, contexto) sem acentos", _migracao_busca),
+    (3, "contador de versão da tabela alimentos (cache do catálogo)", _migracao_versao_alimentos),
+    (4, "contador de versão de refeições/itens (ETag)", _migracao_versao_refeicoes),
+    (5, "índices da paginação por cursor (nome, criada_em)", _migracao_indices_paginacao),
+    (6, "resumo diário do histórico por (data, tipo)", _migracao_resumo_diario),
+    (7, "nutrientes por alimento (formato longo, TBCA)", _migracao_nutrientes),
+    (8, "índices das consultas quentes (itens, data, tipo, LOWER(nome))",
+     _migracao_indices_consultas),
+    (9, "cluster_nutricional por k-means (centróides, atribuição por trigger)",
+     _migracao_clusters),
+]
+
+
+def versao_atual(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def aplicar_migracoes(conn: sqlite3.Connection) -> List[int]:
+    """Aplica migrações pendentes e retorna as versões aplicadas"""
+    aplicadas = []
+    for versao, _descricao, migrar in MIGRACOES:
+        if versao <= versao_atual(conn):
+            continue
+        try:
+            conn.execute("BEGIN")
+            migrar(conn)
+            conn.execute(f"PRAGMA user_version = {versao}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        aplicadas.append(versao)
+    return aplicadas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrações do banco de alimentos")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument(
+        "--reconstruir-totais",
+        action="store_true",
+        help="Recalcula refeicoes_totais/historico_totais/historico_diario e corrige drift",
+    )
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    aplicadas = aplicar_migracoes(conn)
+    print(f"Versão do schema: {versao_atual(conn)} (aplicadas agora: {aplicadas or 'nenhuma'})")
+
+    if args.reconstruir_totais:
+        for tabela, info in reconstruir_totais(conn).items():
+            print(f"{tabela}: {info['verificadas']} verificadas, {info['corrigidas']} corrigidas")
+
+    conn.close()
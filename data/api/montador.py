@@ -0,0 +1,292 @@
+# data/api/montador.py
+"""
+Montador de refeições por meta de macros (P/C/G), no servidor.
+
+Substitui a busca exaustiva em grade de src/utils/smartMealBuilder.ts:
+- candidatos: todos os alimentos do contexto culinário pedido são
+  carregados e separados em papéis (proteína / carboidrato / gordura) pelo
+  centróide de cada cluster_nutricional (o rótulo numérico do cluster não
+  é fixo)
+- poda: só os CANDIDATOS_POR_PAPEL alimentos mais "puros" de cada papel
+  (maior fração do macro do papel) entram nas combinações; o resto do
+  contexto é descartado. Sem a poda, um contexto com centenas de
+  alimentos por papel daria dezenas de milhões de trios; com 40 por papel
+  são até 40³ = 64 mil, que cabem no orçamento de tempo padrão
+  (parâmetro candidatos_por_papel de sugerir())
+- combinações P+C, P+G e P+C+G com os candidatos podados de cada papel,
+  filtradas pelo índice de compatibilidade (compatibilidade.py)
+- porções: mínimos quadrados ponderados com limites [min, max] gramas,
+  resolvidos em lote com NumPy (equações normais + descida coordenada
+  projetada)
+- respeita um orçamento de tempo: devolve o melhor encontrado até ali
+"""
+
+import itertools
+import sqlite3
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from busca import normalizar
+from compatibilidade import CONTEXTO_UNIVERSAL, IndiceCompatibilidade, separar_lista
+
+MACROS = ("prot", "carb", "gord")
+PROT, CARB, GORD = 0, 1, 2
+
+# Candidatos mantidos por papel (P, C, G) -> até 40*40*40 trios
+CANDIDATOS_POR_PAPEL = 40
+TAMANHO_LOTE = 8192
+ITERACOES_PROJECAO = 12
+ARREDONDAMENTO_G = 5
+TOLERANCIA_PERCENTUAL = 10.0
+# Quantas sugestões um mesmo alimento pode aparecer (variedade)
+MAX_REPETICOES_ALIMENTO = 2
+
+
+def carregar_candidatos(
+    conn: sqlite3.Connection,
+    contexto: Optional[str] = None,
+    excluir_ids: Sequence[int] = (),
+) -> List[dict]:
+    """Alimentos utilizáveis no contexto pedido (porcao_g > 0)"""
+    contexto_norm = normalizar(contexto) if contexto else None
+    excluir = set(excluir_ids)
+
+    candidatos = []
+    for row in conn.execute("""
+        SELECT id, nome, categoria, porcao_g, kcal, prot_g, carb_g, gord_g,
+               contexto_culinario, incompativel_com, cluster_nutricional
+        FROM alimentos
+        WHERE porcao_g > 0
+    """):
+        if row["id"] in excluir:
+            continue
+        contextos = separar_lista(row["contexto_culinario"])
+        incompativeis = separar_lista(row["incompativel_com"])
+        if contexto_norm:
+            if contexto_norm in incompativeis:
+                continue
+            if contexto_norm not in contextos and CONTEXTO_UNIVERSAL not in contextos:
+                continue
+        porcao = row["porcao_g"]
+        candidatos.append({
+            "id": row["id"],
+            "nome": row["nome"],
+            "categoria": row["categoria"],
+            "cluster": row["cluster_nutricional"],
+            "por_g": (
+                (row["prot_g"] or 0) / porcao,
+                (row["carb_g"] or 0) / porcao,
+                (row["gord_g"] or 0) / porcao,
+            ),
+            "kcal_g": (row["kcal"] or 0) / porcao,
+        })
+    return candidatos
+
+
+def papeis_por_cluster(por_g: np.ndarray, clusters: Sequence[Optional[int]]) -> np.ndarray:
+    """
+    Papel (PROT/CARB/GORD) de cada alimento = macro dominante do centróide
+    do seu cluster. Sem cluster: macro dominante do próprio alimento.
+    """
+    papeis = np.argmax(por_g, axis=1)
+    clusters_arr = np.array([-1 if c is None else c for c in clusters])
+    for cluster in set(clusters_arr.tolist()) - {-1}:
+        membros = clusters_arr == cluster
+        papeis[membros] = int(np.argmax(por_g[membros].mean(axis=0)))
+    return papeis
+
+
+def _podar(por_g: np.ndarray, papeis: np.ndarray, papel: int, k: int) -> np.ndarray:
+    """Índices dos k alimentos mais 'puros' no macro do papel"""
+    idx = np.flatnonzero(papeis == papel)
+    if idx.size == 0:
+        return idx
+    total = por_g[idx].sum(axis=1)
+    pureza = np.divide(por_g[idx, papel], total, out=np.zeros(idx.size), where=total > 0)
+    ordem = np.lexsort((-por_g[idx, papel], -pureza))
+    return idx[ordem[:k]]
+
+
+def resolver_porcoes(
+    A: np.ndarray,
+    alvo: np.ndarray,
+    gmin: float,
+    gmax: float,
+    iteracoes: int = ITERACOES_PROJECAO,
+) -> np.ndarray:
+    """
+    Mínimos quadrados com limites, em lote.
+
+    A: (N, 3 macros, F alimentos) macros por grama; alvo: (3,) ponderado.
+    Retorna gramas (N, F) em [gmin, gmax].
+
+    Ponto de partida: equações normais (AᵀA + λI) g = Aᵀ alvo, com um ridge
+    mínimo para combinações quase colineares; depois projeção nos limites.
+    """
+    AtA = np.einsum("nmf,nmk->nfk", A, A)
+    Atb = np.einsum("nmf,m->nf", A, alvo)
+    ridge = 1e-9 * np.trace(AtA, axis1=1, axis2=2)[:, None, None] + 1e-12
+    AtA = AtA + ridge * np.eye(A.shape[2])
+    g = np.linalg.solve(AtA, Atb[..., None])[..., 0]
+    g = np.clip(g, gmin, gmax)
+
+    normas = np.einsum("nmf,nmf->nf", A, A)
+    normas[normas == 0] = 1.0
+    for _ in range(iteracoes):
+        for f in range(A.shape[2]):
+            residuo = alvo - np.einsum("nmf,nf->nm", A, g)
+            passo = np.einsum("nm,nm->n", A[:, :, f], residuo) / normas[:, f]
+            g[:, f] = np.clip(g[:, f] + passo, gmin, gmax)
+    return g
+
+
+def _erros(totais: np.ndarray, meta: np.ndarray) -> tuple:
+    """Erro absoluto (g) e percentual médio, como calcularErro/calcularErroPercentual"""
+    diff = np.abs(totais - meta)
+    erro = diff.sum(axis=1)
+    base = np.where(meta > 0, meta, 1.0)
+    erro_percentual = (diff / base).mean(axis=1) * 100
+    return erro, erro_percentual
+
+
+def sugerir(
+    conn: sqlite3.Connection,
+    meta: Dict[str, float],
+    contexto: Optional[str] = None,
+    quantidade: int = 5,
+    min_gramas: float = 10,
+    max_gramas: float = 500,
+    tempo_max_ms: float = 200,
+    excluir_ids: Sequence[int] = (),
+    tolerancia_percentual: float = TOLERANCIA_PERCENTUAL,
+    candidatos_por_papel: int = CANDIDATOS_POR_PAPEL,
+    indice: Optional[IndiceCompatibilidade] = None,
+) -> dict:
+    """
+    Top-N refeições (2-3 alimentos) mais próximas da meta P/C/G.
+
+    `indice`: índice de compatibilidade já construído (o da API); sem ele,
+    é construído a partir de conn.
+
+    Retorna {"refeicoes": [...], "avaliadas": n, "tempo_ms": t, "completo": bool}.
+    """
+    inicio = time.perf_counter()
+    prazo = inicio + tempo_max_ms / 1000
+
+    candidatos = carregar_candidatos(conn, contexto, excluir_ids)
+    if not candidatos:
+        return {"refeicoes": [], "avaliadas": 0, "tempo_ms": 0.0, "completo": True}
+
+    por_g = np.array([c["por_g"] for c in candidatos])
+    kcal_g = np.array([c["kcal_g"] for c in candidatos])
+    papeis = papeis_por_cluster(por_g, [c["cluster"] for c in candidatos])
+
+    selecionados = {
+        papel: _podar(por_g, papeis, papel, candidatos_por_papel)
+        for papel in (PROT, CARB, GORD)
+    }
+    universo = np.unique(np.concatenate(list(selecionados.values())))
+    posicao = np.full(len(candidatos), -1)
+    posicao[universo] = np.arange(universo.size)
+    if indice is None:
+        indice = IndiceCompatibilidade.construir(conn)
+    compat = indice.matriz([candidatos[i]["id"] for i in universo])
+
+    meta_vec = np.array([meta.get(m, 0.0) for m in MACROS], dtype=float)
+    # Pondera cada macro pelo inverso da meta (erro relativo), sem explodir em meta ~0
+    peso = 1.0 / np.maximum(meta_vec, 5.0)
+    alvo = meta_vec * peso
+
+    # Estruturas de combinação: P+C, P+G, P+C+G (meta de carbo ~0 favorece P+G)
+    estruturas = [(PROT, CARB), (PROT, GORD), (PROT, CARB, GORD)]
+
+    melhores: List[tuple] = []  # (erro, erro_pct, indices, gramas)
+    avaliadas = 0
+    completo = True
+
+    for estrutura in estruturas:
+        grupos = [selecionados[p] for p in estrutura]
+        if any(g.size == 0 for g in grupos):
+            continue
+        malha = np.stack(np.meshgrid(*grupos, indexing="ij"), axis=-1).reshape(-1, len(estrutura))
+
+        # Compatibilidade par a par via matriz pré-computada
+        locais = posicao[malha]
+        mascara = np.ones(len(malha), dtype=bool)
+        for x, y in itertools.combinations(range(len(estrutura)), 2):
+            mascara &= compat[locais[:, x], locais[:, y]]
+        malha = malha[mascara]
+
+        for ini in range(0, len(malha), TAMANHO_LOTE):
+            # Pelo menos um lote é sempre avaliado, mesmo com orçamento estourado
+            if avaliadas and time.perf_counter() > prazo:
+                completo = False
+                break
+            lote = malha[ini:ini + TAMANHO_LOTE]
+            A = por_g[lote].transpose(0, 2, 1) * peso[None, :, None]
+
+            gramas = resolver_porcoes(A, alvo, min_gramas, max_gramas)
+            gramas = np.clip(
+                np.round(gramas / ARREDONDAMENTO_G) * ARREDONDAMENTO_G, min_gramas, max_gramas
+            )
+            totais = np.einsum("nfm,nf->nm", por_g[lote], gramas)
+            erro, erro_pct = _erros(totais, meta_vec)
+            avaliadas += len(lote)
+
+            ok = np.flatnonzero(erro_pct < tolerancia_percentual)
+            # Mantém só os melhores do lote para a seleção final
+            ok = ok[np.argsort(erro[ok])[: quantidade * 20]]
+            melhores.extend(
+                (float(erro[i]), float(erro_pct[i]), lote[i].tolist(), gramas[i].tolist())
+                for i in ok
+            )
+        if not completo:
+            break
+
+    melhores.sort(key=lambda m: m[0])
+
+    # Seleção com variedade: cada alimento aparece no máximo N vezes
+    usos: Dict[int, int] = {}
+    refeicoes = []
+    for erro, erro_pct, indices, gramas in melhores:
+        if any(usos.get(i, 0) >= MAX_REPETICOES_ALIMENTO for i in indices):
+            continue
+        for i in indices:
+            usos[i] = usos.get(i, 0) + 1
+
+        itens = []
+        for i, g in zip(indices, gramas):
+            c = candidatos[i]
+            itens.append({
+                "alimento_id": c["id"],
+                "alimento_nome": c["nome"],
+                "categoria": c["categoria"],
+                "gramas": g,
+                "kcal": round(kcal_g[i] * g, 1),
+                "prot": round(por_g[i, PROT] * g, 1),
+                "carb": round(por_g[i, CARB] * g, 1),
+                "gord": round(por_g[i, GORD] * g, 1),
+            })
+        refeicoes.append({
+            "itens": itens,
+            "totais": {
+                "kcal": round(sum(float(kcal_g[i]) * g for i, g in zip(indices, gramas)), 1),
+                **{
+                    m: round(sum(float(por_g[i, k]) * g for i, g in zip(indices, gramas)), 1)
+                    for k, m in enumerate(MACROS)
+                },
+            },
+            "erro": round(erro, 1),
+            "erro_percentual": round(erro_pct, 1),
+        })
+        if len(refeicoes) >= quantidade:
+            break
+
+    return {
+        "refeicoes": refeicoes,
+        "avaliadas": avaliadas,
+        "tempo_ms": round((time.perf_counter() - inicio) * 1000, 1),
+        "completo": completo,
+    }
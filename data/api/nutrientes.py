@@ -0,0 +1,282 @@
+# data/api/nutrientes.py
+"""
+Nutrientes além dos macros: catálogo, armazenamento e matriz em memória.
+
+Armazenamento (migração 7) em formato longo:
+- nutrientes: um por linha (codigo, nome, unidade), semeado de NUTRIENTES
+- alimento_nutrientes: (alimento_id, nutriente_id, valor por 100 g);
+  nutriente sem dado na TBCA (NA) simplesmente não tem linha
+
+Em memória, MatrizNutrientes guarda alimentos x nutrientes por grama
+(float64, NaN onde não há dado), com kcal/prot/carb/gord de `alimentos`
+nas primeiras colunas. É o motor de totais de refeições e histórico:
+um lote de triplas (pai, alimento_id, gramas) vira totais por pai com um
+gather (M[alimentos, nutrientes] * gramas) e um único np.bincount sobre
+(pai, nutriente). A matriz segue a versão de alimentos_versao, que também
+sobe com escritas em alimento_nutrientes.
+
+porcao_g = 0 ou ausente (possível em linhas importadas de CSV) vale 0 por
+grama, como nos totais materializados, em vez de dividir por zero.
+"""
+
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (codigo, nome, unidade, cabeçalho no tbca_original.csv normalizado)
+NUTRIENTES: Tuple[Tuple[str, str, str, str], ...] = (
+    ("energia_kj", "Energia", "kJ", "energia kj"),
+    ("umidade", "Umidade", "g", "umidade g"),
+    ("carb_disponivel", "Carboidrato disponível", "g", "carboidrato disponivel"),
+    ("fibra", "Fibra alimentar", "g", "fibra alimentar"),
+    ("alcool", "Álcool", "g", "alcool"),
+    ("cinzas", "Cinzas", "g", "cinzas"),
+    ("colesterol", "Colesterol", "mg", "colesterol"),
+    ("ag_saturados", "Ácidos graxos saturados", "g", "acidos graxos saturados"),
+    ("ag_monoinsaturados", "Ácidos graxos monoinsaturados", "g", "acidos graxos monoinsaturados"),
+    ("ag_poliinsaturados", "Ácidos graxos poli-insaturados", "g", "acidos graxos polinsaturados"),
+    ("ag_trans", "Ácidos graxos trans", "g", "acidos graxos trans"),
+    ("calcio", "Cálcio", "mg", "calcio"),
+    ("ferro", "Ferro", "mg", "ferro"),
+    ("sodio", "Sódio", "mg", "sodio"),
+    ("magnesio", "Magnésio", "mg", "magnesio"),
+    ("fosforo", "Fósforo", "mg", "fosforo"),
+    ("potassio", "Potássio", "mg", "potassio"),
+    ("zinco", "Zinco", "mg", "zinco"),
+    ("cobre", "Cobre", "mg", "cobre"),
+    ("selenio", "Selênio", "mcg", "selenio"),
+    ("vitamina_a_re", "Vitamina A (RE)", "mcg", "vitamina a (re)"),
+    ("vitamina_a_rae", "Vitamina A (RAE)", "mcg", "vitamina a (rae)"),
+    ("vitamina_d", "Vitamina D", "mcg", "vitamina d"),
+    ("vitamina_e", "Alfa-tocoferol (Vitamina E)", "mg", "alfa-tocoferol (vitamina e)"),
+    ("tiamina", "Tiamina", "mg", "tiamina"),
+    ("riboflavina", "Riboflavina", "mg", "riboflavina"),
+    ("niacina", "Niacina", "mg", "niacina"),
+    ("vitamina_b6", "Vitamina B6", "mg", "vitamina b6"),
+    ("vitamina_b12", "Vitamina B12", "mcg", "vitamina b12"),
+    ("vitamina_c", "Vitamina C", "mg", "vitamina c"),
+    ("folato", "Equivalente de folato", "mcg", "equivalente de folato"),
+    ("sal_adicao", "Sal de adição", "g", "sal de adicao"),
+    ("acucar_adicao", "Açúcar de adição", "g", "acucar de adicao"),
+)
+
+# Macros de `alimentos` (valor por porcao_g), mesmos códigos dos totais
+MACROS = (
+    ("kcal", "Energia", "kcal", "kcal"),
+    ("prot", "Proteína", "g", "prot_g"),
+    ("carb", "Carboidrato total", "g", "carb_g"),
+    ("gord", "Lipídios", "g", "gord_g"),
+)
+
+CODIGOS = tuple(m[0] for m in MACROS) + tuple(n[0] for n in NUTRIENTES)
+CODIGOS_MACROS = tuple(m[0] for m in MACROS)
+
+SQL_NUTRIENTES = """
+    CREATE TABLE IF NOT EXISTS nutrientes (
+        id INTEGER PRIMARY KEY,
+        codigo TEXT NOT NULL UNIQUE,
+        nome TEXT NOT NULL,
+        unidade TEXT NOT NULL
+    );
+
+    CREATE TABLE IF NOT EXISTS alimento_nutrientes (
+        alimento_id INTEGER NOT NULL REFERENCES alimentos(id) ON DELETE CASCADE,
+        nutriente_id INTEGER NOT NULL REFERENCES nutrientes(id),
+        valor REAL NOT NULL,  -- por 100 g
+        PRIMARY KEY (alimento_id, nutriente_id)
+    ) WITHOUT ROWID;
+"""
+
+
+class NutrienteDesconhecido(ValueError):
+    """Código fora de CODIGOS"""
+
+
+def por_grama(porcao: Any, valores: Any) -> np.ndarray:
+    """
+    Valores da porção (linhas x colunas) -> valores por grama.
+
+    porcao_g <= 0, NULL ou NaN resulta em 0 (sem ZeroDivisionError).
+    """
+    porcao = np.asarray(porcao, dtype=float).reshape(-1, 1)
+    valores = np.nan_to_num(np.asarray(valores, dtype=float))
+    valida = np.isfinite(porcao) & (porcao > 0)
+    return np.where(valida, valores / np.where(valida, porcao, 1.0), 0.0)
+
+
+def somar_por_grupo(
+    por_g_itens: np.ndarray,
+    gramas: np.ndarray,
+    grupos: np.ndarray,
+    n_grupos: int,
+) -> np.ndarray:
+    """
+    Σ gramas * por_g por grupo -> matriz (n_grupos x colunas).
+
+    por_g_itens é o gather da matriz (uma linha por item). Um único
+    bincount sobre o índice achatado (grupo, coluna): não exige grupos
+    ordenados e grupo sem itens fica 0.
+    """
+    k = por_g_itens.shape[1]
+    contribuicoes = por_g_itens * gramas[:, None]
+    indices = (grupos[:, None] * k + np.arange(k)).ravel()
+    somas = np.bincount(indices, weights=contribuicoes.ravel(), minlength=n_grupos * k)
+    return somas.reshape(n_grupos, k)
+
+
+def parse_codigos(texto: Optional[str]) -> Optional[List[str]]:
+    """'fibra,sodio' -> ['fibra', 'sodio']; 'todos' -> CODIGOS; vazio -> None"""
+    if not texto or not texto.strip():
+        return None
+    codigos = list(dict.fromkeys(c.strip().lower() for c in texto.split(",") if c.strip()))
+    if codigos == ["todos"]:
+        return list(CODIGOS)
+    desconhecidos = [c for c in codigos if c not in CODIGOS]
+    if desconhecidos:
+        raise NutrienteDesconhecido(
+            f"Nutrientes desconhecidos: {', '.join(desconhecidos)} (ver /api/nutrientes)"
+        )
+    return codigos
+
+
+class MatrizNutrientes:
+    """Alimentos x nutrientes, por grama (linhas em ordem de id)"""
+
+    def __init__(self, versao: int, ids: np.ndarray, valores: np.ndarray):
+        self.versao = versao
+        self.ids = ids
+        self.valores = valores
+        self.coluna = {codigo: i for i, codigo in enumerate(CODIGOS)}
+
+    @classmethod
+    def construir(cls, conn: sqlite3.Connection, versao: int = 0) -> "MatrizNutrientes":
+        colunas = ", ".join(m[3] for m in MACROS)
+        linhas = conn.execute(
+            f"SELECT id, porcao_g, {colunas} FROM alimentos ORDER BY id"
+        ).fetchall()
+        ids = np.array([row[0] for row in linhas], dtype=np.int64)
+        valores = np.full((len(ids), len(CODIGOS)), np.nan)
+
+        if linhas:
+            bruto = np.array([row[1:] for row in linhas], dtype=float)  # None -> nan
+            valores[:, :len(MACROS)] = por_grama(bruto[:, 0], bruto[:, 1:])
+
+        tabela = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alimento_nutrientes'"
+        ).fetchone()
+        if tabela is not None and len(ids):
+            longo = np.array(conn.execute("""
+                SELECT an.alimento_id, n.codigo, an.valor
+                FROM alimento_nutrientes an JOIN nutrientes n ON n.id = an.nutriente_id
+            """).fetchall(), dtype=object)
+            if len(longo):
+                posicao = {codigo: i for i, codigo in enumerate(CODIGOS)}
+                linhas_idx = np.searchsorted(ids, longo[:, 0].astype(np.int64))
+                colunas_idx = np.array([posicao.get(c, -1) for c in longo[:, 1]])
+                validos = colunas_idx >= 0
+                valores[linhas_idx[validos], colunas_idx[validos]] = (
+                    longo[validos, 2].astype(float) / 100.0
+                )
+
+        return cls(versao, ids, valores)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def posicoes(self, alimento_ids: Sequence[int]) -> np.ndarray:
+        """Linha de cada id; -1 para id fora da matriz"""
+        alvo = np.asarray(alimento_ids, dtype=np.int64)
+        pos = np.searchsorted(self.ids, alvo)
+        pos = np.minimum(pos, len(self.ids) - 1) if len(self.ids) else np.zeros_like(alvo)
+        encontrados = (self.ids[pos] == alvo) if len(self.ids) else np.zeros(alvo.shape, bool)
+        return np.where(encontrados, pos, -1)
+
+    def somar(
+        self,
+        pais: Sequence[Any],
+        alimento_ids: Sequence[int],
+        gramas: Sequence[float],
+        codigos: Sequence[str] = CODIGOS_MACROS,
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Totais agrupados de triplas (pai, alimento_id, gramas).
+
+        Retorna (pais únicos, somas pai x código, itens com dado pai x código).
+        Alimento fora da matriz é ignorado; nutriente sem dado conta 0.
+        """
+        cols = [self.coluna[c] for c in codigos]
+        unicos, grupos = np.unique(np.asarray(pais), return_inverse=True)
+        pos = self.posicoes(alimento_ids)
+        validos = pos >= 0
+        linhas, grupos = pos[validos], grupos[validos]
+        g = np.asarray(gramas, dtype=float)[validos]
+
+        bloco = self.valores[np.ix_(linhas, cols)]
+        ausentes = np.isnan(bloco)
+        if ausentes.any():
+            somas = somar_por_grupo(np.nan_to_num(bloco), g, grupos, len(unicos))
+            com_dado = somar_por_grupo(
+                (~ausentes).astype(float), np.ones_like(g), grupos, len(unicos)
+            )
+        else:
+            somas = somar_por_grupo(bloco, g, grupos, len(unicos))
+            com_dado = np.ones_like(somas)
+        return unicos, somas, com_dado
+
+    def totais_por_pai(
+        self,
+        pais: Sequence[Any],
+        alimento_ids: Sequence[int],
+        gramas: Sequence[float],
+        codigos: Sequence[str],
+    ) -> Dict[Any, List[Optional[float]]]:
+        """
+        {pai: [total de cada código]} sem arredondar; None quando nenhum
+        item do pai tem o dado. Pais sem itens não aparecem.
+        """
+        unicos, somas, com_dado = self.somar(pais, alimento_ids, gramas, codigos)
+        totais = np.where(com_dado > 0, somas, np.nan).tolist()
+        return {
+            pai: [None if v != v else v for v in linha]  # NaN -> None
+            for pai, linha in zip(unicos.tolist(), totais)
+        }
+
+    def cobertura(self) -> Dict[str, int]:
+        """Quantos alimentos têm dado de cada nutriente"""
+        presentes = (~np.isnan(self.valores)).sum(axis=0)
+        return {codigo: int(n) for codigo, n in zip(CODIGOS, presentes)}
+
+
+def listar_catalogo(matriz: MatrizNutrientes) -> List[dict]:
+    """Lista para GET /api/nutrientes"""
+    cobertura = matriz.cobertura()
+    return [
+        {"codigo": codigo, "nome": nome, "unidade": unidade, "alimentos": cobertura[codigo]}
+        for codigo, nome, unidade, _ in MACROS + NUTRIENTES
+    ]
+
+
+class CacheMatriz:
+    """
+    Matriz do worker, reconstruída quando alimentos_versao (a mesma do
+    catálogo) muda ou após invalidar().
+    """
+
+    def __init__(self):
+        self._matriz: Optional[MatrizNutrientes] = None
+        self._lock = threading.Lock()
+
+    def obter(self, conn: sqlite3.Connection, versao: int) -> MatrizNutrientes:
+        matriz = self._matriz
+        if matriz is not None and matriz.versao == versao:
+            return matriz
+        with self._lock:
+            if self._matriz is None or self._matriz.versao != versao:
+                self._matriz = MatrizNutrientes.construir(conn, versao)
+            return self._matriz
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._matriz = None
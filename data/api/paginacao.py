@@ -0,0 +1,61 @@
+# data/api/paginacao.py
+"""
+Paginação por cursor (keyset) das listagens.
+
+O cursor é opaco para o cliente: base64url de {"e": escopo, "k": chave},
+onde chave é a tupla de ordenação da última linha da página, por exemplo
+(criada_em, id) no histórico ou (nome, id) nos alimentos. A próxima página
+continua com WHERE (criada_em, id) < (?, ?), que usa índice, em vez de
+OFFSET, que relê tudo o que veio antes.
+"""
+
+import base64
+import binascii
+import json
+from typing import Callable, List, Optional, Sequence, Tuple
+
+
+class CursorInvalido(ValueError):
+    """Cursor malformado ou de outra listagem"""
+
+
+def codificar_cursor(escopo: str, chave: Sequence) -> str:
+    dados = json.dumps({"e": escopo, "k": list(chave)}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(dados.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(escopo: str, cursor: str, tipos: Sequence[type]) -> tuple:
+    """Chave do cursor; CursorInvalido se não for desta listagem/formato"""
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        dados = json.loads(bruto)
+    except (binascii.Error, ValueError):
+        raise CursorInvalido("Cursor inválido")
+
+    if not isinstance(dados, dict):
+        raise CursorInvalido("Cursor inválido")
+    chave = dados.get("k")
+    if (
+        dados.get("e") != escopo
+        or not isinstance(chave, list)
+        or len(chave) != len(tipos)
+        or not all(isinstance(v, t) and not isinstance(v, bool) for v, t in zip(chave, tipos))
+    ):
+        raise CursorInvalido(f"Cursor inválido para {escopo}")
+    return tuple(chave)
+
+
+def fatiar_pagina(
+    linhas: List[dict],
+    limite: int,
+    escopo: str,
+    chave: Callable[[dict], tuple],
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    `linhas` deve vir com limite + 1 itens (se houver): o excedente só indica
+    que existe próxima página. Retorna (página, next_cursor ou None).
+    """
+    if len(linhas) <= limite:
+        return linhas, None
+    pagina = linhas[:limite]
+    return pagina, codificar_cursor(escopo, chave(pagina[-1]))
@@ -0,0 +1,564 @@
+# data/api/plano.py
+"""
+Plano semanal no servidor (POST /api/plano/semanal).
+
+1. Candidatos por slot (no processo da API, que tem o banco):
+   - refeições montadas por montador.sugerir() para a meta do slot
+     (fração da meta diária), no contexto do tipo do slot
+   - refeições salvas ativas do mesmo tipo, com as porções escaladas
+     para as kcal do slot (fator entre FATOR_MIN e FATOR_MAX)
+   Alimentos acima de `preco_max` ($ a $$$$) ficam de fora.
+2. Escolha de um candidato por (dia, slot): busca local com reinícios
+   (varre as posições e troca cada uma pelo candidato que mais reduz o
+   custo; num ótimo local, perturba parte das posições e continua).
+   Custo = Σ erro percentual dos totais do dia vs. meta diária +
+   PENALIDADE x violações de variedade (mesmo alimento a menos de
+   `sem_repetir_alimento_dias` dias, mesma refeição salva a menos de
+   `sem_repetir_refeicao_dias`).
+3. A busca roda em paralelo num pool de processos (PLANO_PROCESSOS,
+   sementes diferentes) e na thread da requisição, com prazo absoluto:
+   cada uma devolve o melhor plano que tinha no prazo e a API fica com o
+   melhor de todos. Sem pool (PLANO_PROCESSOS=0) ou com o pool quebrado,
+   só a busca da thread conta.
+
+O problema enviado aos processos é só NumPy (totais, alimentos em CSR,
+índice da refeição salva): nomes e itens ficam no processo da API.
+"""
+
+import multiprocessing
+import os
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import montador
+from busca import normalizar
+from compatibilidade import IndiceCompatibilidade
+
+# Processos da busca (0 = na thread da requisição)
+PROCESSOS = int(os.getenv("PLANO_PROCESSOS", str(min(4, os.cpu_count() or 1))))
+
+MACROS = ("kcal", "prot", "carb", "gord")
+CANDIDATOS_POR_SLOT = 30
+TOLERANCIA_CANDIDATOS = 25.0
+# Fração do orçamento de tempo para gerar candidatos (o resto é da busca)
+FRACAO_CANDIDATOS = 0.3
+FATOR_MIN, FATOR_MAX = 0.5, 2.0
+PENALIDADE = 100.0
+MAX_REINICIOS = 200
+FRACAO_PERTURBACAO = 0.2
+# Os processos param FOLGA_S antes do prazo e a API espera até FOLGA_S
+# depois dele (última varredura, avaliação e IPC)
+FOLGA_S = 0.1
+
+# tipo do slot -> contexto_culinario dos candidatos (como em bench_sugestao.py)
+CONTEXTO_POR_TIPO = {"whey": "lanche"}
+
+
+def nivel_preco(preco: Optional[str]) -> Optional[int]:
+    """'$$' -> 2; vazio ou fora do padrão -> None (sem restrição)"""
+    texto = (preco or "").strip()
+    return len(texto) if texto and set(texto) == {"$"} else None
+
+
+# ============================
+# CANDIDATOS
+# ============================
+
+def _refeicoes_salvas(
+    conn: sqlite3.Connection,
+    tipos: Sequence[str],
+    bloqueados: set,
+) -> Dict[str, List[dict]]:
+    """{tipo: [refeição ativa com itens e totais]}, sem alimentos bloqueados"""
+    marcadores = ",".join("?" * len(tipos))
+    refeicoes = {
+        row[0]: {"refeicao_id": row[0], "nome": row[1], "tipo": row[2],
+                 "totais": dict(zip(MACROS, row[3:])), "itens": []}
+        for row in conn.execute(f"""
+            SELECT r.id, r.nome, r.tipo, t.kcal, t.prot, t.carb, t.gord
+            FROM refeicoes r JOIN refeicoes_totais t ON t.refeicao_id = r.id
+            WHERE r.ativa = 1 AND r.tipo IN ({marcadores})
+            ORDER BY r.id
+        """, list(tipos))
+    }
+    if not refeicoes:
+        return {}
+    ids = list(refeicoes)
+    for row in conn.execute(f"""
+        SELECT ri.refeicao_id, ri.alimento_id, a.nome, a.categoria, ri.gramas,
+               COALESCE(a.kcal / NULLIF(a.porcao_g, 0), 0),
+               COALESCE(a.prot_g / NULLIF(a.porcao_g, 0), 0),
+               COALESCE(a.carb_g / NULLIF(a.porcao_g, 0), 0),
+               COALESCE(a.gord_g / NULLIF(a.porcao_g, 0), 0)
+        FROM refeicoes_itens ri JOIN alimentos a ON a.id = ri.alimento_id
+        WHERE ri.refeicao_id IN ({",".join("?" * len(ids))})
+        ORDER BY ri.refeicao_id, ri.ordem, ri.id
+    """, ids):
+        refeicoes[row[0]]["itens"].append({
+            "alimento_id": row[1], "alimento_nome": row[2], "categoria": row[3],
+            "gramas": row[4], "por_g": row[5:],
+        })
+
+    por_tipo: Dict[str, List[dict]] = {}
+    for refeicao in refeicoes.values():
+        itens = refeicao["itens"]
+        if itens and refeicao["totais"]["kcal"] > 0 and not any(
+            i["alimento_id"] in bloqueados for i in itens
+        ):
+            por_tipo.setdefault(refeicao["tipo"], []).append(refeicao)
+    return por_tipo
+
+
+def _escalar(refeicao: dict, kcal_alvo: float) -> dict:
+    """Refeição salva com porções escaladas para kcal_alvo"""
+    fator = min(max(kcal_alvo / refeicao["totais"]["kcal"], FATOR_MIN), FATOR_MAX)
+    itens = []
+    for item in refeicao["itens"]:
+        gramas = round(item["gramas"] * fator / montador.ARREDONDAMENTO_G) * montador.ARREDONDAMENTO_G
+        gramas = max(gramas, montador.ARREDONDAMENTO_G)
+        itens.append({
+            "alimento_id": item["alimento_id"],
+            "alimento_nome": item["alimento_nome"],
+            "categoria": item["categoria"],
+            "gramas": gramas,
+            **{m: round(v * gramas, 1) for m, v in zip(MACROS, item["por_g"])},
+        })
+    return {
+        "origem": "refeicao",
+        "refeicao_id": refeicao["refeicao_id"],
+        "nome": refeicao["nome"],
+        "fator_porcao": round(fator, 2),
+        "itens": itens,
+        "totais": {m: round(sum(i[m] for i in itens), 1) for m in MACROS},
+    }
+
+
+def gerar_candidatos(
+    conn: sqlite3.Connection,
+    slots: Dict[Tuple[str, float], dict],
+    meta: Dict[str, float],
+    bloqueados: set,
+    incluir_salvas: bool,
+    tempo_max_ms: float,
+    indice: Optional[IndiceCompatibilidade] = None,
+) -> Dict[Tuple[str, float], List[dict]]:
+    """
+    Candidatos por slot distinto (tipo, fração): montador + refeições
+    salvas. O tempo é dividido igualmente entre os slots.
+    """
+    if indice is None:
+        indice = IndiceCompatibilidade.construir(conn)
+    salvas = _refeicoes_salvas(conn, sorted({t for t, _ in slots}), bloqueados) if incluir_salvas else {}
+    tempo_slot = max(tempo_max_ms / max(len(slots), 1), 10.0)
+
+    candidatos = {}
+    for (tipo, fracao) in slots:
+        meta_slot = {m: meta[m] * fracao for m in MACROS}
+        contexto = CONTEXTO_POR_TIPO.get(normalizar(tipo), tipo)
+        kwargs = dict(
+            meta=meta_slot,
+            quantidade=CANDIDATOS_POR_SLOT,
+            tempo_max_ms=tempo_slot,
+            excluir_ids=bloqueados,
+            tolerancia_percentual=TOLERANCIA_CANDIDATOS,
+            indice=indice,
+        )
+        montadas = montador.sugerir(conn, contexto=contexto, **kwargs)["refeicoes"]
+        if not montadas:
+            # Tipo sem contexto culinário correspondente: qualquer alimento
+            montadas = montador.sugerir(conn, contexto=None, **kwargs)["refeicoes"]
+        lista = [
+            {"origem": "montador", "refeicao_id": None, "nome": None, **r}
+            for r in montadas
+        ]
+        lista += [_escalar(r, meta_slot["kcal"]) for r in salvas.get(tipo, [])]
+        candidatos[(tipo, fracao)] = lista
+    return candidatos
+
+
+def montar_problema(
+    posicoes: List[Tuple[int, Tuple[str, float]]],
+    candidatos: Dict[Tuple[str, float], List[dict]],
+    meta: Dict[str, float],
+    dias: int,
+    janela_alimento: int,
+    janela_refeicao: int,
+) -> dict:
+    """Problema só com arrays NumPy (enviado aos processos)"""
+    chaves = list(candidatos)
+    alimentos: Dict[int, int] = {}
+    refeicoes: Dict[int, int] = {}
+    pools = []
+    for chave in chaves:
+        lista = candidatos[chave]
+        indptr, indices = [0], []
+        for c in lista:
+            indices.extend(
+                alimentos.setdefault(i["alimento_id"], len(alimentos))
+                for i in c["itens"]
+            )
+            indptr.append(len(indices))
+        pools.append({
+            "totais": np.array([[c["totais"][m] for m in MACROS] for c in lista], dtype=float)
+                      .reshape(len(lista), len(MACROS)),
+            "indptr": np.array(indptr, dtype=np.int64),
+            "indices": np.array(indices, dtype=np.int64),
+            "refeicao": np.array([
+                -1 if c["refeicao_id"] is None
+                else refeicoes.setdefault(c["refeicao_id"], len(refeicoes))
+                for c in lista
+            ], dtype=np.int64),
+        })
+    alvo = np.array([meta[m] for m in MACROS], dtype=float)
+    return {
+        "dias": dias,
+        "pos_dia": np.array([d for d, _ in posicoes], dtype=np.int64),
+        "pos_pool": np.array([chaves.index(k) for _, k in posicoes], dtype=np.int64),
+        "pools": pools,
+        "alvo": alvo,
+        "base": np.where(alvo > 0, alvo, 1.0),
+        "n_alimentos": len(alimentos),
+        "n_refeicoes": len(refeicoes),
+        "janela_alimento": janela_alimento,
+        "janela_refeicao": janela_refeicao,
+    }
+
+
+# ============================
+# BUSCA (roda nos processos)
+# ============================
+
+class _Estado:
+    """Escolhas atuais + totais por dia e uso de alimentos/refeições por dia"""
+
+    def __init__(self, problema: dict):
+        self.p = problema
+        self.escolha = np.full(len(problema["pos_dia"]), -1, dtype=np.int64)
+        self.totais = np.zeros((problema["dias"], len(MACROS)))
+        self.uso_alimento = np.zeros((problema["dias"], problema["n_alimentos"]), dtype=np.int64)
+        self.uso_refeicao = np.zeros((problema["dias"], problema["n_refeicoes"]), dtype=np.int64)
+
+    def _aplicar(self, pos: int, sinal: int) -> None:
+        c = self.escolha[pos]
+        if c < 0:
+            return
+        d = self.p["pos_dia"][pos]
+        pool = self.p["pools"][self.p["pos_pool"][pos]]
+        self.totais[d] += sinal * pool["totais"][c]
+        np.add.at(self.uso_alimento[d], pool["indices"][pool["indptr"][c]:pool["indptr"][c + 1]], sinal)
+        if pool["refeicao"][c] >= 0:
+            self.uso_refeicao[d, pool["refeicao"][c]] += sinal
+
+    def trocar(self, pos: int, c: int) -> None:
+        self._aplicar(pos, -1)
+        self.escolha[pos] = c
+        self._aplicar(pos, 1)
+
+    def _janela(self, uso: np.ndarray, d: int, janela: int) -> Optional[np.ndarray]:
+        if janela <= 0 or not uso.shape[1]:
+            return None
+        return uso[max(0, d - janela + 1):d + janela].sum(axis=0)
+
+    def violacoes(self, pos: int) -> np.ndarray:
+        """
+        Repetições de cada candidato da posição com as já escolhidas dentro
+        das janelas (alimentos em comum + mesma refeição salva)
+        """
+        d = self.p["pos_dia"][pos]
+        pool = self.p["pools"][self.p["pos_pool"][pos]]
+        contagem = np.zeros(len(pool["totais"]), dtype=np.int64)
+        janela = self._janela(self.uso_alimento, d, self.p["janela_alimento"])
+        if janela is not None and len(pool["indices"]):
+            vazios = np.diff(pool["indptr"]) == 0
+            inicios = np.minimum(pool["indptr"][:-1], len(pool["indices"]) - 1)
+            contagem += np.where(vazios, 0, np.add.reduceat(janela[pool["indices"]], inicios))
+        janela = self._janela(self.uso_refeicao, d, self.p["janela_refeicao"])
+        if janela is not None:
+            salvas = pool["refeicao"] >= 0
+            contagem[salvas] += janela[pool["refeicao"][salvas]]
+        return contagem
+
+    def custos(self, pos: int) -> np.ndarray:
+        """Custo do dia da posição para cada candidato (com ela vazia)"""
+        d = self.p["pos_dia"][pos]
+        pool = self.p["pools"][self.p["pos_pool"][pos]]
+        novos = self.totais[d] + pool["totais"]
+        erro = (np.abs(novos - self.p["alvo"]) / self.p["base"]).mean(axis=1) * 100
+        return erro + PENALIDADE * self.violacoes(pos)
+
+
+def avaliar(problema: dict, escolha: np.ndarray) -> Tuple[float, float, int]:
+    """(custo, Σ erro percentual dos dias, violações de variedade)"""
+    estado = _Estado(problema)
+    violacoes = 0
+    for pos, c in enumerate(escolha):
+        # Contra as posições já aplicadas: cada par repetido conta uma vez
+        if c >= 0:
+            violacoes += int(estado.violacoes(pos)[c])
+        estado.trocar(pos, c)
+    erros = (np.abs(estado.totais - problema["alvo"]) / problema["base"]).mean(axis=1) * 100
+    erro = float(erros.sum())
+    return erro + PENALIDADE * violacoes, erro, violacoes
+
+
+def buscar(problema: dict, semente: int, prazo: float) -> dict:
+    """
+    Busca local com reinícios até o prazo (time.time() absoluto) ou
+    MAX_REINICIOS. A primeira varredura é a construção gulosa.
+    """
+    rng = random.Random(semente)
+    estado = _Estado(problema)
+    posicoes = list(range(len(problema["pos_dia"])))
+    melhor: Optional[Tuple[float, np.ndarray]] = None
+    varreduras = reinicios = 0
+    convergiu = False
+
+    while True:
+        rng.shuffle(posicoes)
+        mudou = False
+        for pos in posicoes:
+            atual = estado.escolha[pos]
+            estado.trocar(pos, -1)
+            custos = estado.custos(pos)
+            if not len(custos):
+                continue
+            novo = int(np.argmin(custos))
+            if atual >= 0 and custos[atual] <= custos[novo] + 1e-9:
+                novo = int(atual)
+            mudou |= novo != atual
+            estado.trocar(pos, novo)
+        varreduras += 1
+
+        if not mudou:
+            custo = avaliar(problema, estado.escolha)[0]
+            if melhor is None or custo < melhor[0]:
+                melhor = (custo, estado.escolha.copy())
+            reinicios += 1
+            if reinicios >= MAX_REINICIOS:
+                convergiu = True
+                break
+            # Perturbação: parte das posições recebe um candidato aleatório
+            for pos in rng.sample(posicoes, max(1, int(len(posicoes) * FRACAO_PERTURBACAO))):
+                n = len(problema["pools"][problema["pos_pool"][pos]]["totais"])
+                if n:
+                    estado.trocar(pos, rng.randrange(n))
+        if time.time() >= prazo:
+            break
+
+    # Prazo no meio de uma descida: o estado atual também concorre
+    custo = avaliar(problema, estado.escolha)[0]
+    if melhor is None or custo < melhor[0]:
+        melhor = (custo, estado.escolha.copy())
+    return {
+        "custo": melhor[0],
+        "escolha": melhor[1],
+        "varreduras": varreduras,
+        "reinicios": reinicios,
+        "convergiu": convergiu,
+        "semente": semente,
+    }
+
+
+def _aquecer() -> int:
+    """Tarefa vazia: força a importação de plano/NumPy no processo"""
+    return os.getpid()
+
+
+class PoolBusca:
+    """
+    ProcessPoolExecutor (spawn) criado no primeiro uso e reaproveitado.
+    processos <= 0: sem pool, a busca roda na thread de quem chama.
+    """
+
+    def __init__(self, processos: int = PROCESSOS):
+        self.processos = processos
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def obter(self) -> Optional[ProcessPoolExecutor]:
+        if self.processos <= 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.processos,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def aquecer(self) -> None:
+        """
+        Sobe os processos em segundo plano (sem esperar): no primeiro uso,
+        o spawn + imports cabem mal num orçamento de poucos segundos
+        """
+        executor = self.obter()
+        if executor is not None:
+            try:
+                for _ in range(self.processos):
+                    executor.submit(_aquecer)
+            except BrokenProcessPool:
+                self.descartar()
+
+    def descartar(self) -> None:
+        """Pool quebrado (processo morto): o próximo obter() cria outro"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fechar(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def buscar_paralelo(
+    problema: dict,
+    prazo: float,
+    pool: Optional[PoolBusca] = None,
+    semente: int = 0,
+) -> Tuple[dict, int, bool]:
+    """
+    Uma busca por processo (sementes semente+1..semente+N) e outra na
+    thread de quem chama (semente), todas até o prazo: com o pool ainda
+    subindo ou quebrado, a da thread garante o resultado.
+
+    Retorna (melhor resultado, processos que responderam, todas convergiram).
+    """
+    executor = pool.obter() if pool is not None else None
+    futuros = []
+    if executor is not None:
+        try:
+            futuros = [
+                executor.submit(buscar, problema, semente + i + 1, prazo - FOLGA_S)
+                for i in range(pool.processos)
+            ]
+        except BrokenProcessPool:
+            pool.descartar()
+
+    resultados = [buscar(problema, semente, prazo)]
+    processos = 0
+    if futuros:
+        prontos, pendentes = wait(futuros, timeout=max(prazo - time.time(), 0) + FOLGA_S)
+        for futuro in pendentes:
+            futuro.cancel()
+        try:
+            resultados += [f.result() for f in prontos]
+        except BrokenProcessPool:
+            pool.descartar()
+        processos = len(resultados) - 1
+    completo = processos == len(futuros) and all(r["convergiu"] for r in resultados)
+    return min(resultados, key=lambda r: r["custo"]), processos, completo
+
+
+# ============================
+# PLANO
+# ============================
+
+def planejar(
+    conn: sqlite3.Connection,
+    meta: Dict[str, float],
+    slots_por_dia: List[List[Tuple[str, Optional[float]]]],
+    sem_repetir_alimento_dias: int = 1,
+    sem_repetir_refeicao_dias: int = 7,
+    preco_max: Optional[int] = None,
+    incluir_refeicoes_salvas: bool = True,
+    tempo_max_ms: float = 2000,
+    semente: Optional[int] = None,
+    indice: Optional[IndiceCompatibilidade] = None,
+    pool: Optional[PoolBusca] = None,
+) -> dict:
+    """
+    Plano de len(slots_por_dia) dias. Cada slot é (tipo, fração da meta
+    diária); frações None dividem igualmente o que sobra no dia.
+    """
+    inicio = time.time()
+    prazo = inicio + tempo_max_ms / 1000
+    dias = len(slots_por_dia)
+
+    posicoes: List[Tuple[int, Tuple[str, float]]] = []
+    for d, slots in enumerate(slots_por_dia):
+        definidas = sum(f for _, f in slots if f is not None)
+        livres = [t for t, f in slots if f is None]
+        resto = max(1.0 - definidas, 0.0) / len(livres) if livres else 0.0
+        for tipo, fracao in slots:
+            posicoes.append((d, (tipo, round(fracao if fracao is not None else resto, 4))))
+
+    bloqueados = set()
+    if preco_max is not None:
+        bloqueados = {
+            row[0] for row in conn.execute("SELECT id, preco FROM alimentos")
+            if (nivel_preco(row[1]) or 0) > preco_max
+        }
+
+    candidatos = gerar_candidatos(
+        conn,
+        {k: None for _, k in posicoes},
+        meta,
+        bloqueados,
+        incluir_refeicoes_salvas,
+        tempo_max_ms * FRACAO_CANDIDATOS,
+        indice,
+    )
+    tempo_candidatos = (time.time() - inicio) * 1000
+    problema = montar_problema(
+        posicoes, candidatos, meta, dias, sem_repetir_alimento_dias, sem_repetir_refeicao_dias
+    )
+    semente = random.randrange(1 << 30) if semente is None else semente
+    melhor, processos, completo = buscar_paralelo(problema, prazo, pool, semente)
+    custo, erro_total, violacoes = avaliar(problema, melhor["escolha"])
+
+    plano = [{"dia": d + 1, "refeicoes": []} for d in range(dias)]
+    usados: List[int] = []
+    for pos, (d, chave) in enumerate(posicoes):
+        c = int(melhor["escolha"][pos])
+        lista = candidatos[chave]
+        refeicao = dict(lista[c]) if c >= 0 and lista else None
+        if refeicao is not None:
+            usados.extend(i["alimento_id"] for i in refeicao["itens"])
+        plano[d]["refeicoes"].append({"tipo": chave[0], "fracao": chave[1], "refeicao": refeicao})
+
+    distintos = sorted(set(usados))
+    precos = dict(conn.execute(
+        f"SELECT id, preco FROM alimentos WHERE id IN ({','.join('?' * len(distintos))})",
+        distintos,
+    )) if distintos else {}
+    niveis = [n for n in (nivel_preco(precos.get(i)) for i in usados) if n is not None]
+
+    alvo = np.array([meta[m] for m in MACROS])
+    base = np.where(alvo > 0, alvo, 1.0)
+    for dia in plano:
+        totais = np.zeros(len(MACROS))
+        for slot in dia["refeicoes"]:
+            if slot["refeicao"] is not None:
+                totais += [slot["refeicao"]["totais"][m] for m in MACROS]
+        dia["totais"] = {m: round(float(v), 1) for m, v in zip(MACROS, totais)}
+        dia["erro_percentual"] = round(float((np.abs(totais - alvo) / base).mean() * 100), 1)
+
+    return {
+        "dias": plano,
+        "meta_diaria": meta,
+        "resumo": {
+            "erro_percentual_medio": round(erro_total / max(dias, 1), 1),
+            "violacoes_variedade": violacoes,
+            "preco_medio": round(sum(niveis) / len(niveis), 2) if niveis else None,
+        },
+        "busca": {
+            "candidatos": {f"{t}:{f}": len(v) for (t, f), v in candidatos.items()},
+            "processos": processos,
+            "varreduras": melhor["varreduras"],
+            "reinicios": melhor["reinicios"],
+            "semente": melhor["semente"],
+            "tempo_candidatos_ms": round(tempo_candidatos, 1),
+            "tempo_ms": round((time.time() - inicio) * 1000, 1),
+            "completo": completo,
+        },
+    }
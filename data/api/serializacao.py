@@ -0,0 +1,57 @@
+# data/api/serializacao.py
+"""
+Serialização JSON das respostas.
+
+- RespostaJSON: renderiza com orjson (se o pacote estiver instalado; é
+  opcional, como o brotli) ou com o json da stdlib, no mesmo formato do
+  JSONResponse do Starlette. É a default_response_class do app.
+- Rotas quentes devolvem RespostaJSON(conteudo) já pronta: quando a rota
+  devolve dados, o FastAPI ainda passa tudo pelo jsonable_encoder (uma
+  cópia recursiva de cada dict/lista) antes de renderizar. Devolvendo a
+  Response, essa etapa some e a renderização roda na thread do
+  ExecutorBanco, fora do event loop.
+- compactar(): formato colunar {"colunas": [...], "linhas": [[...], ...]},
+  com os nomes das colunas uma vez só e as linhas como tuplas do SQLite /
+  do catálogo (sem montar um dict por linha).
+
+Diferenças do orjson em relação ao json da stdlib que importam aqui:
+NaN/Infinity viram null (a stdlib geraria JSON inválido) e chaves não
+string (int) viram string, como na stdlib (OPT_NON_STR_KEYS).
+"""
+
+import json
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+if orjson is not None:
+    OPCOES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def dumps(conteudo: Any) -> bytes:
+    """JSON compacto em UTF-8 (orjson se disponível)"""
+    if orjson is not None:
+        return orjson.dumps(conteudo, option=OPCOES_ORJSON)
+    return json.dumps(
+        conteudo, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class RespostaJSON(JSONResponse):
+    """JSONResponse renderizada por dumps() (orjson quando instalado)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def compactar(colunas: Sequence[str], linhas: Iterable[Sequence]) -> dict:
+    """{"colunas": [...], "linhas": [[...], ...]} a partir de tuplas/sqlite3.Row"""
+    return {
+        "colunas": list(colunas),
+        "linhas": [row if isinstance(row, tuple) else tuple(row) for row in linhas],
+    }
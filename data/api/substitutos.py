@@ -0,0 +1,229 @@
+# data/api/substitutos.py
+"""
+Substitutos de um alimento por similaridade nutricional (kNN em NumPy).
+
+Perfil de cada alimento = nutrientes por kcal (não por grama): a troca é
+feita com as gramas que igualam as calorias do original, então o que
+importa é quanto de proteína, carboidrato, gordura (e, se pedido, fibra,
+sódio...) vem junto com cada kcal. Cada coluna é padronizada sobre o
+catálogo (mediana e IQR, com corte em ±LIMITE_Z para alimentos quase sem
+energia não dominarem) e nutriente sem dado vira 0 (a mediana): não
+aproxima nem afasta.
+
+O índice guarda a matriz padronizada de todos os códigos de CODIGOS,
+contígua em float32, mais máscaras de contexto (uma coluna booleana por
+contexto do índice de compatibilidade) e a categoria de cada alimento.
+Uma consulta é: máscara de candidatos, distância euclidiana quadrática
+contra as linhas elegíveis e np.argpartition para o top-k - sem laço
+Python por alimento, na casa de poucos ms mesmo com a TBCA inteira.
+
+Segue a versão de alimentos_versao, como a matriz de nutrientes e o
+índice de compatibilidade de onde é construído.
+"""
+
+import threading
+import warnings
+from typing import Optional, Sequence
+
+import numpy as np
+
+from busca import normalizar
+from compatibilidade import CONTEXTO_UNIVERSAL, IndiceCompatibilidade
+from nutrientes import CODIGOS, CODIGOS_MACROS, MatrizNutrientes
+
+# Perfil padrão: macros por kcal (kcal por kcal é constante e fica de fora)
+PERFIL_MACROS = ("prot", "carb", "gord")
+LIMITE_Z = 4.0
+CATEGORIAS = ("mesma", "outra", "qualquer")
+
+
+class SemEnergia(ValueError):
+    """Alimento sem kcal: não há gramas que igualem as calorias"""
+
+
+def padronizar(valores: np.ndarray) -> np.ndarray:
+    """
+    (valor - mediana) / IQR por coluna, cortado em ±LIMITE_Z; NaN -> 0.
+    Coluna constante (IQR 0) usa o desvio padrão; sem dispersão, fica 0.
+    """
+    if not len(valores):
+        return np.zeros_like(valores)
+    with warnings.catch_warnings(), np.errstate(all="ignore"):
+        # Colunas sem nenhum dado (All-NaN) dão NaN e caem no 0 do fim
+        warnings.simplefilter("ignore", RuntimeWarning)
+        centro = np.nanmedian(valores, axis=0)
+        q1, q3 = np.nanpercentile(valores, (25, 75), axis=0)
+        desvio = np.nanstd(valores, axis=0)
+    escala = q3 - q1
+    escala = np.where(escala > 0, escala, desvio)
+    escala = np.where(np.isfinite(escala) & (escala > 0), escala, 1.0)
+    centro = np.nan_to_num(centro)
+    z = np.clip((valores - centro) / escala, -LIMITE_Z, LIMITE_Z)
+    return np.nan_to_num(z, nan=0.0)
+
+
+def desempacotar(mascaras: Sequence[int], n_bits: int) -> np.ndarray:
+    """Máscaras de bits (int Python) -> matriz booleana linhas x bits"""
+    bits = np.arange(n_bits)
+    if n_bits < 63:
+        return (np.asarray(mascaras, dtype=np.int64).reshape(-1, 1) >> bits & 1).astype(bool)
+    return np.array([[m >> int(b) & 1 for b in bits] for m in mascaras], dtype=bool).reshape(
+        len(mascaras), n_bits
+    )
+
+
+class IndiceSubstitutos:
+    """Perfis padronizados + filtros, uma linha por alimento (ordem de id)"""
+
+    def __init__(self, matriz: MatrizNutrientes, indice: IndiceCompatibilidade):
+        self.versao = matriz.versao
+        self.ids = np.asarray(indice.ids, dtype=np.int64)
+        self.posicao = indice.posicao
+        linhas = matriz.posicoes(self.ids)
+        presentes = linhas >= 0
+
+        # Por grama (kcal e macros dos totais), na ordem do índice
+        por_g = np.full((len(self.ids), len(CODIGOS)), np.nan)
+        por_g[presentes] = matriz.valores[linhas[presentes]]
+        macros = [matriz.coluna[c] for c in CODIGOS_MACROS]
+        self.macros_por_g = np.nan_to_num(por_g[:, macros])
+        self.kcal_g = self.macros_por_g[:, 0]
+        self.com_energia = self.kcal_g > 0
+
+        with np.errstate(all="ignore"):
+            por_kcal = np.where(self.com_energia[:, None], por_g / self.kcal_g[:, None], np.nan)
+        self.coluna = dict(matriz.coluna)
+        # Estatísticas só dos alimentos com energia (os demais nunca são candidatos)
+        z = np.zeros_like(por_kcal)
+        z[self.com_energia] = padronizar(por_kcal[self.com_energia])
+        self.perfil = np.ascontiguousarray(z, dtype=np.float32)
+        self._perfil_macros = np.ascontiguousarray(
+            self.perfil[:, [self.coluna[c] for c in PERFIL_MACROS]]
+        )
+
+        self.categoria = np.asarray(indice.categoria, dtype=np.int64)
+        self.contextos = list(indice.contextos)
+        self.contexto = desempacotar(indice.contexto, len(self.contextos))
+        self.contexto_excluido = desempacotar(indice.contexto_excluido, len(self.contextos))
+        self.universal = (
+            self.contexto[:, self.contextos.index(CONTEXTO_UNIVERSAL)]
+            if CONTEXTO_UNIVERSAL in self.contextos else np.zeros(len(self.ids), dtype=bool)
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def _mascara_contexto(self, origem: int, contexto: Optional[str]) -> np.ndarray:
+        """
+        Candidatos usáveis no contexto pedido ou, sem ele, em algum contexto
+        do original (que o candidato não exclua). Universais sempre passam.
+        """
+        utilizavel = self.contexto & ~self.contexto_excluido
+        if contexto:
+            alvo = normalizar(contexto)
+            if alvo not in self.contextos:
+                return self.universal.copy()
+            col = self.contextos.index(alvo)
+            return (utilizavel[:, col] | self.universal) & ~self.contexto_excluido[:, col]
+        contextos_origem = self.contexto[origem]
+        if self.universal[origem] or not contextos_origem.any():
+            return np.ones(len(self.ids), dtype=bool)
+        return utilizavel[:, contextos_origem].any(axis=1) | self.universal
+
+    def buscar(
+        self,
+        alimento_id: int,
+        k: int = 10,
+        gramas: Optional[float] = None,
+        porcao_g: Optional[float] = None,
+        categoria: str = "mesma",
+        contexto: Optional[str] = None,
+        nutrientes: Optional[Sequence[str]] = None,
+        excluir_ids: Sequence[int] = (),
+    ) -> dict:
+        """
+        Os k alimentos de perfil mais próximo, com as gramas que igualam
+        as kcal de `gramas` do original (padrão: porcao_g).
+
+        KeyError se o id não existir; SemEnergia se o original não tem kcal.
+        """
+        origem = self.posicao[alimento_id]
+        if not self.com_energia[origem]:
+            raise SemEnergia(f"Alimento {alimento_id} sem kcal: não há como igualar as calorias")
+        if gramas is None:
+            gramas = porcao_g if porcao_g and porcao_g > 0 else 100.0
+
+        candidatos = self.com_energia & self._mascara_contexto(origem, contexto)
+        if categoria == "mesma":
+            candidatos &= self.categoria == self.categoria[origem]
+        elif categoria == "outra":
+            candidatos &= self.categoria != self.categoria[origem]
+        candidatos[origem] = False
+        if excluir_ids:
+            fora = [self.posicao[i] for i in excluir_ids if i in self.posicao]
+            candidatos[fora] = False
+
+        extras = [c for c in (nutrientes or ()) if c not in PERFIL_MACROS and c != "kcal"]
+        if extras:
+            cols = [self.coluna[c] for c in PERFIL_MACROS + tuple(extras)]
+            perfil = self.perfil[:, cols]
+        else:
+            perfil = self._perfil_macros
+
+        elegiveis = np.flatnonzero(candidatos)
+        diff = perfil[elegiveis] - perfil[origem]
+        distancias = np.einsum("ij,ij->i", diff, diff)
+        if len(elegiveis) > k:
+            top = np.argpartition(distancias, k)[:k]
+        else:
+            top = np.arange(len(elegiveis))
+        top = top[np.lexsort((self.ids[elegiveis[top]], distancias[top]))]
+        posicoes, distancias = elegiveis[top], np.sqrt(distancias[top])
+
+        fator = gramas * self.kcal_g[origem]
+        gramas_sub = fator / self.kcal_g[posicoes]
+        macros = self.macros_por_g[posicoes] * gramas_sub[:, None]
+        substitutos = [
+            {
+                "alimento_id": int(self.ids[p]),
+                "gramas": round(float(g), 1),
+                **{c: round(float(v), 1) for c, v in zip(CODIGOS_MACROS, linha)},
+                "distancia": round(float(d), 3),
+            }
+            for p, g, linha, d in zip(posicoes, gramas_sub, macros.tolist(), distancias)
+        ]
+        return {
+            "alimento_id": alimento_id,
+            "gramas": round(float(gramas), 1),
+            **{
+                c: round(float(v), 1)
+                for c, v in zip(CODIGOS_MACROS, self.macros_por_g[origem] * gramas)
+            },
+            "perfil": list(PERFIL_MACROS) + extras,
+            "candidatos": int(len(elegiveis)),
+            "substitutos": substitutos,
+        }
+
+
+class CacheSubstitutos:
+    """
+    Índice do worker, reconstruído quando a versão da matriz de nutrientes
+    (alimentos_versao) muda ou após invalidar().
+    """
+
+    def __init__(self):
+        self._indice: Optional[IndiceSubstitutos] = None
+        self._lock = threading.Lock()
+
+    def obter(self, matriz: MatrizNutrientes, indice: IndiceCompatibilidade) -> IndiceSubstitutos:
+        atual = self._indice
+        if atual is not None and atual.versao == matriz.versao:
+            return atual
+        with self._lock:
+            if self._indice is None or self._indice.versao != matriz.versao:
+                self._indice = IndiceSubstitutos(matriz, indice)
+            return self._indice
+
+    def invalidar(self) -> None:
+        with self._lock:
+            self._indice = None
@@ -0,0 +1,382 @@
+"""
+Benchmark ponta a ponta da API sobre bancos sintéticos (gerar_dataset.py).
+
+Para cada banco, sobe a API in-process (TestClient, ASGI, sem rede) sobre
+uma cópia temporária e chama cada endpoint de gestor_alimentos_api.py
+--repeticoes vezes, em sequência, depois de --aquecimento chamadas fora da
+medição. Por endpoint registra:
+- latência p50/p95/p99/média/máximo (ms)
+- queries por requisição (set_trace_callback nas conexões do pool; comandos
+  internos do SQLite, prefixados com "--", não contam)
+- pico de RSS do processo durante o endpoint (VmHWM zerado via
+  /proc/self/clear_refs; fora do Linux, ru_maxrss acumulado)
+- contagem de status HTTP
+
+O relatório JSON (--saida) guarda também commit, versões e tamanho do banco;
+--comparar ANTERIOR.json imprime a variação de p50/p95/queries por endpoint
+entre duas versões.
+
+Uso:
+    python data/scripts/gerar_dataset.py --registros 10000 100000
+    python data/scripts/bench_api.py --db data/db/sintetico/historico_10k.db \\
+        data/db/sintetico/historico_100k.db --saida bench_api.json
+    python data/scripts/bench_api.py --registros 10000 --comparar bench_api.json
+"""
+
+import argparse
+import json
+import platform
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gestor_alimentos_api as api  # noqa: E402
+from bench_carga import percentil  # noqa: E402
+from gerar_dataset import gerar, nome_arquivo  # noqa: E402
+
+# (método, url, kwargs do httpx)
+Requisicao = Tuple[str, str, dict]
+
+
+# ============================
+# MEMÓRIA
+# ============================
+
+def zerar_pico_rss() -> None:
+    """Zera VmHWM (Linux); em outros sistemas o pico continua acumulado"""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def rss_maximo_mb() -> float:
+    """ru_maxrss do processo inteiro (KB no Linux, bytes no macOS)"""
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def pico_rss_mb() -> float:
+    """VmHWM (pico desde o último zerar_pico_rss) ou ru_maxrss acumulado"""
+    try:
+        for linha in Path("/proc/self/status").read_text().splitlines():
+            if linha.startswith("VmHWM:"):
+                return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss_maximo_mb()
+
+
+# ============================
+# CENÁRIOS
+# ============================
+
+class Contexto:
+    """Ids e valores reais do banco usados para montar as requisições"""
+
+    def __init__(self, conn: sqlite3.Connection, http: TestClient):
+        self.http = http
+        self.alimento_ids = [r[0] for r in conn.execute("SELECT id FROM alimentos ORDER BY id")]
+        self.refeicao_ids = [r[0] for r in conn.execute("SELECT id FROM refeicoes ORDER BY id")]
+        self.historico_ids = [
+            r[0] for r in conn.execute("SELECT id FROM historico_refeicoes ORDER BY id")
+        ]
+        self.ultima_data = conn.execute("SELECT MAX(data) FROM historico_refeicoes").fetchone()[0]
+        self.primeira_data = conn.execute(
+            "SELECT MIN(data) FROM historico_refeicoes"
+        ).fetchone()[0]
+        self.categoria = conn.execute(
+            "SELECT categoria FROM alimentos GROUP BY categoria ORDER BY COUNT(*) DESC LIMIT 1"
+        ).fetchone()[0]
+        self.cursor_alimentos = http.get("/api/alimentos", params={"limit": 50}).json()[
+            "next_cursor"
+        ]
+        self.cursor_historico = http.get("/api/historico", params={"limit": 50}).json()[
+            "next_cursor"
+        ]
+
+    def alimento(self, i: int) -> int:
+        return self.alimento_ids[(i * 37) % len(self.alimento_ids)]
+
+    def itens(self, i: int, n: int = 3) -> list:
+        return [{"alimento_id": self.alimento(i + k), "gramas": 50 + 25 * k} for k in range(n)]
+
+    def criar_refeicao(self, i: int) -> int:
+        resposta = self.http.post("/api/refeicoes", json={
+            "nome": f"Bench {i}", "tipo": "almoco", "itens": self.itens(i),
+        })
+        return resposta.json()["id"]
+
+    def criar_historico(self, i: int) -> int:
+        resposta = self.http.post("/api/historico", json={
+            "data": self.ultima_data, "nome": f"Bench {i}", "tipo": "lanche",
+            "itens": self.itens(i, 2),
+        })
+        return resposta.json()["id"]
+
+
+def _get(url: str, **params) -> Callable[[Contexto, int], Requisicao]:
+    return lambda ctx, i: ("GET", url, {"params": params})
+
+
+# nome -> fábrica de requisição (ctx, índice da repetição); fábricas que
+# precisam de estado (registro a excluir) o criam aqui, fora da medição
+CENARIOS: List[Tuple[str, Callable[[Contexto, int], Requisicao]]] = [
+    ("GET /api/alimentos", _get("/api/alimentos", limit=50)),
+    ("GET /api/alimentos (cursor)", lambda ctx, i: (
+        "GET", "/api/alimentos", {"params": {"limit": 50, "cursor": ctx.cursor_alimentos}})),
+    ("GET /api/alimentos (categoria)", lambda ctx, i: (
+        "GET", "/api/alimentos", {"params": {"limit": 50, "categoria": ctx.categoria}})),
+    ("GET /api/alimentos (search)", _get("/api/alimentos", search="frango", limit=50)),
+    ("GET /api/alimentos/busca", _get("/api/alimentos/busca", q="arroz integral")),
+    ("GET /api/alimentos/compatibilidade", _get("/api/alimentos/compatibilidade")),
+    ("GET /api/alimentos/compatibilidade/grupo", lambda ctx, i: (
+        "GET", "/api/alimentos/compatibilidade/grupo",
+        {"params": {"ids": [ctx.alimento(i + k) for k in range(4)]}})),
+    ("GET /api/alimentos/{id}", lambda ctx, i: ("GET", f"/api/alimentos/{ctx.alimento(i)}", {})),
+    ("GET /api/alimentos/{id}/substitutos", lambda ctx, i: (
+        "GET", f"/api/alimentos/{ctx.alimento(i)}/substitutos", {"params": {"categoria": "qualquer"}})),
+    ("POST /api/alimentos", lambda ctx, i: ("POST", "/api/alimentos", {"json": {
+        "nome": f"Alimento bench {time.time_ns()}", "categoria": "Bench", "kcal": 100,
+        "prot_g": 10, "carb_g": 10, "gord_g": 2, "contexto_culinario": "Lanche",
+    }})),
+    ("GET /api/categorias", _get("/api/categorias")),
+    ("GET /api/nutrientes", _get("/api/nutrientes")),
+    ("POST /api/refeicoes", lambda ctx, i: ("POST", "/api/refeicoes", {"json": {
+        "nome": f"Bench {i}", "tipo": "almoco", "itens": ctx.itens(i),
+    }})),
+    ("POST /api/refeicoes/lote", lambda ctx, i: ("POST", "/api/refeicoes/lote", {"json": [
+        {"nome": f"Modelo {i}.{k}", "tipo": "almoco", "itens": ctx.itens(i + k)}
+        for k in range(20)
+    ]})),
+    ("POST /api/refeicoes/{id}/clonar", lambda ctx, i: (
+        "POST", f"/api/refeicoes/{ctx.refeicao_ids[i % len(ctx.refeicao_ids)]}/clonar",
+        {"json": {"fator": 1.5}})),
+    ("PATCH /api/refeicoes/{id}/itens", lambda ctx, i: (
+        "PATCH", f"/api/refeicoes/{ctx.criar_refeicao(i)}/itens", {"json": {"operacoes": [
+            {"op": "adicionar", "alimento_id": ctx.alimento(i), "gramas": 40, "posicao": 0},
+        ]}})),
+    ("POST /api/refeicoes/sugerir", lambda ctx, i: ("POST", "/api/refeicoes/sugerir", {"json": {
+        "prot": 40, "carb": 60, "gord": 15, "contexto_culinario": "almoço", "quantidade": 3,
+    }})),
+    ("POST /api/plano/semanal", lambda ctx, i: ("POST", "/api/plano/semanal", {"json": {
+        "kcal": 1800, "prot": 130, "carb": 180, "gord": 55, "tempo_max_ms": 300, "semente": i,
+    }})),
+    ("GET /api/refeicoes", _get("/api/refeicoes", limit=50)),
+    ("GET /api/refeicoes (tipo, nutrientes)", _get(
+        "/api/refeicoes", tipo="almoco", limit=50, nutrientes="todos")),
+    ("GET /api/refeicoes/{id}", lambda ctx, i: (
+        "GET", f"/api/refeicoes/{ctx.refeicao_ids[i % len(ctx.refeicao_ids)]}", {})),
+    ("GET /api/refeicoes/tipos/disponiveis", _get("/api/refeicoes/tipos/disponiveis")),
+    ("PUT /api/refeicoes/{id}", lambda ctx, i: (
+        "PUT", f"/api/refeicoes/{ctx.refeicao_ids[i % len(ctx.refeicao_ids)]}",
+        {"json": {"descricao": f"bench {i}"}})),
+    ("DELETE /api/refeicoes/{id}", lambda ctx, i: (
+        "DELETE", f"/api/refeicoes/{ctx.criar_refeicao(i)}", {})),
+    ("POST /api/historico", lambda ctx, i: ("POST", "/api/historico", {"json": {
+        "data": ctx.ultima_data, "nome": f"Bench {i}", "tipo": "lanche", "itens": ctx.itens(i, 2),
+    }})),
+    ("POST /api/historico/lote", lambda ctx, i: ("POST", "/api/historico/lote", {"json": [
+        {"data": ctx.ultima_data, "nome": f"Lote {i}.{k}", "tipo": "jantar",
+         "itens": ctx.itens(i + k)}
+        for k in range(20)
+    ]})),
+    ("GET /api/historico", _get("/api/historico", limit=50)),
+    ("GET /api/historico (cursor)", lambda ctx, i: (
+        "GET", "/api/historico", {"params": {"limit": 50, "cursor": ctx.cursor_historico}})),
+    ("GET /api/historico (data)", lambda ctx, i: (
+        "GET", "/api/historico", {"params": {"data": ctx.ultima_data, "limit": 50}})),
+    ("GET /api/historico (tags)", _get("/api/historico", tags="usuario:7", limit=50)),
+    ("GET /api/historico (texto)", _get("/api/historico", texto="inexistente", limit=50)),
+    ("GET /api/historico/resumo (dia)", lambda ctx, i: (
+        "GET", "/api/historico/resumo",
+        {"params": {"inicio": ctx.primeira_data, "fim": ctx.ultima_data}})),
+    ("GET /api/historico/resumo (mes)", lambda ctx, i: (
+        "GET", "/api/historico/resumo",
+        {"params": {"inicio": ctx.primeira_data, "fim": ctx.ultima_data,
+                    "granularidade": "mes"}})),
+    ("GET /api/historico/export (dia)", lambda ctx, i: (
+        "GET", "/api/historico/export", {"params": {"data": ctx.ultima_data}})),
+    ("GET /api/historico/export (usuario, csv)", _get(
+        "/api/historico/export", tags="usuario:7", formato="csv")),
+    ("GET /api/historico/{id}", lambda ctx, i: (
+        "GET", f"/api/historico/{ctx.historico_ids[(i * 7919) % len(ctx.historico_ids)]}",
+        {"params": {"nutrientes": "todos"}})),
+    ("DELETE /api/historico/{id}", lambda ctx, i: (
+        "DELETE", f"/api/historico/{ctx.criar_historico(i)}", {})),
+    ("GET /health", _get("/health")),
+]
+
+
+# ============================
+# MEDIÇÃO
+# ============================
+
+def medir_banco(origem: Path, repeticoes: int, aquecimento: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / origem.name
+        shutil.copy(origem, db_path)
+        conn = sqlite3.connect(db_path)
+        info = {
+            "registros": conn.execute("SELECT COUNT(*) FROM historico_refeicoes").fetchone()[0],
+            "itens": conn.execute("SELECT COUNT(*) FROM historico_itens").fetchone()[0],
+            "tamanho_mb": round(db_path.stat().st_size / 1e6, 1),
+        }
+
+        queries = [0]
+
+        def contar(sql: str) -> None:
+            if not sql.startswith("--"):
+                queries[0] += 1
+
+        api.DB_PATH = db_path
+        endpoints = {}
+        try:
+            with TestClient(api.app, raise_server_exceptions=False) as http:
+                for pool_conn in api.pool._todas:
+                    pool_conn.set_trace_callback(contar)
+                ctx = Contexto(conn, http)
+
+                for nome, fabrica in CENARIOS:
+                    for i in range(aquecimento):
+                        metodo, url, kwargs = fabrica(ctx, -1 - i)
+                        http.request(metodo, url, **kwargs)
+
+                    requisicoes = [fabrica(ctx, i) for i in range(repeticoes)]
+                    latencias, status = [], {}
+                    queries[0] = 0
+                    zerar_pico_rss()
+                    for metodo, url, kwargs in requisicoes:
+                        inicio = time.perf_counter()
+                        resposta = http.request(metodo, url, **kwargs)
+                        latencias.append((time.perf_counter() - inicio) * 1000)
+                        codigo = str(resposta.status_code)
+                        status[codigo] = status.get(codigo, 0) + 1
+
+                    endpoints[nome] = {
+                        "n": repeticoes,
+                        "p50_ms": round(percentil(latencias, 50), 2),
+                        "p95_ms": round(percentil(latencias, 95), 2),
+                        "p99_ms": round(percentil(latencias, 99), 2),
+                        "media_ms": round(sum(latencias) / len(latencias), 2),
+                        "max_ms": round(max(latencias), 2),
+                        "queries_por_req": round(queries[0] / repeticoes, 1),
+                        "rss_pico_mb": round(pico_rss_mb(), 1),
+                        "status": status,
+                    }
+                    imprimir_linha(nome, endpoints[nome])
+
+                for pool_conn in api.pool._todas:
+                    pool_conn.set_trace_callback(None)
+        finally:
+            api.fechar_banco()
+            conn.close()
+
+    info["endpoints"] = endpoints
+    return info
+
+
+def imprimir_linha(nome: str, m: dict) -> None:
+    status = ",".join(f"{k}x{v}" for k, v in sorted(m["status"].items()))
+    print(f"{nome:<42} | {m['p50_ms']:>8.1f} | {m['p95_ms']:>8.1f} | {m['p99_ms']:>8.1f} | "
+          f"{m['queries_por_req']:>7.1f} | {m['rss_pico_mb']:>7.1f} | {status}")
+
+
+def cabecalho() -> None:
+    print(f"{'endpoint':<42} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'queries':>7} | {'RSS MB':>7} | status")
+    print("-" * 110)
+
+
+def comparar(atual: dict, anterior: dict) -> None:
+    """Variação por endpoint dos bancos presentes nos dois relatórios"""
+    def variacao(novo: float, velho: float) -> str:
+        if not velho:
+            return "   n/a"
+        return f"{(novo - velho) / velho * 100:+6.0f}%"
+
+    print(f"\n== comparação com {anterior.get('commit') or '?'} "
+          f"({anterior.get('gerado_em', '?')})")
+    for banco, dados in atual["bancos"].items():
+        antes = anterior.get("bancos", {}).get(banco)
+        if not antes:
+            print(f"\n{banco}: ausente no relatório anterior")
+            continue
+        print(f"\n{banco}")
+        print(f"{'endpoint':<42} | {'p50':>7} | {'p95':>7} | {'queries':>9}")
+        for nome, m in dados["endpoints"].items():
+            velho = antes["endpoints"].get(nome)
+            if not velho:
+                print(f"{nome:<42} | {'novo':>7}")
+                continue
+            delta_q = m["queries_por_req"] - velho["queries_por_req"]
+            print(f"{nome:<42} | {variacao(m['p50_ms'], velho['p50_ms']):>7} | "
+                  f"{variacao(m['p95_ms'], velho['p95_ms']):>7} | {delta_q:>+9.1f}")
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=API_DIR, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    origem = parser.add_mutually_exclusive_group()
+    origem.add_argument("--db", type=Path, nargs="+", help="bancos gerados por gerar_dataset.py")
+    origem.add_argument("--registros", type=int, nargs="+", default=[10_000],
+                        help="gera bancos temporários com estes tamanhos (padrão: 10000)")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--aquecimento", type=int, default=2)
+    parser.add_argument("--saida", type=Path, help="grava o relatório JSON")
+    parser.add_argument("--comparar", type=Path, help="relatório JSON anterior")
+    args = parser.parse_args()
+
+    relatorio = {
+        "commit": commit_atual(),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "plataforma": platform.platform(),
+        "repeticoes": args.repeticoes,
+        "bancos": {},
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        bancos = args.db or [Path(tmp) / nome_arquivo(n) for n in args.registros]
+        if not args.db:
+            for n, destino in zip(args.registros, bancos):
+                gerar(destino, n)
+
+        for banco in bancos:
+            print(f"\n== {banco.name}")
+            cabecalho()
+            relatorio["bancos"][banco.stem] = medir_banco(banco, args.repeticoes, args.aquecimento)
+
+    relatorio["rss_pico_processo_mb"] = round(rss_maximo_mb(), 1)
+
+    if args.saida:
+        args.saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        print(f"\nrelatório: {args.saida}")
+    if args.comparar:
+        comparar(relatorio, json.loads(args.comparar.read_text()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Teste de carga in-process (ASGI) da API: latência com I/O do banco no event
+loop ("antes") vs. no ExecutorBanco ("depois").
+
+Dispara N clientes concorrentes (padrão 50) fazendo uma mistura de leituras
+leves, leituras pesadas (histórico completo) e escritas, tudo via
+httpx.ASGITransport (sem rede, sem uvicorn), e imprime p50/p95/p99.
+
+Uso:
+    python data/scripts/bench_carga.py
+    python data/scripts/bench_carga.py --clientes 50 --requisicoes 20 --historico 100000
+"""
+
+import argparse
+import asyncio
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+import gestor_alimentos_api as api  # noqa: E402
+from conexoes import ExecutorBanco  # noqa: E402
+from bench_itens_lote import DB_ORIGEM, popular_historico  # noqa: E402
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[k]
+
+
+def montar_requisicoes(rng: random.Random, alimento_ids: list) -> list:
+    """
+    Mistura: ~70% leituras leves, ~10% leitura pesada, ~20% escritas.
+
+    A leitura pesada é uma busca textual sem índice no histórico: custo
+    dominado pelo SQLite (scan), resposta pequena.
+    """
+    sorteio = rng.random()
+    if sorteio < 0.10:
+        return ("pesada", "GET", "/api/historico?texto=inexistente", None)
+    if sorteio < 0.30:
+        corpo = {
+            "data": "2025-02-01",
+            "nome": "Carga",
+            "tipo": "lanche",
+            "itens": [
+                {"alimento_id": rng.choice(alimento_ids), "gramas": rng.randint(20, 200)}
+                for _ in range(rng.randint(1, 4))
+            ],
+        }
+        return ("escrita", "POST", "/api/historico", corpo)
+    leves = [
+        f"/api/alimentos/{rng.choice(alimento_ids)}",
+        "/api/alimentos?search=frango&limit=20",
+        "/api/categorias",
+        "/api/refeicoes?limit=20",
+        "/api/historico?data=2020-01-05",
+    ]
+    return ("leve", "GET", rng.choice(leves), None)
+
+
+async def rodar_cenario(clientes: int, requisicoes: int, alimento_ids: list, seed: int) -> dict:
+    latencias = {"leve": [], "pesada": [], "escrita": []}
+    erros = 0
+    transporte = httpx.ASGITransport(app=api.app)
+
+    async def cliente(indice: int):
+        nonlocal erros
+        rng = random.Random(seed + indice)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench") as http:
+            for _ in range(requisicoes):
+                tipo, metodo, url, corpo = montar_requisicoes(rng, alimento_ids)
+                inicio = time.perf_counter()
+                resposta = await http.request(metodo, url, json=corpo)
+                latencias[tipo].append((time.perf_counter() - inicio) * 1000)
+                if resposta.status_code >= 400:
+                    erros += 1
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(i) for i in range(clientes)))
+    duracao = time.perf_counter() - inicio
+
+    todas = [v for lista in latencias.values() for v in lista]
+    return {"latencias": latencias, "todas": todas, "erros": erros, "duracao": duracao}
+
+
+def imprimir(nome: str, resultado: dict) -> None:
+    print(f"\n== {nome}: {len(resultado['todas'])} requisições em {resultado['duracao']:.1f}s "
+          f"({resultado['erros']} erros)")
+    print(f"{'tipo':<10} | {'n':>5} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8}")
+    grupos = dict(resultado["latencias"], total=resultado["todas"])
+    for tipo, valores in grupos.items():
+        print(f"{tipo:<10} | {len(valores):>5} | {percentil(valores, 50):>8.1f} | "
+              f"{percentil(valores, 95):>8.1f} | {percentil(valores, 99):>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--requisicoes", type=int, default=20, help="por cliente")
+    parser.add_argument("--historico", type=int, default=100_000, help="registros de histórico")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--max-concorrencia", type=int, default=None,
+        help="threads do ExecutorBanco no cenário 'depois' (padrão: DB_MAX_CONCORRENCIA)",
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "carga.db"
+        shutil.copy(DB_ORIGEM, db_path)
+
+        conn = sqlite3.connect(db_path)
+        popular_historico(conn, args.historico)
+        alimento_ids = [r[0] for r in conn.execute("SELECT id FROM alimentos")]
+        conn.close()
+
+        api.DB_PATH = db_path
+        api.iniciar_banco()
+
+        cenarios = (
+            ("antes (sqlite no event loop)", ExecutorBanco(max_concorrencia=0)),
+            ("depois (ExecutorBanco)", ExecutorBanco(
+                **({} if args.max_concorrencia is None else {"max_concorrencia": args.max_concorrencia})
+            )),
+        )
+        try:
+            for nome, executor in cenarios:
+                api.executor_db = executor
+                resultado = asyncio.run(
+                    rodar_cenario(args.clientes, args.requisicoes, alimento_ids, args.seed)
+                )
+                imprimir(nome, resultado)
+        finally:
+            api.fechar_banco()
+
+
+if __name__ == "__main__":
+    main()
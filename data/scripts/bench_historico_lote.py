@@ -0,0 +1,122 @@
+"""
+Benchmark de ingestão do histórico: POST /api/historico um a um vs.
+POST /api/historico/lote (array JSON e NDJSON), em registros/segundo.
+
+Roda in-process (httpx.ASGITransport, sem rede) sobre uma cópia temporária
+do banco. Cada cenário insere as mesmas N entradas (1-6 itens cada).
+
+Uso:
+    python data/scripts/bench_historico_lote.py
+    python data/scripts/bench_historico_lote.py --entradas 5000 --unitarios 500
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+import gestor_alimentos_api as api  # noqa: E402
+from bench_itens_lote import DB_ORIGEM  # noqa: E402
+
+
+def gerar_entradas(n: int, alimento_ids: list, seed: int) -> list:
+    """Um mês de refeições (4 por dia) repetido até n entradas"""
+    rng = random.Random(seed)
+    tipos = ["cafe", "almoco", "lanche", "jantar"]
+    return [
+        {
+            "data": (date(2025, 1, 1) + timedelta(days=(i // 4) % 31)).isoformat(),
+            "nome": f"Importado {i}",
+            "tipo": tipos[i % 4],
+            "tags": "importado",
+            "itens": [
+                {"alimento_id": rng.choice(alimento_ids), "gramas": rng.randint(20, 300)}
+                for _ in range(rng.randint(1, 6))
+            ],
+        }
+        for i in range(n)
+    ]
+
+
+async def unitarios(http: httpx.AsyncClient, entradas: list) -> int:
+    for entrada in entradas:
+        resposta = await http.post("/api/historico", json=entrada)
+        resposta.raise_for_status()
+    return len(entradas)
+
+
+async def lote_json(http: httpx.AsyncClient, entradas: list) -> int:
+    resposta = await http.post("/api/historico/lote", json=entradas)
+    resposta.raise_for_status()
+    return resposta.json()["inseridos"]
+
+
+async def lote_ndjson(http: httpx.AsyncClient, entradas: list) -> int:
+    corpo = "\n".join(json.dumps(e) for e in entradas).encode()
+    resposta = await http.post(
+        "/api/historico/lote", content=corpo, headers={"Content-Type": "application/x-ndjson"}
+    )
+    resposta.raise_for_status()
+    return resposta.json()["inseridos"]
+
+
+async def medir(cenario, entradas: list) -> dict:
+    transporte = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=None) as http:
+        inicio = time.perf_counter()
+        inseridos = await cenario(http, entradas)
+        duracao = time.perf_counter() - inicio
+    return {"inseridos": inseridos, "duracao": duracao, "por_segundo": inseridos / duracao}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--entradas", type=int, default=5000, help="entradas por lote")
+    parser.add_argument(
+        "--unitarios", type=int, default=500,
+        help="entradas no cenário um a um (menor: é o lento)",
+    )
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "lote.db"
+        shutil.copy(DB_ORIGEM, db_path)
+
+        conn = sqlite3.connect(db_path)
+        alimento_ids = [r[0] for r in conn.execute("SELECT id FROM alimentos")]
+        conn.close()
+
+        api.DB_PATH = db_path
+        api.iniciar_banco()
+        try:
+            cenarios = (
+                ("POST /api/historico (um a um)", unitarios, args.unitarios),
+                ("POST /api/historico/lote (JSON)", lote_json, args.entradas),
+                ("POST /api/historico/lote (NDJSON)", lote_ndjson, args.entradas),
+            )
+            print(f"{'cenário':<36} | {'entradas':>8} | {'tempo s':>8} | {'registros/s':>11}")
+            print("-" * 72)
+            for nome, cenario, n in cenarios:
+                entradas = gerar_entradas(n, alimento_ids, args.seed)
+                r = asyncio.run(medir(cenario, entradas))
+                print(f"{nome:<36} | {r['inseridos']:>8} | {r['duracao']:>8.2f} | "
+                      f"{r['por_segundo']:>11.0f}")
+        finally:
+            api.fechar_banco()
+
+
+if __name__ == "__main__":
+    main()
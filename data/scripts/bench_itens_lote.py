@@ -0,0 +1,133 @@
+"""
+Benchmark: carregamento de itens N+1 vs. em lote (GET /api/historico)
+
+Gera cópias temporárias do banco com 1k, 10k e 100k registros de histórico
+e compara, para cada tamanho:
+- número de queries executadas (via set_trace_callback)
+- latência para montar a resposta completa (registros + itens + totais)
+
+Uso:
+    python data/scripts/bench_itens_lote.py
+    python data/scripts/bench_itens_lote.py --tamanhos 1000 5000 --repeticoes 5
+"""
+
+import argparse
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+import gestor_alimentos_api as api  # noqa: E402
+from migracoes import aplicar_migracoes  # noqa: E402
+from nutrientes import MatrizNutrientes  # noqa: E402
+
+DB_ORIGEM = Path(__file__).resolve().parent.parent / "db" / "alimentos.db"
+
+
+def popular_historico(conn: sqlite3.Connection, n_registros: int, seed: int = 42) -> None:
+    """
+    Insere n_registros no histórico (4 refeições/dia a partir de 2020-01-01)
+    com 1-6 itens cada, usando alimentos reais
+    """
+    rng = random.Random(seed)
+    alimento_ids = [r[0] for r in conn.execute("SELECT id FROM alimentos")]
+    tipos = ["cafe", "almoco", "lanche", "jantar"]
+
+    conn.execute("DELETE FROM historico_itens")
+    conn.execute("DELETE FROM historico_refeicoes")
+
+    registros = []
+    itens = []
+    for hid in range(1, n_registros + 1):
+        dia = date(2020, 1, 1) + timedelta(days=hid // 4)
+        registros.append((hid, dia.isoformat(), f"Registro {hid}", tipos[hid % 4], "", ""))
+        for ordem in range(rng.randint(1, 6)):
+            itens.append((hid, rng.choice(alimento_ids), float(rng.randint(20, 300)), ordem))
+
+    conn.executemany("""
+        INSERT INTO historico_refeicoes (id, data, nome, tipo, descricao, tags)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, registros)
+    conn.executemany("""
+        INSERT INTO historico_itens (historico_id, alimento_id, gramas, ordem)
+        VALUES (?, ?, ?, ?)
+    """, itens)
+    conn.commit()
+
+
+def carregar_n_mais_um(conn: sqlite3.Connection, registros: list) -> list:
+    """Estratégia antiga: uma query de itens por registro"""
+    itens_por_id = {}
+    for reg in registros:
+        sql = api.ITENS_HISTORICO_SQL.format(placeholders="?")
+        itens_por_id[reg["id"]] = [api.dict_from_row(r) for r in conn.execute(sql, (reg["id"],))]
+    return api.montar_com_itens(registros, itens_por_id, MatrizNutrientes.construir(conn))
+
+
+def carregar_em_lote(conn: sqlite3.Connection, registros: list) -> list:
+    """Estratégia atual: IN (...) em blocos + agrupamento em Python + motor de totais"""
+    ids = [reg["id"] for reg in registros]
+    return api.montar_com_itens(
+        registros,
+        api.carregar_itens_historico(conn, ids),
+        MatrizNutrientes.construir(conn),
+    )
+
+
+def medir(conn: sqlite3.Connection, estrategia, repeticoes: int) -> tuple:
+    """Retorna (queries por execução, melhor tempo em ms)"""
+    contador = {"n": 0}
+
+    def contar(_sql):
+        contador["n"] += 1
+
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        contador["n"] = 0
+        conn.set_trace_callback(contar)
+        inicio = time.perf_counter()
+        registros = [
+            api.dict_from_row(r)
+            for r in conn.execute("SELECT * FROM historico_refeicoes ORDER BY criada_em DESC")
+        ]
+        estrategia(conn, registros)
+        melhor = min(melhor, time.perf_counter() - inicio)
+        conn.set_trace_callback(None)
+
+    return contador["n"], melhor * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'registros':>10} | {'estratégia':<10} | {'queries':>8} | {'tempo (ms)':>10}")
+    print("-" * 48)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "bench.db"
+        shutil.copy(DB_ORIGEM, db_path)
+        conn = sqlite3.connect(db_path)
+        conn.row_factory = sqlite3.Row
+        aplicar_migracoes(conn)
+
+        for n in args.tamanhos:
+            popular_historico(conn, n)
+            for nome, estrategia in (("N+1", carregar_n_mais_um), ("lote", carregar_em_lote)):
+                queries, ms = medir(conn, estrategia, args.repeticoes)
+                print(f"{n:>10} | {nome:<10} | {queries:>8} | {ms:>10.1f}")
+
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
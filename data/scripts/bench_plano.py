@@ -0,0 +1,158 @@
+"""
+Benchmark do plano semanal (plano.py): qualidade do plano vs. tempo.
+
+Gera os candidatos uma vez (montador + refeições salvas, sem prazo
+apertado) e roda só a busca para cada combinação de orçamento (--tempos,
+ms) e processos (--processos; 0 = só a thread de quem chama), com
+--repeticoes sementes. Por combinação registra a mediana de:
+- custo (erro + penalidade de variedade), erro percentual médio por dia
+  e violações de variedade
+- tempo de parede da busca e varreduras da melhor busca
+- quantas sementes convergiram antes do prazo (completo)
+
+No fim, POST /api/plano/semanal ponta a ponta (TestClient) com o
+primeiro número de --processos e o maior orçamento. O pool de cada
+linha é aquecido antes da medição (spawn + imports fora do prazo).
+
+Uso:
+    python data/scripts/bench_plano.py
+    python data/scripts/bench_plano.py --tempos 100 500 2000 --processos 0 2 4 --saida plano.json
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gestor_alimentos_api as api  # noqa: E402
+import plano  # noqa: E402
+from bench_itens_lote import DB_ORIGEM  # noqa: E402
+from migracoes import aplicar_migracoes  # noqa: E402
+
+# Meta diária e slots do benchmark (metasPadrao de app_config.json somadas)
+META = {"kcal": 1240, "prot": 113, "carb": 120, "gord": 33}
+SLOTS = [("cafe", None), ("almoco", None), ("lanche", None), ("jantar", None)]
+
+
+def medir(problema: dict, tempo_ms: int, processos: int, sementes: range) -> dict:
+    pool = plano.PoolBusca(processos)
+    pool.aquecer()
+    for _ in range(50 if processos else 0):
+        # Espera o aquecimento: buscas curtas até todos os processos responderem
+        if plano.buscar_paralelo(problema, time.time() + 0.2, pool)[1] == processos:
+            break
+    linhas = []
+    try:
+        for semente in sementes:
+            inicio = time.perf_counter()
+            melhor, respostas, completo = plano.buscar_paralelo(
+                problema, time.time() + tempo_ms / 1000, pool, semente * 100
+            )
+            parede = (time.perf_counter() - inicio) * 1000
+            custo, erro, violacoes = plano.avaliar(problema, melhor["escolha"])
+            linhas.append({
+                "custo": custo,
+                "erro_medio": erro / problema["dias"],
+                "violacoes": violacoes,
+                "parede_ms": parede,
+                "varreduras": melhor["varreduras"],
+                "respostas": respostas,
+                "completo": completo,
+            })
+    finally:
+        pool.fechar()
+    return {
+        "tempo_ms": tempo_ms,
+        "processos": processos,
+        **{
+            chave: round(statistics.median(l[chave] for l in linhas), 2)
+            for chave in ("custo", "erro_medio", "violacoes", "parede_ms", "varreduras", "respostas")
+        },
+        "completos": sum(l["completo"] for l in linhas),
+        "repeticoes": len(linhas),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--tempos", type=int, nargs="+", default=[100, 250, 500, 1000, 2000, 4000])
+    parser.add_argument("--processos", type=int, nargs="+", default=[0, 1, 2, 4])
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--dias", type=int, default=7)
+    parser.add_argument("--preco-max", type=int, default=None)
+    parser.add_argument("--saida", type=Path, help="relatório JSON")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "plano.db"
+        shutil.copy(DB_ORIGEM, db_path)
+        conn = sqlite3.connect(db_path)
+        aplicar_migracoes(conn)
+        conn.row_factory = sqlite3.Row
+
+        slots_por_dia = [SLOTS] * args.dias
+        posicoes = [(d, (t, 0.25)) for d in range(args.dias) for t, _ in SLOTS]
+        inicio = time.perf_counter()
+        candidatos = plano.gerar_candidatos(
+            conn, {k: None for _, k in posicoes}, META, set(), True, tempo_max_ms=4000
+        )
+        geracao_ms = (time.perf_counter() - inicio) * 1000
+        problema = plano.montar_problema(posicoes, candidatos, META, args.dias, 1, 7)
+        conn.close()
+
+        print(f"CPUs: {os.cpu_count()} | dias: {args.dias} | candidatos: "
+              f"{ {f'{t}': len(v) for (t, _), v in candidatos.items()} } em {geracao_ms:.0f} ms")
+        print(f"\n{'prazo ms':>8} | {'proc':>4} | {'custo':>8} | {'erro %':>6} | {'viol':>4} | "
+              f"{'parede ms':>9} | {'varred':>6} | {'resp':>4} | {'compl':>5}")
+        print("-" * 80)
+        resultados = []
+        for processos in args.processos:
+            for tempo_ms in args.tempos:
+                r = medir(problema, tempo_ms, processos, range(args.repeticoes))
+                resultados.append(r)
+                print(f"{r['tempo_ms']:>8} | {r['processos']:>4} | {r['custo']:>8.1f} | "
+                      f"{r['erro_medio']:>6.1f} | {r['violacoes']:>4.0f} | {r['parede_ms']:>9.0f} | "
+                      f"{r['varreduras']:>6.0f} | {r['respostas']:>4.0f} | "
+                      f"{r['completos']:>2}/{r['repeticoes']}")
+
+        print("\n== POST /api/plano/semanal (ponta a ponta)")
+        api.DB_PATH = db_path
+        api.pool_plano = plano.PoolBusca(args.processos[0])
+        corpo = {**META, "dias": args.dias, "tempo_max_ms": max(args.tempos), "semente": 1}
+        if args.preco_max:
+            corpo["preco_max"] = args.preco_max
+        try:
+            with TestClient(api.app) as http:
+                for _ in range(2):
+                    inicio = time.perf_counter()
+                    resposta = http.post("/api/plano/semanal", json=corpo)
+                    parede = (time.perf_counter() - inicio) * 1000
+                    corpo_resposta = resposta.json()
+                    print(f"status {resposta.status_code} | {parede:.0f} ms | "
+                          f"resumo {corpo_resposta.get('resumo')} | busca {corpo_resposta.get('busca')}")
+        finally:
+            api.fechar_banco()
+
+    if args.saida:
+        args.saida.write_text(json.dumps({
+            "cpus": os.cpu_count(),
+            "dias": args.dias,
+            "geracao_candidatos_ms": round(geracao_ms, 1),
+            "resultados": resultados,
+        }, indent=2))
+        print(f"\nRelatório: {args.saida}")
+
+
+if __name__ == "__main__":
+    main()
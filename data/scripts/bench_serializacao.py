@@ -0,0 +1,143 @@
+"""
+Benchmark da serialização JSON das respostas (serializacao.py).
+
+Compara, sobre o catálogo completo (GET /api/alimentos?legado=true) e uma
+página do histórico com itens (GET /api/historico?limit=50):
+- antes: dicts por linha (lookup por nome de coluna) + jsonable_encoder +
+  json da stdlib (caminho padrão do FastAPI com JSONResponse)
+- orjson: mesmos dicts, renderizados direto pelo RespostaJSON
+- compacto (só catálogo): colunas uma vez + tuplas, com json e com orjson
+
+Mede tempo de CPU (time.process_time, melhor de N) e tamanho do payload
+cru, gzip e brotli (se instalado). No fim, a latência ponta a ponta de
+GET /api/alimentos?legado=true com formato=objetos e formato=compacto.
+
+Uso:
+    python data/scripts/bench_serializacao.py
+    python data/scripts/bench_serializacao.py --repeticoes 20 --historico 20000
+"""
+
+import argparse
+import json
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gestor_alimentos_api as api  # noqa: E402
+import serializacao  # noqa: E402
+from bench_carga import percentil  # noqa: E402
+from bench_itens_lote import DB_ORIGEM, popular_historico  # noqa: E402
+from catalogo import COLUNAS_LISTAGEM  # noqa: E402
+from migracoes import aplicar_migracoes  # noqa: E402
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+
+def json_stdlib(conteudo) -> bytes:
+    """Render do JSONResponse do Starlette"""
+    return json.dumps(
+        conteudo, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def cpu_ms(funcao, repeticoes: int) -> tuple:
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.process_time()
+        resultado = funcao()
+        melhor = min(melhor, time.process_time() - inicio)
+    return melhor * 1000, resultado
+
+
+def tamanhos(corpo: bytes) -> str:
+    partes = [f"{len(corpo) / 1024:>8.1f}", f"{len(zlib.compress(corpo, 6)) / 1024:>8.1f}"]
+    partes.append(f"{len(brotli.compress(corpo, quality=4)) / 1024:>8.1f}" if brotli else "     n/a")
+    return " | ".join(partes)
+
+
+def imprimir(titulo: str, cenarios, repeticoes: int) -> None:
+    print(f"\n== {titulo}")
+    print(f"{'cenário':<34} | {'CPU ms':>8} | {'KB':>8} | {'gzip KB':>8} | {'br KB':>8}")
+    print("-" * 80)
+    for nome, funcao in cenarios:
+        ms, corpo = cpu_ms(funcao, repeticoes)
+        print(f"{nome:<34} | {ms:>8.1f} | {tamanhos(corpo)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--historico", type=int, default=10_000, help="registros de histórico")
+    args = parser.parse_args()
+
+    if serializacao.orjson is None:
+        print("orjson não instalado: RespostaJSON usa o json da stdlib")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "serializacao.db"
+        shutil.copy(DB_ORIGEM, db_path)
+        conn = sqlite3.connect(db_path)
+        aplicar_migracoes(conn)
+        popular_historico(conn, args.historico)
+        conn.row_factory = sqlite3.Row
+        sql = f"SELECT {', '.join(COLUNAS_LISTAGEM)} FROM alimentos ORDER BY nome, id"
+        rows = conn.execute(sql).fetchall()
+        tuplas = [tuple(r) for r in rows]
+
+        def antes_catalogo():
+            dicts = [{k: r[k] for k in r.keys()} for r in rows]
+            return json_stdlib(jsonable_encoder({"alimentos": dicts}))
+
+        def orjson_catalogo():
+            return serializacao.dumps({"alimentos": [dict(zip(COLUNAS_LISTAGEM, t)) for t in tuplas]})
+
+        imprimir(f"catálogo ({len(rows)} alimentos, a partir das linhas do SQLite)", (
+            ("antes (dict + encoder + json)", antes_catalogo),
+            ("dict(zip) + RespostaJSON", orjson_catalogo),
+            ("compacto + json", lambda: json_stdlib(serializacao.compactar(COLUNAS_LISTAGEM, tuplas))),
+            ("compacto + RespostaJSON", lambda: serializacao.dumps(
+                serializacao.compactar(COLUNAS_LISTAGEM, tuplas))),
+        ), args.repeticoes)
+        conn.close()
+
+        api.DB_PATH = db_path
+        try:
+            with TestClient(api.app) as http:
+                historico = http.get("/api/historico", params={"limit": 50}).json()
+                imprimir("página do histórico (50 registros com itens e totais)", (
+                    ("antes (encoder + json)", lambda: json_stdlib(jsonable_encoder(historico))),
+                    ("RespostaJSON", lambda: serializacao.dumps(historico)),
+                ), args.repeticoes)
+
+                print("\n== GET /api/alimentos?legado=true (ponta a ponta, gzip)")
+                print(f"{'formato':<10} | {'p50 ms':>8} | {'p95 ms':>8} | {'KB na rede':>10}")
+                for formato in ("objetos", "compacto"):
+                    params = {"legado": "true", "formato": formato}
+                    latencias, tamanho = [], 0
+                    for _ in range(args.repeticoes):
+                        inicio = time.perf_counter()
+                        resposta = http.get("/api/alimentos", params=params,
+                                            headers={"Accept-Encoding": "gzip"})
+                        latencias.append((time.perf_counter() - inicio) * 1000)
+                        tamanho = int(resposta.headers.get("content-length", len(resposta.content)))
+                    print(f"{formato:<10} | {percentil(latencias, 50):>8.1f} | "
+                          f"{percentil(latencias, 95):>8.1f} | {tamanho / 1024:>10.1f}")
+        finally:
+            api.fechar_banco()
+
+
+if __name__ == "__main__":
+    main()
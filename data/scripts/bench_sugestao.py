@@ -0,0 +1,179 @@
+"""
+Benchmark: montador NumPy (POST /api/refeicoes/sugerir) vs. busca exaustiva
+em grade do smartMealBuilder.ts (portada fielmente para Python).
+
+Para cada meta padrão do app_config.json, compara tempo, combinações
+avaliadas e erro percentual da melhor refeição encontrada.
+
+A busca exaustiva testa todas as porções de 50 a 500 g (passo 10 g) para
+até 10x10 pares e 8x8x5 trios, com early stopping em erro < 3%. Em Python
+isso leva muito tempo, então cada meta tem um limite (--limite-exaustivo).
+
+Uso:
+    python data/scripts/bench_sugestao.py
+    python data/scripts/bench_sugestao.py --limite-exaustivo 30
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent.parent
+sys.path.insert(0, str(RAIZ / "data" / "api"))
+
+import montador  # noqa: E402
+
+DB_PATH = RAIZ / "data" / "db" / "alimentos.db"
+
+# tipo do app_config -> contexto_culinario do banco
+CONTEXTOS = {
+    "cafe": "Café",
+    "lanche": "Lanche",
+    "almoco": "Almoço",
+    "jantar": "Jantar",
+    "whey": "Lanche",
+}
+
+
+class TempoEsgotado(Exception):
+    pass
+
+
+# ============================
+# PORTE DO smartMealBuilder.ts
+# ============================
+
+def sao_compativeis(a: dict, b: dict) -> bool:
+    c1, c2 = a["contexto_culinario"] or "", b["contexto_culinario"] or ""
+    if "universal" in c1 or "universal" in c2:
+        return True
+    ctx1 = [c.strip() for c in c1.split(",")]
+    ctx2 = [c.strip() for c in c2.split(",")]
+    if not any(c in ctx2 for c in ctx1):
+        return False
+    inc1 = [c.strip() for c in (a["incompativel_com"] or "").split(",") if c.strip()]
+    inc2 = [c.strip() for c in (b["incompativel_com"] or "").split(",") if c.strip()]
+    if b["categoria"] in inc1 or b["nome"] in inc1:
+        return False
+    if a["categoria"] in inc2 or a["nome"] in inc2:
+        return False
+    return not (a["categoria"] == b["categoria"] and "universal" not in c1)
+
+
+def selecionar_por_cluster(alimentos: list, contexto: str) -> list:
+    filtrados = [
+        a for a in alimentos
+        if contexto in (a["contexto_culinario"] or "") or "universal" in (a["contexto_culinario"] or "")
+    ]
+    prot = [a for a in filtrados if a["cluster_nutricional"] in (2, 5)]
+    carb = [a for a in filtrados if a["cluster_nutricional"] in (3, 4)]
+    gord = [a for a in filtrados if a["cluster_nutricional"] == 0]
+
+    combinacoes = []
+    for p in prot[:10]:
+        for c in carb[:10]:
+            if sao_compativeis(p, c):
+                combinacoes.append([p, c])
+    for p in prot[:8]:
+        for c in carb[:8]:
+            for g in gord[:5]:
+                if sao_compativeis(p, c) and sao_compativeis(p, g) and sao_compativeis(c, g):
+                    combinacoes.append([p, c, g])
+    return combinacoes
+
+
+def ajustar_porcoes(alimentos: list, meta: dict, prazo: float, contador: list):
+    gramas_opcoes = list(range(50, 501, 10))
+    melhor = {"sol": None, "erro": float("inf")}
+
+    def testar(indice: int, itens: list):
+        if indice == len(alimentos):
+            contador[0] += 1
+            if contador[0] % 20000 == 0 and time.perf_counter() > prazo:
+                raise TempoEsgotado
+            total = {m: sum(i[m] for i in itens) for m in ("prot", "carb", "gord")}
+            erro = sum(abs(meta[m] - total[m]) for m in total)
+            erro_pct = sum(abs(meta[m] - total[m]) / (meta[m] or 1) for m in total) / 3 * 100
+            if erro_pct < 10 and erro < melhor["erro"]:
+                melhor["erro"] = erro
+                melhor["sol"] = {"itens": list(itens), "erro": erro, "erro_percentual": erro_pct}
+            return
+        a = alimentos[indice]
+        base = a["porcao_g"] or 100
+        for g in gramas_opcoes:
+            f = g / base
+            item = {
+                "gramas": g,
+                "prot": round(a["prot_g"] * f),
+                "carb": round(a["carb_g"] * f),
+                "gord": round(a["gord_g"] * f),
+            }
+            testar(indice + 1, itens + [item])
+            if melhor["sol"] and melhor["sol"]["erro_percentual"] < 3:
+                return
+
+    testar(0, [])
+    return melhor["sol"]
+
+
+def montar_exaustivo(alimentos: list, meta: dict, contexto: str, limite_s: float) -> dict:
+    inicio = time.perf_counter()
+    prazo = inicio + limite_s
+    contador = [0]
+    melhor = None
+    completo = True
+    try:
+        for combo in selecionar_por_cluster(alimentos, contexto):
+            resultado = ajustar_porcoes(combo, meta, prazo, contador)
+            if resultado and (melhor is None or resultado["erro"] < melhor["erro"]):
+                melhor = resultado
+                if resultado["erro_percentual"] < 3:
+                    break
+    except TempoEsgotado:
+        completo = False
+    return {
+        "tempo_ms": (time.perf_counter() - inicio) * 1000,
+        "avaliadas": contador[0],
+        "erro_percentual": melhor["erro_percentual"] if melhor else None,
+        "completo": completo,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--limite-exaustivo", type=float, default=10.0, help="segundos por meta")
+    parser.add_argument("--tempo-max-ms", type=int, default=250, help="orçamento do montador")
+    args = parser.parse_args()
+
+    metas = json.loads((RAIZ / "app_config.json").read_text(encoding="utf-8"))["metasPadrao"]
+
+    conn = sqlite3.connect(args.db)
+    conn.row_factory = sqlite3.Row
+    alimentos = [dict(r) for r in conn.execute("SELECT * FROM alimentos ORDER BY nome")]
+
+    print(f"{'meta':<8} | {'método':<10} | {'tempo ms':>9} | {'avaliadas':>10} | {'erro %':>7} | completo")
+    print("-" * 66)
+    for tipo, contexto in CONTEXTOS.items():
+        meta = {m: float(metas[tipo][m]) for m in ("prot", "carb", "gord")}
+
+        exaustivo = montar_exaustivo(alimentos, meta, contexto, args.limite_exaustivo)
+        numpy_ = montador.sugerir(conn, meta, contexto, quantidade=1, tempo_max_ms=args.tempo_max_ms)
+        erro_np = numpy_["refeicoes"][0]["erro_percentual"] if numpy_["refeicoes"] else None
+
+        for nome, r, erro in (
+            ("exaustivo", exaustivo, exaustivo["erro_percentual"]),
+            ("numpy", numpy_, erro_np),
+        ):
+            erro_txt = "-" if erro is None else f"{erro:.1f}"
+            print(f"{tipo:<8} | {nome:<10} | {r['tempo_ms']:>9.1f} | {r['avaliadas']:>10} | "
+                  f"{erro_txt:>7} | {r['completo']}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark do motor de totais (nutrientes.MatrizNutrientes.somar).
+
+Gera N itens (pai, alimento_id, gramas) sobre o catálogo real e compara:
+- python: soma por item com (gramas / porcao_g) * macro, agrupada em dict
+  (a fórmula que os endpoints repetiam antes do motor)
+- motor: gather na matriz por grama + um np.bincount por (pai, coluna),
+  só macros e com todos os nutrientes
+
+Confere que os totais do motor batem com a soma em Python. A matriz é
+montada a partir de uma conexão somente leitura; sem nutrientes
+importados (tbca_original.csv), as colunas de micronutrientes recebem
+valores sintéticos para o cenário "todos".
+
+Uso:
+    python data/scripts/bench_totais.py
+    python data/scripts/bench_totais.py --itens 100000 --pais 20000 --repeticoes 5
+"""
+
+import argparse
+import random
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from nutrientes import CODIGOS, CODIGOS_MACROS, MatrizNutrientes  # noqa: E402
+
+DB_ORIGEM = Path(__file__).resolve().parent.parent / "db" / "alimentos.db"
+
+
+def somar_python(itens: list, alimentos: dict) -> dict:
+    """Soma item a item, como calcular_totais fazia (porcao_g 0 pulado)"""
+    totais: dict = {}
+    for pai, alimento_id, gramas in itens:
+        porcao, kcal, prot, carb, gord = alimentos[alimento_id]
+        if not porcao:
+            continue
+        fator = gramas / porcao
+        t = totais.setdefault(pai, [0.0, 0.0, 0.0, 0.0])
+        t[0] += fator * kcal
+        t[1] += fator * prot
+        t[2] += fator * carb
+        t[3] += fator * gord
+    return totais
+
+
+def melhor_tempo(funcao, repeticoes: int) -> tuple:
+    melhor, resultado = float("inf"), None
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor * 1000, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--itens", type=int, default=100_000)
+    parser.add_argument("--pais", type=int, default=20_000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(f"file:{DB_ORIGEM}?mode=ro", uri=True)
+    matriz = MatrizNutrientes.construir(conn)
+    alimentos = {
+        row[0]: tuple(v or 0 for v in row[1:])
+        for row in conn.execute("SELECT id, porcao_g, kcal, prot_g, carb_g, gord_g FROM alimentos")
+    }
+    conn.close()
+
+    rng = np.random.default_rng(args.seed)
+    micros = matriz.valores[:, len(CODIGOS_MACROS):]
+    if np.isnan(micros).all():
+        micros[:] = rng.random(micros.shape)
+
+    random.seed(args.seed)
+    ids = list(alimentos)
+    itens = [
+        (random.randrange(args.pais), random.choice(ids), float(random.randint(10, 300)))
+        for _ in range(args.itens)
+    ]
+    pais = np.array([i[0] for i in itens])
+    alimento_ids = np.array([i[1] for i in itens])
+    gramas = np.array([i[2] for i in itens])
+
+    cenarios = (
+        ("python (4 macros)", lambda: somar_python(itens, alimentos)),
+        ("motor (4 macros)", lambda: matriz.somar(pais, alimento_ids, gramas, CODIGOS_MACROS)),
+        (
+            f"motor ({len(CODIGOS)} nutrientes)",
+            lambda: matriz.somar(pais, alimento_ids, gramas, CODIGOS),
+        ),
+    )
+
+    print(f"{args.itens} itens, {args.pais} pais, {len(matriz)} alimentos")
+    print(f"{'cenário':<24} | {'tempo (ms)':>10} | {'itens/s':>12}")
+    print("-" * 52)
+    resultados = {}
+    for nome, funcao in cenarios:
+        ms, resultados[nome] = melhor_tempo(funcao, args.repeticoes)
+        print(f"{nome:<24} | {ms:>10.1f} | {args.itens / ms * 1000:>12,.0f}")
+
+    referencia = resultados[cenarios[0][0]]
+    unicos, somas, _ = resultados[cenarios[1][0]]
+    esperado = np.array([referencia.get(p, [0.0] * 4) for p in unicos.tolist()])
+    erro = float(np.abs(somas - esperado).max()) if len(esperado) else 0.0
+    print(f"\nmaior diferença motor x python: {erro:.2e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Gerador de bancos sintéticos grandes (histórico de anos, vários usuários).
+
+Parte de uma cópia do alimentos.db (catálogo real), aplica as migrações e
+gera, com seed fixa:
+- refeições salvas (modelos) por tipo, com itens do catálogo
+- N registros de histórico distribuídos entre --usuarios perfis, 4 refeições
+  por dia e por perfil, do dia mais recente para trás
+
+O schema não tem tabela de usuários: cada perfil vai na tag "usuario:<n>"
+do registro (filtrável por GET /api/historico?tags=usuario:3).
+
+Itens realistas: os alimentos de cada tipo de refeição são sorteados entre
+os do contexto culinário correspondente (Café, Almoço, Lanche, Jantar), a
+quantidade de itens segue uma faixa por tipo e as gramas ficam em torno da
+porção do alimento. Parte dos registros referencia uma refeição salva e
+repete os itens dela, como quem registra o mesmo café da manhã todo dia.
+
+A carga é em massa: gatilhos e índices das tabelas de histórico saem antes
+dos INSERTs e voltam depois, e os totais materializados são recalculados
+de uma vez (migracoes.reconstruir_totais).
+
+Uso:
+    python data/scripts/gerar_dataset.py                      # 10k, 100k e 1M
+    python data/scripts/gerar_dataset.py --registros 50000 --usuarios 20
+    python data/scripts/gerar_dataset.py --registros 10000 --saida /tmp/bench
+"""
+
+import argparse
+import random
+import shutil
+import sqlite3
+import sys
+import time
+import unicodedata
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from migracoes import aplicar_migracoes, reconstruir_totais  # noqa: E402
+
+DB_ORIGEM = Path(__file__).resolve().parent.parent / "db" / "alimentos.db"
+SAIDA_PADRAO = Path(__file__).resolve().parent.parent / "db" / "sintetico"
+
+# tipo -> (contexto culinário, faixa de itens, moda, horário)
+TIPOS = {
+    "cafe": ("cafe", (1, 5), 3, (6, 30)),
+    "almoco": ("almoco", (2, 7), 4, (12, 0)),
+    "lanche": ("lanche", (1, 3), 1, (16, 0)),
+    "jantar": ("jantar", (1, 6), 3, (19, 30)),
+}
+NOMES = {"cafe": "Café da manhã", "almoco": "Almoço", "lanche": "Lanche", "jantar": "Jantar"}
+TAGS_EXTRAS = ("treino", "lowcarb", "fim de semana", "viagem", "")
+
+# fração de registros que repete uma refeição salva do usuário
+FRACAO_MODELO = 0.3
+LOTE = 50_000
+
+
+def sem_acentos(texto: str) -> str:
+    return "".join(
+        c for c in unicodedata.normalize("NFD", texto.lower())
+        if unicodedata.category(c) != "Mn"
+    )
+
+
+def nome_arquivo(n_registros: int) -> str:
+    """historico_10k.db, historico_1m.db, historico_2500.db"""
+    for divisor, sufixo in ((1_000_000, "m"), (1_000, "k")):
+        if n_registros >= divisor and n_registros % divisor == 0:
+            return f"historico_{n_registros // divisor}{sufixo}.db"
+    return f"historico_{n_registros}.db"
+
+
+def carregar_catalogo(conn: sqlite3.Connection) -> Dict[str, List[Tuple[int, float]]]:
+    """tipo -> [(alimento_id, porcao_g)] dos alimentos daquele contexto"""
+    por_tipo: Dict[str, List[Tuple[int, float]]] = {tipo: [] for tipo in TIPOS}
+    todos = []
+    for alimento_id, porcao, contexto in conn.execute(
+        "SELECT id, porcao_g, contexto_culinario FROM alimentos WHERE porcao_g > 0"
+    ):
+        contextos = {sem_acentos(c.strip()) for c in (contexto or "").split("|")}
+        todos.append((alimento_id, porcao))
+        for tipo, (ctx, *_resto) in TIPOS.items():
+            if ctx in contextos:
+                por_tipo[tipo].append((alimento_id, porcao))
+    for tipo, alimentos in por_tipo.items():
+        if not alimentos:
+            por_tipo[tipo] = todos
+    return por_tipo
+
+
+def sortear_itens(
+    rng: random.Random, tipo: str, catalogo: Dict[str, List[Tuple[int, float]]]
+) -> List[Tuple[int, float]]:
+    """[(alimento_id, gramas)] de uma refeição do tipo"""
+    _ctx, (minimo, maximo), moda, _hora = TIPOS[tipo]
+    n_itens = round(rng.triangular(minimo, maximo, moda))
+    itens = []
+    for alimento_id, porcao in rng.sample(catalogo[tipo], n_itens):
+        gramas = max(5.0, round(porcao * rng.uniform(0.5, 1.8) / 5) * 5)
+        itens.append((alimento_id, float(gramas)))
+    return itens
+
+
+def gerar_modelos(
+    conn: sqlite3.Connection,
+    rng: random.Random,
+    catalogo: Dict[str, List[Tuple[int, float]]],
+    usuarios: int,
+) -> Dict[Tuple[int, str], List[Tuple[int, List[Tuple[int, float]]]]]:
+    """Refeições salvas: 2 por (usuário, tipo). Retorna (usuario, tipo) -> [(id, itens)]"""
+    modelos: Dict[Tuple[int, str], List[Tuple[int, List[Tuple[int, float]]]]] = {}
+    for usuario in range(1, usuarios + 1):
+        for tipo in TIPOS:
+            for variante in (1, 2):
+                itens = sortear_itens(rng, tipo, catalogo)
+                cur = conn.execute(
+                    "INSERT INTO refeicoes (nome, tipo, contexto_culinario, descricao, tags) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (f"{NOMES[tipo]} {variante} (usuário {usuario})", tipo, tipo, "",
+                     f"usuario:{usuario}"),
+                )
+                conn.executemany(
+                    "INSERT INTO refeicoes_itens (refeicao_id, alimento_id, gramas, ordem) "
+                    "VALUES (?, ?, ?, ?)",
+                    [(cur.lastrowid, a, g, ordem) for ordem, (a, g) in enumerate(itens)],
+                )
+                modelos.setdefault((usuario, tipo), []).append((cur.lastrowid, itens))
+    return modelos
+
+
+def gerar_registros(
+    n_registros: int,
+    usuarios: int,
+    rng: random.Random,
+    catalogo: Dict[str, List[Tuple[int, float]]],
+    modelos: Dict[Tuple[int, str], List[Tuple[int, List[Tuple[int, float]]]]],
+    fim: date,
+) -> Iterator[Tuple[tuple, List[tuple]]]:
+    """(registro, itens) em ordem cronológica, ids a partir de 1"""
+    tipos = list(TIPOS)
+    por_dia = usuarios * len(tipos)
+    dias = -(-n_registros // por_dia)
+    inicio = fim - timedelta(days=dias - 1)
+
+    for hid in range(1, n_registros + 1):
+        indice = hid - 1
+        dia = inicio + timedelta(days=indice // por_dia)
+        usuario = indice % usuarios + 1
+        tipo = tipos[(indice // usuarios) % len(tipos)]
+        hora, minuto = TIPOS[tipo][3]
+        criada_em = datetime(dia.year, dia.month, dia.day, hora, minuto) + timedelta(
+            minutes=rng.randint(0, 90), seconds=rng.randint(0, 59)
+        )
+
+        refeicao_id = None
+        if rng.random() < FRACAO_MODELO:
+            refeicao_id, itens = rng.choice(modelos[(usuario, tipo)])
+        else:
+            itens = sortear_itens(rng, tipo, catalogo)
+
+        tags = f"usuario:{usuario}"
+        extra = rng.choice(TAGS_EXTRAS)
+        if extra:
+            tags += f",{extra}"
+
+        registro = (
+            hid, dia.isoformat(), refeicao_id, NOMES[tipo], tipo, "", tags,
+            criada_em.strftime("%Y-%m-%d %H:%M:%S"),
+        )
+        yield registro, [(hid, a, g, ordem) for ordem, (a, g) in enumerate(itens)]
+
+
+def adiar_gatilhos_e_indices(conn: sqlite3.Connection, tabelas: Tuple[str, ...]) -> List[str]:
+    """Remove gatilhos e índices secundários das tabelas e devolve o DDL para recriá-los"""
+    marcadores = ",".join("?" * len(tabelas))
+    objetos = conn.execute(
+        f"SELECT type, name, sql FROM sqlite_master "
+        f"WHERE type IN ('trigger', 'index') AND tbl_name IN ({marcadores}) "
+        f"AND sql IS NOT NULL",
+        tabelas,
+    ).fetchall()
+    for tipo, nome, _sql in objetos:
+        conn.execute(f'DROP {tipo.upper()} "{nome}"')
+    return [sql for _tipo, _nome, sql in objetos]
+
+
+def gerar(
+    destino: Path,
+    n_registros: int,
+    usuarios: int = 50,
+    seed: int = 42,
+    fim: date = date(2025, 12, 31),
+) -> dict:
+    """Cria destino (sobrescreve) com n_registros de histórico e retorna contagens"""
+    inicio = time.perf_counter()
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.unlink(missing_ok=True)
+    shutil.copy(DB_ORIGEM, destino)
+
+    conn = sqlite3.connect(destino)
+    aplicar_migracoes(conn)
+    conn.execute("PRAGMA journal_mode = OFF")
+    conn.execute("PRAGMA synchronous = OFF")
+    rng = random.Random(seed)
+    catalogo = carregar_catalogo(conn)
+
+    conn.execute("BEGIN")
+    conn.execute("DELETE FROM historico_itens")
+    conn.execute("DELETE FROM historico_refeicoes")
+    conn.execute("DELETE FROM refeicoes_itens")
+    conn.execute("DELETE FROM refeicoes")
+    modelos = gerar_modelos(conn, rng, catalogo, usuarios)
+
+    adiados = adiar_gatilhos_e_indices(conn, ("historico_refeicoes", "historico_itens"))
+    n_itens = 0
+    registros, itens = [], []
+
+    def gravar():
+        conn.executemany(
+            "INSERT INTO historico_refeicoes "
+            "(id, data, refeicao_id, nome, tipo, descricao, tags, criada_em) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            registros,
+        )
+        conn.executemany(
+            "INSERT INTO historico_itens (historico_id, alimento_id, gramas, ordem) "
+            "VALUES (?, ?, ?, ?)",
+            itens,
+        )
+        registros.clear()
+        itens.clear()
+
+    for registro, itens_registro in gerar_registros(
+        n_registros, usuarios, rng, catalogo, modelos, fim
+    ):
+        registros.append(registro)
+        itens.extend(itens_registro)
+        n_itens += len(itens_registro)
+        if len(registros) >= LOTE:
+            gravar()
+    gravar()
+
+    for sql in adiados:
+        conn.execute(sql)
+    conn.commit()
+    reconstruir_totais(conn)
+    conn.execute("ANALYZE")
+    conn.execute("VACUUM")
+    conn.close()
+
+    return {
+        "arquivo": str(destino),
+        "registros": n_registros,
+        "itens": n_itens,
+        "usuarios": usuarios,
+        "refeicoes": usuarios * len(TIPOS) * 2,
+        "tamanho_mb": round(destino.stat().st_size / 1e6, 1),
+        "segundos": round(time.perf_counter() - inicio, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--registros", type=int, nargs="+",
+                        default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--saida", type=Path, default=SAIDA_PADRAO,
+                        help=f"diretório dos bancos gerados (padrão: {SAIDA_PADRAO})")
+    args = parser.parse_args()
+
+    for n in args.registros:
+        info = gerar(args.saida / nome_arquivo(n), n, args.usuarios, args.seed)
+        print(f"{info['arquivo']}: {info['registros']:,} registros, {info['itens']:,} itens, "
+              f"{info['usuarios']} usuários, {info['tamanho_mb']} MB em {info['segundos']} s")
+
+
+if __name__ == "__main__":
+    main()
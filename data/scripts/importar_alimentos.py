@@ -0,0 +1,537 @@
+"""
+Importação de alimentos a partir de CSV (substitui db_atualiza.py).
+
+Formatos reconhecidos pelo cabeçalho:
+- base:  base_alimentos.csv (vírgula, com `id`) -> upsert por id
+- novos: novositens.csv (vírgula, sem `id`)     -> upsert por nome
+- tbca:  tbca.csv / tbca_original.csv (`;`, decimal com vírgula, NA)
+         -> upsert por nome, porcao_g = 100; o primeiro código de um nome
+         repetido vale, os demais contam como duplicados. As colunas de
+         nutrientes do tbca_original.csv (fibra, sódio, vitaminas...) vão
+         para alimento_nutrientes (valor por 100 g; NA não gera linha)
+
+O arquivo é lido em streaming, linha a linha (cada linha é decodificada
+como UTF-8 e, se falhar, cp1252: o cabeçalho do TBCA original vem em
+cp1252 e os dados em UTF-8). As linhas são comparadas em blocos com o que
+já está no banco e só as novas/alteradas são escritas, com executemany,
+numa única transação. Valor ausente (vazio, "-", NA) não sobrescreve o
+que está no banco; "tr" (traços) vale 0. Reimportar um arquivo sem
+mudanças não escreve nada.
+
+Quando o volume de escritas passa de LIMIAR_INDICES, os índices
+secundários de `alimentos` são removidos e recriados no fim da transação
+(os triggers de FTS/versão/totais continuam ativos).
+
+cluster_nutricional não é importado: o trigger de clusters.py atribui o
+centróide mais próximo a cada linha inserida ou com macros alterados e,
+no fim, os centróides são reajustados se a deriva passou do limiar.
+
+Uso:
+    python data/scripts/importar_alimentos.py data/csv/base_alimentos.csv
+    python data/scripts/importar_alimentos.py data/csv/tbca.csv --db /tmp/alimentos.db
+    python data/scripts/importar_alimentos.py data/csv/novositens.csv --simular
+"""
+
+import argparse
+import csv
+import sqlite3
+import sys
+import time
+import unicodedata
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+import clusters  # noqa: E402
+from migracoes import DB_PATH, aplicar_migracoes  # noqa: E402
+from nutrientes import NUTRIENTES  # noqa: E402
+
+BLOCO = 1000
+LIMIAR_INDICES = 2000
+IN_CHUNK_SIZE = 900
+
+COLUNAS_INTEIRAS = {"id"}
+COLUNAS_REAIS = {
+    "porcao_g", "kcal", "prot_g", "carb_g", "gord_g",
+    "kcal_por_g", "prot_por_g", "percentual_proteico",
+}
+
+# Valores padrão de colunas obrigatórias na inserção, quando o arquivo não os traz
+PADROES_INSERCAO = {
+    "categoria": "",
+    "porcao_g": 100.0,
+    "kcal": 0.0,
+    "prot_g": 0.0,
+    "carb_g": 0.0,
+    "gord_g": 0.0,
+    "contexto_culinario": "",
+}
+
+AUSENTES = {"", "-", "na", "n/a", "nd"}
+TRACOS = {"tr"}
+
+
+class ErroImportacao(ValueError):
+    """Arquivo em formato não reconhecido ou linha inválida"""
+
+
+class Formato:
+    """
+    Mapeamento de um layout de CSV para colunas de `alimentos`.
+
+    `colunas` liga o cabeçalho normalizado (ver normalizar) à coluna no
+    banco; `fixos` são valores aplicados a toda linha; `chave` é "id" ou
+    "nome"; `casas` arredonda as colunas reais (o catálogo guarda macros
+    com 1 casa, a TBCA publica com 2); `nutrientes` liga cabeçalhos a
+    códigos de nutrientes (alimento_nutrientes).
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        delimitador: str,
+        chave: str,
+        colunas: Dict[str, str],
+        obrigatorias: Sequence[str],
+        fixos: Optional[Dict[str, Any]] = None,
+        casas: Optional[int] = None,
+        nutrientes: Optional[Dict[str, str]] = None,
+    ):
+        self.nome = nome
+        self.delimitador = delimitador
+        self.chave = chave
+        self.colunas = colunas
+        self.obrigatorias = tuple(obrigatorias)
+        self.fixos = fixos or {}
+        self.casas = casas
+        self.nutrientes = nutrientes or {}
+
+    def indices(self, cabecalho: Sequence[str]) -> Optional[Dict[str, int]]:
+        """{coluna do banco: posição no arquivo}, ou None se o cabeçalho não casa"""
+        normalizados = [normalizar(c) for c in cabecalho]
+        indices: Dict[str, int] = {}
+        for origem, destino in self.colunas.items():
+            for i, nome in enumerate(normalizados):
+                if casa(nome, origem):
+                    indices[destino] = i
+                    break
+        if not all(self.colunas[c] in indices for c in self.obrigatorias):
+            return None
+        return indices
+
+    def indices_nutrientes(self, cabecalho: Sequence[str]) -> Dict[str, int]:
+        """{código do nutriente: posição no arquivo} das colunas presentes"""
+        normalizados = [normalizar(c) for c in cabecalho]
+        return {
+            codigo: i
+            for origem, codigo in self.nutrientes.items()
+            for i, nome in enumerate(normalizados)
+            if casa(nome, origem)
+        }
+
+
+_COLUNAS_BASE = (
+    "nome", "categoria", "porcao_g", "kcal", "prot_g", "carb_g", "gord_g",
+    "contexto_culinario", "incompativel_com", "kcal_por_g", "prot_por_g", "preco",
+    "percentual_proteico", "velocidade_absorcao",
+)
+
+FORMATOS = (
+    Formato(
+        "base", ",", "id",
+        {c: c for c in ("id",) + _COLUNAS_BASE},
+        obrigatorias=("id", "nome"),
+    ),
+    Formato(
+        "novos", ",", "nome",
+        {c: c for c in _COLUNAS_BASE},
+        obrigatorias=("nome", "kcal"),
+    ),
+    Formato(
+        "tbca", ";", "nome",
+        {
+            "alimento": "nome",
+            "energia kcal": "kcal",
+            "carboidrato total": "carb_g",
+            "proteina": "prot_g",
+            "lipidios": "gord_g",
+        },
+        obrigatorias=("alimento", "energia kcal"),
+        fixos={"porcao_g": 100.0},
+        casas=1,
+        nutrientes={cabecalho: codigo for codigo, _, _, cabecalho in NUTRIENTES},
+    ),
+)
+
+
+# ============================
+# LEITURA
+# ============================
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos; caractere ilegível (U+FFFD) vira '?'"""
+    texto = texto.replace("\ufffd", "?")
+    sem_acento = unicodedata.normalize("NFKD", texto)
+    return "".join(c for c in sem_acento if not unicodedata.combining(c)).strip().lower()
+
+
+def casa(nome: str, esperado: str) -> bool:
+    """Compara cabeçalhos tratando '?' (acento perdido na codificação) como curinga"""
+    if len(nome) != len(esperado):
+        return False
+    return all(a == b or a == "?" for a, b in zip(nome, esperado))
+
+
+def linhas_texto(caminho: Path) -> Iterator[str]:
+    """Linhas do arquivo decodificadas uma a uma (UTF-8, senão cp1252)"""
+    with open(caminho, "rb") as arquivo:
+        for numero, bruta in enumerate(arquivo):
+            if numero == 0 and bruta.startswith(b"\xef\xbb\xbf"):
+                bruta = bruta[3:]
+            try:
+                yield bruta.decode("utf-8")
+            except UnicodeDecodeError:
+                yield bruta.decode("cp1252", errors="replace")
+
+
+def detectar(primeira: str) -> Tuple[Formato, List[str]]:
+    for formato in FORMATOS:
+        cabecalho = next(csv.reader([primeira], delimiter=formato.delimitador))
+        if formato.indices(cabecalho) is not None:
+            return formato, cabecalho
+    raise ErroImportacao("Cabeçalho não reconhecido: " + primeira.strip()[:120])
+
+
+def numero(texto: str, coluna: str) -> Optional[float]:
+    valor = texto.strip()
+    minusculo = valor.lower()
+    if minusculo in AUSENTES:
+        return None
+    if minusculo in TRACOS:
+        return 0.0
+    try:
+        resultado = float(valor)
+    except ValueError:
+        try:
+            resultado = float(valor.replace(",", "."))
+        except ValueError:
+            raise ErroImportacao(f"{coluna}: valor numérico inválido {texto!r}")
+    return int(resultado) if coluna in COLUNAS_INTEIRAS else resultado
+
+
+def converter(
+    campos: List[str],
+    formato: Formato,
+    indices: Dict[str, int],
+    indices_nutrientes: Dict[str, int],
+) -> Dict[str, Any]:
+    """
+    Linha do CSV -> {coluna: valor}; None = ausente no arquivo.
+
+    Nutrientes presentes vão em valores["nutrientes"] ({código: valor}).
+    """
+    valores: Dict[str, Any] = {}
+    for coluna, i in indices.items():
+        texto = campos[i] if i < len(campos) else ""
+        if coluna in COLUNAS_REAIS or coluna in COLUNAS_INTEIRAS:
+            valor = numero(texto, coluna)
+            if valor is not None and formato.casas is not None and coluna in COLUNAS_REAIS:
+                valor = round(valor, formato.casas)
+            if coluna == "porcao_g" and valor is not None and valor <= 0:
+                # Totais dividem por porcao_g (mesma regra de AlimentoCreate)
+                raise ErroImportacao(f"porcao_g deve ser maior que 0 (veio {texto!r})")
+            valores[coluna] = valor
+        else:
+            valores[coluna] = texto if texto != "" else None
+    valores.update(formato.fixos)
+    if indices_nutrientes:
+        nutrientes = {}
+        for codigo, i in indices_nutrientes.items():
+            valor = numero(campos[i], codigo) if i < len(campos) else None
+            if valor is not None:
+                nutrientes[codigo] = valor
+        valores["nutrientes"] = nutrientes
+    return valores
+
+
+def ler_blocos(
+    caminho: Path,
+) -> Tuple[Formato, List[str], Iterator[List[Tuple[int, Dict[str, Any]]]]]:
+    """Formato detectado, nutrientes do arquivo e iterador de blocos [(linha, valores)]"""
+    linhas = linhas_texto(caminho)
+    try:
+        primeira = next(linhas)
+    except StopIteration:
+        raise ErroImportacao(f"{caminho}: arquivo vazio")
+    formato, cabecalho = detectar(primeira)
+    indices = formato.indices(cabecalho)
+    indices_nutrientes = formato.indices_nutrientes(cabecalho)
+
+    def blocos():
+        bloco: List[Tuple[int, Dict[str, Any]]] = []
+        leitor = csv.reader(linhas, delimiter=formato.delimitador)
+        for campos in leitor:
+            if not any(c.strip() for c in campos):
+                continue
+            linha = leitor.line_num + 1
+            try:
+                bloco.append(
+                    (linha, converter(campos, formato, indices, indices_nutrientes))
+                )
+            except ErroImportacao as e:
+                bloco.append((linha, e))
+            if len(bloco) >= BLOCO:
+                yield bloco
+                bloco = []
+        if bloco:
+            yield bloco
+
+    return formato, list(indices_nutrientes), blocos()
+
+
+# ============================
+# GRAVAÇÃO
+# ============================
+
+SQL_UPSERT_NUTRIENTE = """
+    INSERT INTO alimento_nutrientes (alimento_id, nutriente_id, valor) VALUES (?, ?, ?)
+    ON CONFLICT (alimento_id, nutriente_id) DO UPDATE SET valor = excluded.valor
+"""
+
+
+def adiar_indices(conn: sqlite3.Connection) -> List[str]:
+    """Remove os índices secundários de alimentos e devolve o DDL para recriá-los"""
+    indices = conn.execute(
+        "SELECT name, sql FROM sqlite_master "
+        "WHERE type = 'index' AND tbl_name = 'alimentos' AND sql IS NOT NULL"
+    ).fetchall()
+    for nome, _ in indices:
+        conn.execute(f'DROP INDEX "{nome}"')
+    return [sql for _, sql in indices]
+
+
+class Importacao:
+    """Estado de uma importação: linhas existentes, contadores e índices adiados"""
+
+    def __init__(
+        self,
+        conn: sqlite3.Connection,
+        formato: Formato,
+        nutrientes: Sequence[str] = (),
+    ):
+        self.conn = conn
+        self.formato = formato
+        self.colunas = [c for c in formato.colunas.values() if c != "id"]
+        self.colunas += [c for c in formato.fixos if c not in self.colunas]
+        self.contagem = {
+            "inseridos": 0, "atualizados": 0, "inalterados": 0,
+            "duplicados": 0, "erros": 0, "nutrientes": 0,
+        }
+        self.erros: List[str] = []
+        self.indices_adiados: Optional[List[str]] = None
+        self.escritas = 0
+        self.vistos: set = set()
+
+        chave = formato.chave
+        self.existentes: Dict[Any, Tuple] = {}
+        for linha in conn.execute(
+            f"SELECT {chave}, id, {', '.join(self.colunas)} FROM alimentos ORDER BY id"
+        ):
+            self.existentes.setdefault(linha[0], linha[1:])
+
+        # Nutrientes: {código: nutriente_id} e valores atuais por (alimento, nutriente)
+        self.nutriente_id: Dict[str, int] = {}
+        self.nutrientes_existentes: Dict[Tuple[int, int], float] = {}
+        if nutrientes:
+            self.nutriente_id = {
+                codigo: nid
+                for nid, codigo in conn.execute("SELECT id, codigo FROM nutrientes")
+                if codigo in nutrientes
+            }
+            self.nutrientes_existentes = {
+                (aid, nid): valor
+                for aid, nid, valor in conn.execute(
+                    "SELECT alimento_id, nutriente_id, valor FROM alimento_nutrientes"
+                )
+            }
+
+        self.sql_update = (
+            "UPDATE alimentos SET "
+            + ", ".join(f"{c} = COALESCE(?, {c})" for c in self.colunas)
+            + " WHERE id = ?"
+        )
+        colunas_insert = (["id"] if chave == "id" else []) + self.colunas
+        colunas_insert += [c for c in PADROES_INSERCAO if c not in colunas_insert]
+        self.colunas_insert = colunas_insert
+        self.sql_insert = (
+            f"INSERT INTO alimentos ({', '.join(colunas_insert)}) "
+            f"VALUES ({', '.join('?' for _ in colunas_insert)})"
+        )
+
+    def _valor_insercao(self, valores: Dict[str, Any], coluna: str) -> Any:
+        valor = valores.get(coluna)
+        return PADROES_INSERCAO.get(coluna) if valor is None else valor
+
+    def _nutrientes_alterados(self, alimento_id: int, nutrientes: Dict[str, float]) -> List[Tuple]:
+        alterados = []
+        for codigo, valor in nutrientes.items():
+            nid = self.nutriente_id[codigo]
+            if self.nutrientes_existentes.get((alimento_id, nid)) != valor:
+                alterados.append((alimento_id, nid, valor))
+        return alterados
+
+    def _ids_por_nome(self, nomes: List[str]) -> Dict[str, int]:
+        ids: Dict[str, int] = {}
+        for inicio in range(0, len(nomes), IN_CHUNK_SIZE):
+            parte = nomes[inicio:inicio + IN_CHUNK_SIZE]
+            for nome, aid in self.conn.execute(
+                f"SELECT nome, id FROM alimentos WHERE nome IN ({','.join('?' * len(parte))})",
+                parte,
+            ):
+                ids.setdefault(nome, aid)
+        return ids
+
+    def processar(self, bloco: List[Tuple[int, Any]]) -> None:
+        chave = self.formato.chave
+        inserir: List[Tuple] = []
+        atualizar: List[Tuple] = []
+        gravar_nutrientes: List[Tuple] = []
+        nutrientes_inseridos: List[Tuple[Any, Dict[str, float]]] = []
+        for linha, valores in bloco:
+            if isinstance(valores, ErroImportacao):
+                self.contagem["erros"] += 1
+                self.erros.append(f"linha {linha}: {valores}")
+                continue
+            valor_chave = valores.get(chave)
+            if valor_chave is None:
+                self.contagem["erros"] += 1
+                self.erros.append(f"linha {linha}: {chave} ausente")
+                continue
+            if valor_chave in self.vistos:
+                self.contagem["duplicados"] += 1
+                continue
+            self.vistos.add(valor_chave)
+            nutrientes = valores.pop("nutrientes", None)
+
+            atual = self.existentes.get(valor_chave)
+            if atual is None:
+                inserir.append(tuple(self._valor_insercao(valores, c) for c in self.colunas_insert))
+                if nutrientes:
+                    nutrientes_inseridos.append((valor_chave, nutrientes))
+                continue
+            novos = [valores.get(c) for c in self.colunas]
+            alterados = self._nutrientes_alterados(atual[0], nutrientes) if nutrientes else []
+            gravar_nutrientes.extend(alterados)
+            if all(n is None or n == a for n, a in zip(novos, atual[1:])):
+                if alterados:
+                    self.contagem["atualizados"] += 1
+                else:
+                    self.contagem["inalterados"] += 1
+            else:
+                atualizar.append(tuple(novos) + (atual[0],))
+
+        escritas = len(inserir) + len(atualizar)
+        if escritas:
+            self._gravar(inserir, atualizar)
+        if nutrientes_inseridos:
+            if chave == "id":
+                ids = {v: v for v, _ in nutrientes_inseridos}
+            else:
+                ids = self._ids_por_nome([v for v, _ in nutrientes_inseridos])
+            for valor_chave, nutrientes in nutrientes_inseridos:
+                gravar_nutrientes.extend(self._nutrientes_alterados(ids[valor_chave], nutrientes))
+        if gravar_nutrientes:
+            self.conn.executemany(SQL_UPSERT_NUTRIENTE, gravar_nutrientes)
+            self.contagem["nutrientes"] += len(gravar_nutrientes)
+
+    def _gravar(self, inserir: List[Tuple], atualizar: List[Tuple]) -> None:
+        escritas = len(inserir) + len(atualizar)
+        self.escritas += escritas
+        if self.indices_adiados is None and self.escritas > LIMIAR_INDICES:
+            self.indices_adiados = adiar_indices(self.conn)
+        if atualizar:
+            self.conn.executemany(self.sql_update, atualizar)
+            self.contagem["atualizados"] += len(atualizar)
+        if inserir:
+            self.conn.executemany(self.sql_insert, inserir)
+            self.contagem["inseridos"] += len(inserir)
+
+    def finalizar(self) -> None:
+        for sql in self.indices_adiados or []:
+            self.conn.execute(sql)
+
+
+def importar(conn: sqlite3.Connection, caminho: Path, simular: bool = False) -> Dict[str, Any]:
+    """Importa `caminho` numa única transação; `simular` desfaz no fim"""
+    formato, nutrientes, blocos = ler_blocos(caminho)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        importacao = Importacao(conn, formato, nutrientes)
+        for bloco in blocos:
+            importacao.processar(bloco)
+        importacao.finalizar()
+    except BaseException:
+        conn.rollback()
+        raise
+    if simular:
+        conn.rollback()
+    else:
+        conn.commit()
+    return {
+        "formato": formato.nome,
+        **importacao.contagem,
+        "indices_adiados": importacao.indices_adiados is not None,
+        "mensagens_erro": importacao.erros,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("arquivos", type=Path, nargs="+", help="CSVs a importar, na ordem")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--simular", action="store_true", help="não grava (rollback no fim)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db, isolation_level=None)
+    try:
+        tabela = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alimentos'"
+        ).fetchone()
+        if tabela is None:
+            sys.exit(f"❌ {args.db}: tabela alimentos não existe")
+        aplicar_migracoes(conn)
+
+        for caminho in args.arquivos:
+            inicio = time.perf_counter()
+            try:
+                r = importar(conn, caminho, simular=args.simular)
+            except (ErroImportacao, OSError, sqlite3.Error) as e:
+                sys.exit(f"❌ {caminho}: {e}")
+            duracao = time.perf_counter() - inicio
+            print(
+                f"{'🔎' if args.simular else '✅'} {caminho.name} ({r['formato']}): "
+                f"{r['inseridos']} inseridos, {r['atualizados']} atualizados, "
+                f"{r['inalterados']} inalterados, {r['duplicados']} duplicados, "
+                f"{r['erros']} erros"
+                + (f", {r['nutrientes']} valores de nutrientes" if r["nutrientes"] else "")
+                + f" em {duracao:.2f}s"
+                + (" (índices recriados)" if r["indices_adiados"] else "")
+            )
+            for mensagem in r["mensagens_erro"][:20]:
+                print(f"   ⚠️  {mensagem}")
+
+        if not args.simular:
+            reajuste = clusters.reajustar_se_necessario(conn)
+            if reajuste is not None:
+                print(
+                    f"🔁 clusters reajustados: k={reajuste['k']}, "
+                    f"{reajuste['alterados']} alimentos mudaram de cluster"
+                )
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Regressão de planos de consulta (EXPLAIN QUERY PLAN) da API.
+
+Sobe a API in-process sobre uma cópia temporária do banco, com histórico
+sintético (bench_itens_lote.popular_historico), chama cada endpoint de
+gestor_alimentos_api.py e captura todo SQL executado pelas conexões do
+pool (set_trace_callback). Cada comando distinto passa por EXPLAIN QUERY
+PLAN e o script falha (exit 1) quando algum faz SCAN de tabela grande:
+
+- SCAN sem índice: sempre falha, salvo os da lista PERMITIDOS (cargas
+  completas feitas de propósito, com o motivo)
+- SCAN ... USING INDEX: aceito só com LIMIT (caminhada no índice que para
+  cedo, como a paginação por cursor)
+
+"USE TEMP B-TREE" em tabela grande sai como aviso.
+
+Uso:
+    python data/scripts/verificar_planos.py
+    python data/scripts/verificar_planos.py --registros 5000 --verbose
+"""
+
+import argparse
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+API_DIR = Path(__file__).resolve().parent.parent / "api"
+sys.path.insert(0, str(API_DIR))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import gestor_alimentos_api as api  # noqa: E402
+from bench_itens_lote import DB_ORIGEM, popular_historico  # noqa: E402
+from migracoes import aplicar_migracoes  # noqa: E402
+
+TABELAS_GRANDES = {
+    "alimentos", "alimento_nutrientes",
+    "refeicoes", "refeicoes_itens", "refeicoes_totais",
+    "historico_refeicoes", "historico_itens", "historico_totais", "historico_diario",
+}
+
+# (regex no SQL normalizado, motivo) de varreduras completas intencionais
+PERMITIDOS = (
+    (r"^SELECT \* FROM alimentos ORDER BY id$",
+     "carga do catálogo em memória (uma vez por versão)"),
+    (r"^SELECT id, nome, categoria, contexto_culinario, incompativel_com FROM alimentos",
+     "índice de compatibilidade (uma vez por versão)"),
+    (r"^SELECT id, porcao_g, kcal, prot_g, carb_g, gord_g FROM alimentos ORDER BY id$",
+     "matriz de nutrientes (uma vez por versão)"),
+    (r"^SELECT an\.alimento_id, n\.codigo, an\.valor FROM alimento_nutrientes an",
+     "matriz de nutrientes (uma vez por versão)"),
+    (r"FROM alimentos WHERE porcao_g > 0",
+     "candidatos do montador de sugestões (filtro de contexto em Python)"),
+    (r"^SELECT DISTINCT categoria FROM alimentos",
+     "vocabulário de categorias"),
+    (r"^SELECT COUNT\(\*\) FROM alimentos$",
+     "contagem do /health (catálogo pequeno, no menor índice)"),
+)
+
+# "--" são comandos internos (FTS5, gatilhos) que o trace também reporta
+IGNORADOS = re.compile(r"^(--|(PRAGMA|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|CREATE|DROP)\b)", re.I)
+ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(?!ON\b|WHERE\b|JOIN\b|LEFT\b|"
+                   r"INNER\b|ORDER\b|GROUP\b|LIMIT\b|USING\b)(\w+))?", re.I)
+SCAN = re.compile(r"^SCAN (\w+)( USING (?:COVERING )?INDEX \w+)?")
+TEMP = re.compile(r"USE TEMP B-TREE")
+
+
+def normalizar(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def tabelas_por_alias(sql: str) -> dict:
+    aliases = {}
+    for tabela, alias in ALIAS.findall(sql):
+        aliases[tabela] = tabela
+        if alias:
+            aliases[alias] = tabela
+    return aliases
+
+
+def permitido(sql: str) -> str:
+    for padrao, motivo in PERMITIDOS:
+        if re.search(padrao, sql):
+            return motivo
+    return ""
+
+
+def analisar(conn: sqlite3.Connection, sql: str) -> tuple:
+    """(falhas, avisos, plano) de um comando"""
+    plano = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    aliases = tabelas_por_alias(sql)
+    tem_limit = re.search(r"\bLIMIT\b", sql, re.I) is not None
+    falhas, avisos = [], []
+    for detalhe in plano:
+        scan = SCAN.match(detalhe)
+        if scan:
+            tabela = aliases.get(scan.group(1), scan.group(1))
+            if tabela in TABELAS_GRANDES and not (scan.group(2) and tem_limit):
+                falhas.append(detalhe)
+        elif TEMP.search(detalhe):
+            avisos.append(detalhe)
+    return falhas, avisos, plano
+
+
+def exercitar(http: TestClient, conn: sqlite3.Connection) -> None:
+    """Chama cada endpoint com os filtros que geram SQL diferente"""
+    alimento = conn.execute("SELECT id, nome, categoria FROM alimentos LIMIT 1 OFFSET 100").fetchone()
+    outros = [r[0] for r in conn.execute("SELECT id FROM alimentos LIMIT 3 OFFSET 200")]
+    data = conn.execute("SELECT data FROM historico_refeicoes LIMIT 1").fetchone()[0]
+    itens = [{"alimento_id": outros[0], "gramas": 100}, {"alimento_id": outros[1], "gramas": 50}]
+
+    def ok(resposta, *esperados):
+        esperados = esperados or (200,)
+        if resposta.status_code not in esperados:
+            raise RuntimeError(f"{resposta.request.method} {resposta.request.url}: "
+                               f"{resposta.status_code} {resposta.text[:200]}")
+        return resposta
+
+    # Alimentos
+    pagina = ok(http.get("/api/alimentos", params={"limit": 20})).json()
+    ok(http.get("/api/alimentos", params={"cursor": pagina["next_cursor"], "limit": 20}))
+    ok(http.get("/api/alimentos", params={"categoria": alimento[2], "limit": 20}))
+    ok(http.get("/api/alimentos", params={"search": "arroz", "limit": 20}))
+    ok(http.get("/api/alimentos/busca", params={"q": "arroz integral"}))
+    ok(http.get("/api/alimentos/busca", params={"q": "frango", "categoria": alimento[2]}))
+    ok(http.get(f"/api/alimentos/{alimento[0]}"))
+    ok(http.get("/api/categorias"))
+    ok(http.get("/api/nutrientes"))
+    ok(http.get("/api/alimentos/compatibilidade"))
+    ok(http.get("/api/alimentos/compatibilidade/grupo", params={"ids": outros}))
+    ok(http.post("/api/alimentos", json={
+        "nome": alimento[1], "categoria": "x", "kcal": 1, "prot_g": 0, "carb_g": 0,
+        "gord_g": 0, "contexto_culinario": "universal",
+    }), 409)
+    ok(http.post("/api/alimentos", json={
+        "nome": "Alimento verificar_planos", "categoria": "x", "kcal": 1, "prot_g": 0,
+        "carb_g": 0, "gord_g": 0, "contexto_culinario": "universal",
+    }), 201)
+
+    # Refeições
+    refeicao = ok(http.post("/api/refeicoes", json={
+        "nome": "Refeição verificar_planos", "tipo": "almoco", "itens": itens,
+    }), 201).json()
+    pagina = ok(http.get("/api/refeicoes", params={"limit": 5})).json()
+    if pagina["next_cursor"]:
+        ok(http.get("/api/refeicoes", params={"cursor": pagina["next_cursor"], "limit": 5}))
+    ok(http.get("/api/refeicoes", params={"tipo": "almoco", "limit": 5, "nutrientes": "fibra"}))
+    ok(http.get(f"/api/refeicoes/{refeicao['id']}"))
+    ok(http.get("/api/refeicoes/tipos/disponiveis"))
+    ok(http.post("/api/refeicoes/sugerir", json={
+        "prot": 40, "carb": 60, "gord": 15, "contexto_culinario": "almoço", "quantidade": 2,
+    }))
+
+    # Histórico
+    registro = ok(http.post("/api/historico", json={
+        "data": data, "nome": "Registro verificar_planos", "tipo": "almoco",
+        "refeicao_id": refeicao["id"], "itens": itens,
+    }), 201).json()
+    ok(http.post("/api/historico/lote", json=[
+        {"data": data, "nome": "Lote verificar_planos", "tipo": "jantar", "itens": itens},
+    ]), 201)
+    pagina = ok(http.get("/api/historico", params={"limit": 20})).json()
+    ok(http.get("/api/historico", params={"cursor": pagina["next_cursor"], "limit": 20}))
+    ok(http.get("/api/historico", params={"data": data, "limit": 20}))
+    ok(http.get("/api/historico", params={"data": data, "tipo": "almoco,jantar", "limit": 20}))
+    ok(http.get("/api/historico", params={"tipo": "almoco", "limit": 20}))
+    ok(http.get("/api/historico", params={"tags": "treino", "limit": 20}))
+    ok(http.get("/api/historico", params={"texto": "verificar", "limit": 20}))
+    ok(http.get("/api/historico/resumo", params={"inicio": data, "fim": data}))
+    ok(http.get("/api/historico/resumo", params={
+        "inicio": data, "fim": data, "granularidade": "semana",
+    }))
+    ok(http.get("/api/historico/export", params={"data": data}))
+    ok(http.get("/api/historico/export", params={"data": data, "formato": "csv"}))
+    ok(http.get(f"/api/historico/{registro['id']}", params={"nutrientes": "todos"}))
+    ok(http.delete(f"/api/historico/{registro['id']}"), 204)
+    ok(http.get("/health"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--registros", type=int, default=20_000,
+                        help="registros sintéticos de histórico")
+    parser.add_argument("--verbose", action="store_true", help="mostra o plano de todo comando")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "planos.db"
+        shutil.copy(DB_ORIGEM, db_path)
+        conn = sqlite3.connect(db_path)
+        aplicar_migracoes(conn)
+        popular_historico(conn, args.registros)
+
+        capturados: dict = {}
+
+        def capturar(sql: str) -> None:
+            sql = normalizar(sql)
+            if not IGNORADOS.match(sql):
+                capturados.setdefault(sql, None)
+
+        api.DB_PATH = db_path
+        try:
+            with TestClient(api.app) as http:
+                for pool_conn in api.pool._todas:
+                    pool_conn.set_trace_callback(capturar)
+                exercitar(http, conn)
+                for pool_conn in api.pool._todas:
+                    pool_conn.set_trace_callback(None)
+        finally:
+            api.fechar_banco()
+
+        falhas_total, avisos_total = 0, 0
+        for sql in capturados:
+            falhas, avisos, plano = analisar(conn, sql)
+            motivo = permitido(sql) if falhas else ""
+            if falhas and not motivo:
+                falhas_total += 1
+                print(f"❌ {sql[:300]}")
+                for detalhe in falhas:
+                    print(f"     {detalhe}")
+            elif avisos:
+                avisos_total += 1
+                print(f"⚠️  {sql[:300]}")
+                for detalhe in avisos:
+                    print(f"     {detalhe}")
+            elif args.verbose:
+                print(f"✅ {sql[:300]}" + (f"  [permitido: {motivo}]" if motivo else ""))
+                for detalhe in plano:
+                    print(f"     {detalhe}")
+        conn.close()
+
+    print(f"\n{len(capturados)} comandos, {falhas_total} com SCAN em tabela grande, "
+          f"{avisos_total} com ordenação temporária")
+    sys.exit(1 if falhas_total else 0)
+
+
+if __name__ == "__main__":
+    main()
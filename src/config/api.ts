@@ -33,11 +33,21 @@ export const API_CONFIG = {
   ENDPOINTS: {
     ALIMENTOS: '/api/alimentos',
     ALIMENTOS_BY_ID: (id: number) => `/api/alimentos/${id}`,
+    ALIMENTOS_BUSCA: '/api/alimentos/busca',
+    ALIMENTOS_SUBSTITUTOS: (id: number) => `/api/alimentos/${id}/substitutos`,
+    ALIMENTOS_COMPATIBILIDADE: '/api/alimentos/compatibilidade',
     CATEGORIAS: '/api/categorias',
+    NUTRIENTES: '/api/nutrientes',
     REFEICOES: '/api/refeicoes',
     REFEICOES_BY_ID: (id: number) => `/api/refeicoes/${id}`,
+    REFEICOES_LOTE: '/api/refeicoes/lote',
+    REFEICOES_CLONAR: (id: number) => `/api/refeicoes/${id}/clonar`,
+    REFEICOES_ITENS: (id: number) => `/api/refeicoes/${id}/itens`,
     HISTORICO: '/api/historico',
     HISTORICO_BY_ID: (id: number) => `/api/historico/${id}`,
+    HISTORICO_RESUMO: '/api/historico/resumo',
+    HISTORICO_LOTE: '/api/historico/lote',
+    HISTORICO_EXPORT: '/api/historico/export',
     AGENT: '/api/agent',
   },
 
@@ -7,8 +7,12 @@ import type {
   Alimento,
   AlimentoCreate,
   AlimentoDB,
+  AlimentosCompactos,
+  CategoriaSubstituto,
+  Nutriente,
+  SubstitutosResponse,
 } from '../types';
-import { adaptAlimentoFromDB } from '../types';
+import { adaptAlimentoFromDB, alimentosFromCompacto } from '../types';
 
 export type { Alimento, AlimentoCreate };
 
@@ -16,9 +20,11 @@ export async function getAllAlimentos(categoria?: string, search?: string): Prom
   const params = new URLSearchParams();
   if (categoria) params.append('categoria', categoria);
   if (search) params.append('search', search);
+  // Lista completa (sem paginação por cursor), em colunas + linhas
+  params.append('legado', 'true');
+  params.append('formato', 'compacto');
 
-  const queryString = params.toString() ? `?${params.toString()}` : '';
-  const url = buildUrl(`${API_CONFIG.ENDPOINTS.ALIMENTOS}${queryString}`);
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.ALIMENTOS}?${params.toString()}`);
 
   const response = await fetchWithTimeout(url);
 
@@ -26,9 +32,33 @@ export async function getAllAlimentos(categoria?: string, search?: string): Prom
     throw new Error(`Erro ao buscar alimentos: ${response.statusText}`);
   }
 
-  const data = await response.json();
+  const data: AlimentosCompactos = await response.json();
 
   // Adaptar de snake_case (backend) para camelCase (frontend)
+  return alimentosFromCompacto(data).map(adaptAlimentoFromDB);
+}
+
+/**
+ * Busca ranqueada no servidor (FTS5, sem acentos, prefixo por palavra).
+ * Retorna só o top-k, sem baixar a tabela inteira para ranquear no cliente.
+ */
+export async function buscarAlimentos(
+  q: string,
+  k = 20,
+  categoria?: string
+): Promise<Alimento[]> {
+  const params = new URLSearchParams({ q, k: String(k) });
+  if (categoria) params.append('categoria', categoria);
+
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.ALIMENTOS_BUSCA}?${params.toString()}`);
+
+  const response = await fetchWithTimeout(url);
+
+  if (!response.ok) {
+    throw new Error(`Erro ao buscar alimentos: ${response.statusText}`);
+  }
+
+  const data = await response.json();
   const alimentosDB: AlimentoDB[] = data.alimentos;
   return alimentosDB.map(adaptAlimentoFromDB);
 }
@@ -46,6 +76,59 @@ export async function getCategorias(): Promise<string[]> {
   return data.categorias;
 }
 
+/**
+ * Nutrientes aceitos em `nutrientes=` nas refeições e no histórico
+ */
+export async function getNutrientes(): Promise<Nutriente[]> {
+  const url = buildUrl(API_CONFIG.ENDPOINTS.NUTRIENTES);
+
+  const response = await fetchWithTimeout(url);
+
+  if (!response.ok) {
+    throw new Error(`Erro ao buscar nutrientes: ${response.statusText}`);
+  }
+
+  const data = await response.json();
+  return data.nutrientes;
+}
+
+/**
+ * Substitutos de um alimento (perfil nutricional por kcal mais próximo),
+ * com as gramas que igualam as calorias de `gramas` do original.
+ */
+export async function getSubstitutos(
+  id: number,
+  opcoes: {
+    k?: number;
+    gramas?: number;
+    categoria?: CategoriaSubstituto;
+    contexto?: string;
+    nutrientes?: string[];
+    excluir?: number[];
+  } = {}
+): Promise<SubstitutosResponse> {
+  const params = new URLSearchParams();
+  if (opcoes.k) params.append('k', String(opcoes.k));
+  if (opcoes.gramas) params.append('gramas', String(opcoes.gramas));
+  if (opcoes.categoria) params.append('categoria', opcoes.categoria);
+  if (opcoes.contexto) params.append('contexto', opcoes.contexto);
+  if (opcoes.nutrientes?.length) params.append('nutrientes', opcoes.nutrientes.join(','));
+  opcoes.excluir?.forEach((excluido) => params.append('excluir', String(excluido)));
+
+  const query = params.toString();
+  const url = buildUrl(
+    `${API_CONFIG.ENDPOINTS.ALIMENTOS_SUBSTITUTOS(id)}${query ? `?${query}` : ''}`
+  );
+
+  const response = await fetchWithTimeout(url);
+
+  if (!response.ok) {
+    throw new Error(`Erro ao buscar substitutos: ${response.statusText}`);
+  }
+
+  return response.json();
+}
+
 export interface AddFoodResponse {
   status: 'inserted' | 'duplicate';
   id?: number;
@@ -6,6 +6,8 @@ import type {
   HistoricoRefeicao,
   HistoricoRefeicaoDB,
   HistoricoItemDB,
+  GranularidadeResumo,
+  ResumoHistorico,
   adaptHistoricoFromDB,
 } from '../types';
 
@@ -35,6 +37,40 @@ export async function registrarHistorico(registro: HistoricoCreate): Promise<{
   return response.json();
 }
 
+/**
+ * Registra vários itens no histórico numa única requisição/transação
+ *
+ * @param registros - Registros no mesmo formato de registrarHistorico
+ * @param atomico - Se true, qualquer entrada inválida cancela o lote todo
+ * @returns Resultado por entrada (id e totais, ou erro), na ordem enviada
+ */
+export async function registrarHistoricoLote(
+  registros: HistoricoCreate[],
+  atomico = false
+): Promise<{
+  inseridos: number;
+  erros: number;
+  resultados: Array<
+    | { indice: number; id: number; totais: { kcal: number; prot: number; carb: number; gord: number } }
+    | { indice: number; erro: string }
+  >;
+}> {
+  const query = atomico ? '?atomico=true' : '';
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO_LOTE}${query}`);
+
+  const response = await fetchWithTimeout(url, {
+    method: 'POST',
+    body: JSON.stringify(registros),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Erro ao registrar lote no histórico');
+  }
+
+  return response.json();
+}
+
 /**
  * Lista registros do histórico com filtros opcionais
  *
@@ -44,8 +80,10 @@ export async function registrarHistorico(registro: HistoricoCreate): Promise<{
 export async function listarHistorico(
   params?: URLSearchParams
 ): Promise<HistoricoRefeicao[]> {
-  const queryString = params ? `?${params.toString()}` : '';
-  const url = buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO}${queryString}`);
+  // Histórico completo (sem paginação por cursor)
+  const query = new URLSearchParams(params);
+  query.set('legado', 'true');
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO}?${query.toString()}`);
 
   const response = await fetchWithTimeout(url);
 
@@ -57,14 +95,46 @@ export async function listarHistorico(
   return data.historico || [];
 }
 
+/**
+ * Totais de kcal/macros por dia, semana ou mês (com quebra por tipo)
+ *
+ * @param inicio - YYYY-MM-DD (inclusive)
+ * @param fim - YYYY-MM-DD (inclusive)
+ * @param granularidade - dia, semana (início na segunda) ou mes
+ * @returns Períodos com registros e totais agregados no servidor
+ */
+export async function resumoHistorico(
+  inicio: string,
+  fim: string,
+  granularidade: GranularidadeResumo = 'dia'
+): Promise<ResumoHistorico> {
+  const query = new URLSearchParams({ inicio, fim, granularidade });
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO_RESUMO}?${query.toString()}`);
+
+  const response = await fetchWithTimeout(url);
+
+  if (!response.ok) {
+    throw new Error('Erro ao buscar resumo do histórico');
+  }
+
+  return response.json();
+}
+
 /**
  * Busca um registro específico do histórico por ID
  *
  * @param id - ID do registro
+ * @param nutrientes - Códigos extras (ex: ['fibra', 'sodio']) somados em `nutrientes`
  * @returns Registro completo com itens e totais
  */
-export async function obterHistorico(id: number): Promise<HistoricoRefeicao> {
-  const url = buildUrl(API_CONFIG.ENDPOINTS.HISTORICO_BY_ID(id));
+export async function obterHistorico(
+  id: number,
+  nutrientes?: string[]
+): Promise<HistoricoRefeicao> {
+  const query = nutrientes?.length
+    ? `?${new URLSearchParams({ nutrientes: nutrientes.join(',') })}`
+    : '';
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO_BY_ID(id)}${query}`);
 
   const response = await fetchWithTimeout(url);
 
@@ -101,6 +171,21 @@ export async function excluirHistorico(id: number): Promise<void> {
   // 204 No Content não retorna body
 }
 
+/**
+ * URL de download do histórico (streaming, sem carregar tudo na página)
+ *
+ * @param formato - ndjson (registro com itens) ou csv (uma linha por item)
+ * @param params - Mesmos filtros de listarHistorico
+ */
+export function urlExportarHistorico(
+  formato: 'ndjson' | 'csv' = 'csv',
+  params?: URLSearchParams
+): string {
+  const query = new URLSearchParams(params);
+  query.set('formato', formato);
+  return buildUrl(`${API_CONFIG.ENDPOINTS.HISTORICO_EXPORT}?${query.toString()}`);
+}
+
 /**
  * Helper para criar params de filtro
  */
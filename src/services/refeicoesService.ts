@@ -42,9 +42,16 @@ export async function getRefeicoes(
 
 /**
  * Busca uma refeição específica por ID
+ * nutrientes: códigos extras (ex: ['fibra', 'sodio']) somados em `nutrientes`
  */
-export async function getRefeicaoById(id: number): Promise<RefeicaoComTotais> {
-  const url = buildUrl(API_CONFIG.ENDPOINTS.REFEICOES_BY_ID(id));
+export async function getRefeicaoById(
+  id: number,
+  nutrientes?: string[]
+): Promise<RefeicaoComTotais> {
+  const query = nutrientes?.length
+    ? `?${new URLSearchParams({ nutrientes: nutrientes.join(',') })}`
+    : '';
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.REFEICOES_BY_ID(id)}${query}`);
 
   const response = await fetchWithTimeout(url);
 
@@ -105,6 +112,109 @@ export async function createRefeicao(refeicao: RefeicaoCreate): Promise<{
   return response.json();
 }
 
+/**
+ * Cria várias refeições numa única requisição/transação
+ *
+ * @param refeicoes - Refeições no mesmo formato de createRefeicao
+ * @param atomico - Se true, qualquer entrada inválida cancela o lote todo
+ * @returns Resultado por entrada (id e totais, ou erro), na ordem enviada
+ */
+export async function createRefeicoesLote(
+  refeicoes: RefeicaoCreate[],
+  atomico = false
+): Promise<{
+  inseridos: number;
+  erros: number;
+  resultados: Array<{ indice: number; id: number; totais: Totais } | { indice: number; erro: string }>;
+}> {
+  const query = atomico ? '?atomico=true' : '';
+  const url = buildUrl(`${API_CONFIG.ENDPOINTS.REFEICOES_LOTE}${query}`);
+
+  const response = await fetchWithTimeout(url, {
+    method: 'POST',
+    body: JSON.stringify(refeicoes),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(error.detail || 'Erro ao criar lote de refeições');
+  }
+
+  return response.json();
+}
+
+/**
+ * Copia uma refeição com as gramas escaladas
+ *
+ * @param id - ID da refeição original
+ * @param opcoes - nome/tipo da cópia e fator das gramas ou kcal alvo (um ou outro)
+ * @returns Resposta com id, nome, fator aplicado e totais da cópia
+ */
+export async function clonarRefeicao(
+  id: number,
+  opcoes: { nome?: string; tipo?: string; fator?: number; kcal?: number } = {}
+): Promise<{
+  id: number;
+  nome: string;
+  origem_id: number;
+  fator: number;
+  totais: Totais;
+}> {
+  const url = buildUrl(API_CONFIG.ENDPOINTS.REFEICOES_CLONAR(id));
+
+  const response = await fetchWithTimeout(url, {
+    method: 'POST',
+    body: JSON.stringify(opcoes),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    if (response.status === 404) {
+      throw new Error('Refeição não encontrada');
+    }
+    throw new Error(error.detail || 'Erro ao clonar refeição');
+  }
+
+  return response.json();
+}
+
+/**
+ * Altera itens de uma refeição (só a diferença é gravada, numa transação)
+ *
+ * @param id - ID da refeição
+ * @param operacoes - Aplicadas em sequência: adicionar, alterar, remover, reordenar
+ * @returns Itens finais (com ids dos novos), alterações, delta e totais
+ */
+export async function alterarItensRefeicao(
+  id: number,
+  operacoes: Array<
+    | { op: 'adicionar'; alimento_id: number; gramas: number; posicao?: number }
+    | { op: 'alterar'; item_id: number; alimento_id?: number; gramas?: number }
+    | { op: 'remover'; item_id: number }
+    | { op: 'reordenar'; itens: number[] }
+  >
+): Promise<{
+  id: number;
+  itens: Array<{ id: number; alimento_id: number; gramas: number; ordem: number }>;
+  alteracoes: { adicionados: number; alterados: number; removidos: number; reordenados: number };
+  delta: Totais;
+  totais: Totais;
+}> {
+  const url = buildUrl(API_CONFIG.ENDPOINTS.REFEICOES_ITENS(id));
+
+  const response = await fetchWithTimeout(url, {
+    method: 'PATCH',
+    body: JSON.stringify({ operacoes }),
+  });
+
+  if (!response.ok) {
+    const error = await response.json();
+    throw new Error(typeof error.detail === 'string' ? error.detail : 'Erro ao alterar itens da refeição');
+  }
+
+  return response.json();
+}
+
 /**
  * Atualiza campos básicos de uma refeição existente
  *
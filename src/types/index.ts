@@ -19,6 +19,13 @@ export interface AlimentoDB {
   cluster_nutricional?: number;
 }
 
+/** GET /api/alimentos?formato=compacto: nomes das colunas uma vez + linhas */
+export interface AlimentosCompactos {
+  colunas: (keyof AlimentoDB)[];
+  linhas: unknown[][];
+  next_cursor?: string | null;
+}
+
 export interface RefeicaoDB {
   id: number;
   nome: string;
@@ -121,6 +128,7 @@ export interface Refeicao {
   ativa: boolean;
   itens: RefeicaoItem[];
   totais: Totais;
+  nutrientes?: TotaisNutrientes; // só com ?nutrientes=
 }
 
 export interface HistoricoRefeicao {
@@ -134,6 +142,61 @@ export interface HistoricoRefeicao {
   criada_em: string;
   itens: RefeicaoItem[];
   totais: Totais;
+  nutrientes?: TotaisNutrientes; // só com ?nutrientes=
+}
+
+/** Código do nutriente -> total (null quando nenhum item tem o dado) */
+export type TotaisNutrientes = Record<string, number | null>;
+
+export interface Nutriente {
+  codigo: string;
+  nome: string;
+  unidade: string;
+  alimentos: number; // quantos alimentos têm o dado
+}
+
+export type CategoriaSubstituto = 'mesma' | 'outra' | 'qualquer';
+
+export interface PorcaoSubstituta {
+  alimento_id: number;
+  alimento_nome: string;
+  categoria: string | null;
+  gramas: number; // iguala as kcal do original
+  kcal: number;
+  prot: number;
+  carb: number;
+  gord: number;
+}
+
+export interface Substituto extends PorcaoSubstituta {
+  contexto_culinario: string | null;
+  distancia: number; // menor = perfil por kcal mais parecido
+}
+
+export interface SubstitutosResponse {
+  alimento: PorcaoSubstituta;
+  substitutos: Substituto[];
+  perfil: string[];
+  candidatos: number;
+  versao: number;
+}
+
+export type GranularidadeResumo = 'dia' | 'semana' | 'mes';
+
+export interface ResumoPeriodo {
+  periodo: string; // YYYY-MM-DD (início do dia/semana/mês)
+  registros: number;
+  totais: Totais;
+  por_tipo: Record<string, { registros: number; totais: Totais }>;
+}
+
+export interface ResumoHistorico {
+  inicio: string;
+  fim: string;
+  granularidade: GranularidadeResumo;
+  periodos: ResumoPeriodo[];
+  registros: number;
+  totais: Totais;
 }
 
 /**
@@ -196,6 +259,16 @@ export function adaptAlimentoFromDB(db: AlimentoDB): Alimento {
   };
 }
 
+export function alimentosFromCompacto({ colunas, linhas }: AlimentosCompactos): AlimentoDB[] {
+  return linhas.map((linha) => {
+    const alimento: Record<string, unknown> = {};
+    colunas.forEach((coluna, i) => {
+      alimento[coluna] = linha[i];
+    });
+    return alimento as unknown as AlimentoDB;
+  });
+}
+
 export function adaptAlimentoToDB(alimento: AlimentoCreate): AlimentoCreate {
   // Já está no formato correto (snake_case)
   return alimento;
@@ -1,8 +1,31 @@
 import { defineConfig } from 'vite'
 import react from '@vitejs/plugin-react'
+import { readdirSync, readFileSync, writeFileSync } from 'node:fs'
+import { join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+// Gera .br e .gz dos assets no build: a API serve a versão pré-comprimida
+// (StaticFilesPrecomprimidos) em vez de comprimir a cada requisição
+function precomprimirAssets(dir = join('dist', 'assets'), minimoBytes = 1024) {
+  return {
+    name: 'precomprimir-assets',
+    apply: 'build',
+    closeBundle() {
+      for (const arquivo of readdirSync(dir)) {
+        if (!/\.(js|css|svg|html|json|txt)$/.test(arquivo)) continue
+        const conteudo = readFileSync(join(dir, arquivo))
+        if (conteudo.length < minimoBytes) continue
+        writeFileSync(join(dir, `${arquivo}.gz`), gzipSync(conteudo, { level: 9 }))
+        writeFileSync(join(dir, `${arquivo}.br`), brotliCompressSync(conteudo, {
+          params: { [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY },
+        }))
+      }
+    },
+  }
+}
 
 export default defineConfig({
-  plugins: [react()],
+  plugins: [react(), precomprimirAssets()],
 
   // Build configuration (produção)
   build: {